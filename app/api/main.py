@@ -3,6 +3,7 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.api.routes import router
 from app.core.config import settings
+from app.core.executors import shutdown_executors
 import structlog
 from slowapi import Limiter, _rate_limit_exceeded_handler
 from slowapi.util import get_remote_address
@@ -27,8 +28,9 @@ async def lifespan(app: FastAPI):
     
     yield
     
-    # Shutdown event (if needed in future)
+    # Shutdown event
     logger.info("Application shutting down...")
+    shutdown_executors()
 
 
 app = FastAPI(title="PDF RAG API", lifespan=lifespan)
@@ -1,22 +1,36 @@
 from fastapi import APIRouter, UploadFile, File, HTTPException, Request
+from fastapi.responses import StreamingResponse
 import hashlib
+import json
 import os
 import aiofiles
 import re
-from typing import Optional, List
+import structlog
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
 from app.core.config import settings
+from app.core.executors import iterate_blocking, run_blocking
 from app.worker.celery_app import celery_app
 from app.services.vector_store import search_vectors
+from app.services.text_store import hydrate_hits
 from app.services.embeddings import get_model
-from app.services.llm import llm_client
+from app.services.query_embeddings import query_embedder
+from app.services.answer_cache import answer_cache, index_version, mark_document_reindexed
+from app.services.llm import GENERATION_ERROR_MESSAGE, llm_client
 from app.services.sections import normalize_section_name
+from app.services.summaries import (
+    SUMMARY_SYSTEM_PROMPT,
+    gather_summary_context,
+    get_summary_store,
+    summary_prompt,
+)
 from pydantic import BaseModel
 from slowapi import Limiter
 from slowapi.util import get_remote_address
 
+logger = structlog.get_logger()
 limiter = Limiter(key_func=get_remote_address)
 router = APIRouter()
-ALLOWED_OCR_MODES = {"auto", "always", "never"}
+ALLOWED_OCR_MODES = {"auto", "always", "never", "per_page"}
 
 
 def _safe_remove(path: str) -> None:
@@ -42,10 +56,26 @@ class ChatResponse(BaseModel):
 
 class SummaryResponse(BaseModel):
     summary: str
+    cached: bool = False
 
-@router.post("/chat", response_model=ChatResponse)
-@limiter.limit("20/minute")
-async def chat(request: Request, body: ChatRequest):
+CHAT_SYSTEM_PROMPT = (
+    "You are a citation-aware research assistant.\n"
+    "Rules:\n"
+    "1) Use only the provided evidence blocks.\n"
+    "2) Every factual statement must include an inline citation in the form [Page X, Section Y].\n"
+    "3) Include direct verbatim quotes from evidence in double quotes where possible.\n"
+    "4) If evidence is insufficient, answer exactly: I don't know based on the provided evidence.\n"
+    "5) Do not use outside knowledge."
+)
+NO_EVIDENCE_ANSWER = (
+    "I don't know based on the provided document evidence. "
+    "No relevant passages were retrieved for this query."
+)
+CITATION_RE = re.compile(r"\[Page\s+\d+,\s*Section\s+[^\]]+\]")
+
+
+def _chat_filters(body: ChatRequest) -> Dict[str, Any]:
+    """Normalized search_vectors filters for a chat request."""
     normalized_section_bucket = (
         body.section_bucket.strip().lower().replace(" ", "_")
         if body.section_bucket
@@ -67,38 +97,33 @@ async def chat(request: Request, body: ChatRequest):
     if normalized_sections:
         normalized_sections = list(dict.fromkeys(normalized_sections))
 
-    # 1. Embed query
-    model = get_model()
-    query_vector = model.encode(body.query).tolist()
-    
-    # 2. Search Qdrant
-    search_results = search_vectors(
-        query_vector, 
-        top_k=settings.RAG_TOP_K, 
-        doc_id=body.doc_id,
-        section=normalized_section,
-        sections=normalized_sections,
-        section_bucket=normalized_section_bucket,
-        is_claim=body.is_claim,
-        claim_type=normalized_claim_type,
-        is_table=body.is_table,
-        table_variant=normalized_table_variant,
-    )
+    return {
+        "doc_id": body.doc_id,
+        "section": normalized_section,
+        "sections": normalized_sections,
+        "section_bucket": normalized_section_bucket,
+        "is_claim": body.is_claim,
+        "claim_type": normalized_claim_type,
+        "is_table": body.is_table,
+        "table_variant": normalized_table_variant,
+    }
 
-    if not search_results:
-        return {
-            "answer": (
-                "I don't know based on the provided document evidence. "
-                "No relevant passages were retrieved for this query."
-            ),
-            "citations": [],
-        }
+
+async def _retrieve_chat_evidence(
+    query_vector: List[float], filters: Dict[str, Any]
+) -> Tuple[List[str], List[dict]]:
+    """Search Qdrant and return (evidence_blocks, citations)."""
+    search_results = await run_blocking(
+        "qdrant", search_vectors, query_vector, top_k=settings.RAG_TOP_K, **filters
+    )
+    # Slim points carry no text; fetch it from the side store in one batch.
+    search_results = await run_blocking("qdrant", hydrate_hits, list(search_results or []))
     
     # 3. Construct Context
     evidence_blocks = []
     citations = []
     
-    for idx, hit in enumerate(search_results, start=1):
+    for idx, hit in enumerate(search_results or [], start=1):
         payload = hit.payload
         text = payload.get("text", "")
         page = payload.get("page")
@@ -134,40 +159,182 @@ async def chat(request: Request, body: ChatRequest):
             "content_type": content_type,
             "text_snippet": text[:200] + "..."
         })
-    
-    # 4. Generate Answer
-    system_prompt = (
-        "You are a citation-aware research assistant.\n"
-        "Rules:\n"
-        "1) Use only the provided evidence blocks.\n"
-        "2) Every factual statement must include an inline citation in the form [Page X, Section Y].\n"
-        "3) Include direct verbatim quotes from evidence in double quotes where possible.\n"
-        "4) If evidence is insufficient, answer exactly: I don't know based on the provided evidence.\n"
-        "5) Do not use outside knowledge."
-    )
-    prompt = (
+    return evidence_blocks, citations
+
+
+def _chat_prompt(query: str, evidence_blocks: List[str]) -> str:
+    return (
         "Evidence:\n"
         f"{chr(10).join(evidence_blocks)}\n\n"
-        f"Question: {body.query}\n\n"
+        f"Question: {query}\n\n"
         "Provide a concise answer grounded only in evidence."
     )
-    
-    answer = llm_client.generate_response(prompt, system_prompt=system_prompt)
 
-    # Repair pass if provider omits required citation format.
-    if citations and not re.search(r"\[Page\s+\d+,\s*Section\s+[^\]]+\]", answer):
-        repair_prompt = (
-            f"Rewrite the answer below so every factual statement has [Page X, Section Y] citations "
-            "and includes direct quotes from the provided evidence.\n\n"
-            f"Answer to rewrite:\n{answer}"
+
+async def _repair_citations(answer: str, citations: List[dict]) -> Optional[str]:
+    """Rewritten answer if the provider omitted the required citation format, else None."""
+    if not citations or CITATION_RE.search(answer):
+        return None
+    repair_prompt = (
+        f"Rewrite the answer below so every factual statement has [Page X, Section Y] citations "
+        "and includes direct quotes from the provided evidence.\n\n"
+        f"Answer to rewrite:\n{answer}"
+    )
+    return await run_blocking(
+        "llm", llm_client.generate_response, repair_prompt, system_prompt=CHAT_SYSTEM_PROMPT
+    )
+
+
+def _sse(event: str, data: Any) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def _sse_response(events: AsyncIterator[str]) -> StreamingResponse:
+    return StreamingResponse(
+        events,
+        media_type="text/event-stream",
+        # Keep reverse proxies from buffering the stream.
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+def _stream_answer(prompt: str, system_prompt: str) -> AsyncIterator[str]:
+    return iterate_blocking("llm", llm_client.stream_response(prompt, system_prompt=system_prompt))
+
+
+class _StreamedAnswer:
+    """
+    Relays LLM deltas as SSE `token` events while collecting the text. If the
+    provider or the executor fails, an `error` event ends the stream and `completed`
+    stays False; such an answer must not be repaired or cached.
+    """
+
+    def __init__(self, prompt: str, system_prompt: str):
+        self.prompt = prompt
+        self.system_prompt = system_prompt
+        self.parts: List[str] = []
+        self.completed = False
+
+    @property
+    def text(self) -> str:
+        return "".join(self.parts)
+
+    async def events(self) -> AsyncIterator[str]:
+        try:
+            async for delta in _stream_answer(self.prompt, self.system_prompt):
+                self.parts.append(delta)
+                yield _sse("token", {"text": delta})
+        except Exception as e:
+            logger.error(f"Streaming answer failed after {len(self.parts)} deltas: {e}")
+            # Sent instead of `done`, whether or not any text went out.
+            yield _sse("error", {"message": GENERATION_ERROR_MESSAGE, "partial": self.text})
+            return
+        self.completed = True
+
+
+def _cached_answer(
+    filters: Dict[str, Any], query_vector: List[float]
+) -> Optional[Dict[str, Any]]:
+    if not settings.CHAT_CACHE_ENABLED:
+        return None
+    return answer_cache.get(filters, query_vector)
+
+
+def _cache_answer(
+    filters: Dict[str, Any], query_vector: List[float], version: int, answer: str, citations: List[dict]
+) -> None:
+    if settings.CHAT_CACHE_ENABLED and answer != GENERATION_ERROR_MESSAGE:
+        answer_cache.put(
+            filters, query_vector, {"answer": answer, "citations": citations}, version=version
         )
-        answer = llm_client.generate_response(repair_prompt, system_prompt=system_prompt)
+
+
+@router.post("/chat", response_model=ChatResponse)
+@limiter.limit("20/minute")
+async def chat(request: Request, body: ChatRequest):
+    filters = _chat_filters(body)
+
+    # 1. Embed query (cached, micro-batched, off the event loop)
+    query_vector = await query_embedder.embed(body.query, get_model())
+    cached = _cached_answer(filters, query_vector)
+    if cached is not None:
+        return cached
+
+    # 2. Search Qdrant
+    version = index_version(body.doc_id)
+    evidence_blocks, citations = await _retrieve_chat_evidence(query_vector, filters)
+    if not citations:
+        return {"answer": NO_EVIDENCE_ANSWER, "citations": []}
     
+    # 4. Generate Answer
+    answer = await run_blocking(
+        "llm",
+        llm_client.generate_response,
+        _chat_prompt(body.query, evidence_blocks),
+        system_prompt=CHAT_SYSTEM_PROMPT,
+    )
+    if answer == GENERATION_ERROR_MESSAGE:
+        # Nothing to repair, and caching the apology would replay it to later askers.
+        return {"answer": answer, "citations": citations}
+
+    # Repair pass if provider omits required citation format.
+    repaired = await _repair_citations(answer, citations)
+    if repaired is not None:
+        answer = repaired
+
+    _cache_answer(filters, query_vector, version, answer, citations)
     return {
         "answer": answer,
         "citations": citations
     }
 
+@router.post("/chat/stream")
+@limiter.limit("20/minute")
+async def chat_stream(request: Request, body: ChatRequest):
+    """
+    Server-sent events variant of /chat: `citations` first, then `token` events as
+    the LLM streams, an optional `repair` event carrying the rewritten answer when
+    citations were missing, and a final `done` event with the complete answer. If the
+    provider fails an `error` event carrying any partial text replaces `done`.
+    """
+    filters = _chat_filters(body)
+    query_vector = await query_embedder.embed(body.query, get_model())
+    cached = _cached_answer(filters, query_vector)
+    if cached is not None:
+        async def cached_events():
+            yield _sse("citations", cached["citations"])
+            yield _sse("token", {"text": cached["answer"]})
+            yield _sse("done", {"answer": cached["answer"], "cached": True})
+
+        return _sse_response(cached_events())
+
+    version = index_version(body.doc_id)
+    evidence_blocks, citations = await _retrieve_chat_evidence(query_vector, filters)
+
+    async def events():
+        yield _sse("citations", citations)
+        if not citations:
+            yield _sse("token", {"text": NO_EVIDENCE_ANSWER})
+            yield _sse("done", {"answer": NO_EVIDENCE_ANSWER})
+            return
+
+        streamed = _StreamedAnswer(_chat_prompt(body.query, evidence_blocks), CHAT_SYSTEM_PROMPT)
+        async for event in streamed.events():
+            yield event
+        if not streamed.completed:
+            # A failed answer is neither repaired nor cached.
+            return
+        answer = streamed.text
+
+        repaired = await _repair_citations(answer, citations)
+        if repaired is not None:
+            answer = repaired
+            yield _sse("repair", {"answer": answer})
+        _cache_answer(filters, query_vector, version, answer, citations)
+        yield _sse("done", {"answer": answer})
+
+    return _sse_response(events())
+
 @router.post("/upload")
 @limiter.limit("5/minute")
 async def upload_pdf(
@@ -180,7 +347,7 @@ async def upload_pdf(
     if normalized_ocr_mode not in ALLOWED_OCR_MODES:
         raise HTTPException(
             status_code=400,
-            detail="Invalid ocr_mode. Allowed values: auto, always, never.",
+            detail="Invalid ocr_mode. Allowed values: auto, always, never, per_page.",
         )
 
     if file.content_type != "application/pdf":
@@ -225,6 +392,11 @@ async def upload_pdf(
              "ocr_mode": normalized_ocr_mode,
          }
 
+    if force:
+        # Re-processing re-indexes the document; summaries and answers built from the old index go.
+        get_summary_store().invalidate(doc_id)
+        mark_document_reindexed(doc_id)
+
     # Rename temp to final
     os.rename(temp_path, final_path)
 
@@ -261,75 +433,72 @@ async def get_status(task_id: str):
          
     return response
 
+def _cacheable_summary(summary: str) -> bool:
+    return bool(summary) and summary != GENERATION_ERROR_MESSAGE
+
+
 @router.get("/summary/{doc_id}", response_model=SummaryResponse)
-async def get_summary(doc_id: str):
-    # 1. Retrieve structured evidence by summary bucket.
-    summary_targets = {
-        "Problem": ["Abstract", "Introduction", "Related Work"],
-        "Method": ["Methods"],
-        "Key Results": ["Results"],
-        "Limitations": ["Limitations", "Conclusion"],
-    }
-    context_sections = []
-    for label, target_sections in summary_targets.items():
-        hits = search_vectors(
-            doc_id=doc_id,
-            sections=target_sections,
-            top_k=settings.SUMMARY_TOP_K_PER_SECTION,
-        )
-        if not hits:
-            # Fallback to coarse bucket retrieval.
-            bucket_name = label.lower().replace(" ", "_")
-            bucket_name = "results" if bucket_name == "key_results" else bucket_name
-            hits = search_vectors(
-                doc_id=doc_id,
-                section_bucket=bucket_name,
-                top_k=settings.SUMMARY_TOP_K_PER_SECTION,
-            )
-        if not hits:
-            continue
-
-        snippets = []
-        for hit in hits:
-            payload = hit.payload
-            snippets.append(
-                f"[Page {payload.get('page')}, Section {payload.get('section', 'General')}] "
-                f"{payload.get('text', '')}"
-            )
-        context_sections.append(f"{label} Evidence:\n" + "\n".join(snippets))
-
-    context_text = "\n\n".join(context_sections)
-    if not context_text:
-        # Fallback: get first few chunks if no section cues were captured.
-        hits = search_vectors(doc_id=doc_id, top_k=settings.SUMMARY_FALLBACK_TOP_K)
-        context_text = "\n".join(
-            f"[Page {hit.payload.get('page')}, Section {hit.payload.get('section', 'General')}] {hit.payload.get('text', '')}"
-            for hit in hits
-        )
+async def get_summary(doc_id: str, refresh: bool = False):
+    store = get_summary_store()
+    if not refresh:
+        summary = store.get(doc_id)
+        if summary is not None:
+            return {"summary": summary, "cached": True}
 
+    # 1. Retrieve structured evidence by summary bucket.
+    context_text = await gather_summary_context(doc_id, search_vectors)
     if not context_text:
         raise HTTPException(status_code=404, detail="Document not found or no content extracted.")
 
     # 2. Generate summary using LLM
-    system_prompt = (
-        "You are a research assistant. Produce a paper-at-a-glance summary from evidence only.\n"
-        "Return exactly these sections in order:\n"
-        "1) Problem\n"
-        "2) Method\n"
-        "3) Key Results\n"
-        "4) Limitations\n"
-        "Under each section, provide bullet points and include citations in the form [Page X, Section Y].\n"
-        "Use short verbatim quotes when possible.\n"
-        "If evidence for a section is missing, write one bullet: Insufficient evidence."
+    summary = await run_blocking(
+        "llm",
+        llm_client.generate_response,
+        summary_prompt(context_text),
+        system_prompt=SUMMARY_SYSTEM_PROMPT,
     )
-    prompt = (
-        f"Evidence:\n{context_text}\n\n"
-        "Generate the structured summary now."
-    )
-    
-    summary = llm_client.generate_response(prompt, system_prompt=system_prompt)
+    if _cacheable_summary(summary):
+        store.put(doc_id, summary)
     
-    return {"summary": summary}
+    return {"summary": summary, "cached": False}
+
+@router.get("/summary/{doc_id}/stream")
+async def get_summary_stream(doc_id: str, refresh: bool = False):
+    """
+    Server-sent events variant of /summary: `token` events, then `done` with the full
+    summary, or `error` with any partial text if the provider fails.
+    """
+    store = get_summary_store()
+    summary = None if refresh else store.get(doc_id)
+    if summary is not None:
+        async def cached_events():
+            yield _sse("token", {"text": summary})
+            yield _sse("done", {"summary": summary, "cached": True})
+
+        return _sse_response(cached_events())
+
+    context_text = await gather_summary_context(doc_id, search_vectors)
+    if not context_text:
+        raise HTTPException(status_code=404, detail="Document not found or no content extracted.")
+
+    async def events():
+        streamed = _StreamedAnswer(summary_prompt(context_text), SUMMARY_SYSTEM_PROMPT)
+        async for event in streamed.events():
+            yield event
+        if not streamed.completed:
+            return
+        if _cacheable_summary(streamed.text):
+            store.put(doc_id, streamed.text)
+        yield _sse("done", {"summary": streamed.text, "cached": False})
+
+    return _sse_response(events())
+
+@router.get("/cache/stats")
+async def cache_stats():
+    return {
+        "chat_answers": answer_cache.stats(),
+        "query_embeddings": query_embedder.stats(),
+    }
 
 @router.get("/health")
 async def health_check():
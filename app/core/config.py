@@ -1,6 +1,6 @@
 from pydantic_settings import BaseSettings
 from pydantic import ConfigDict
-from typing import Optional
+from typing import Dict, Optional
 
 class Settings(BaseSettings):
     model_config = ConfigDict(env_file=".env", env_file_encoding="utf-8")
@@ -12,23 +12,109 @@ class Settings(BaseSettings):
     QDRANT_URL: str = "http://qdrant:6333"
     QDRANT_API_KEY: Optional[str] = None
     QDRANT_COLLECTION_NAME: str = "documents"
+    QDRANT_THREADPOOL_SIZE: int = 8  # concurrent Qdrant calls from API request handlers
+    # gRPC (port 6334) is cheaper than REST for large upserts
+    QDRANT_PREFER_GRPC: bool = False
+    QDRANT_GRPC_PORT: int = 6334
+    # Ingestion upserts: points per request, requests in flight, per-batch retries with
+    # exponential backoff; wait=False returns once Qdrant has accepted (not applied) a batch
+    QDRANT_UPSERT_BATCH_SIZE: int = 256
+    QDRANT_UPSERT_PARALLELISM: int = 4
+    QDRANT_UPSERT_MAX_RETRIES: int = 3
+    QDRANT_UPSERT_BACKOFF_SECONDS: float = 0.5
+    QDRANT_UPSERT_WAIT: bool = True
+    # Collection storage, applied when the collection is created. Quantization: none,
+    # scalar (int8, ~4x less RAM) or binary (1 bit/dim, ~32x; best for >=512-dim models);
+    # the quantized copy is searched in RAM and the top hits rescored against the originals.
+    QDRANT_QUANTIZATION: str = "none"
+    QDRANT_QUANTIZATION_ALWAYS_RAM: bool = True
+    QDRANT_QUANTIZATION_RESCORE: bool = True
+    QDRANT_QUANTIZATION_OVERSAMPLING: float = 2.0
+    QDRANT_ON_DISK_VECTORS: bool = False  # original vectors memory-mapped from disk
+    QDRANT_ON_DISK_PAYLOAD: bool = False
+    QDRANT_HNSW_M: int = 16
+    QDRANT_HNSW_EF_CONSTRUCT: int = 100
+    QDRANT_HNSW_EF: Optional[int] = None  # search-time ef; None uses Qdrant's default
+    # full: chunk text and all metadata in every point; slim: only filter fields, page and
+    # content_type in Qdrant, the rest in a local SQLite side store (TEXT_STORE_PATH,
+    # default <UPLOAD_DIR>/text_store.sqlite3) that /chat and /summary hydrate hits from
+    QDRANT_PAYLOAD_MODE: str = "full"
+    TEXT_STORE_PATH: Optional[str] = None
 
     # LLM (OpenRouter)
     OPENROUTER_API_KEY: Optional[str] = None
     LLM_PROVIDER: str = "openrouter"
+    LLM_BASE_URL: str = "https://openrouter.ai/api/v1"
     LLM_MODEL: str = "mistralai/mistral-7b-instruct"
+    LLM_THREADPOOL_SIZE: int = 16  # concurrent LLM calls from API request handlers
+    LLM_TIMEOUT_SECONDS: float = 120
+    LLM_MAX_RETRIES: int = 2
+    # Claim extraction during ingestion: prompts in flight, chunks packed per prompt,
+    # and retries (exponential backoff, or Retry-After) on rate limits / transient errors
+    CLAIM_EXTRACTION_CONCURRENCY: int = 4
+    CLAIM_EXTRACTION_CHUNKS_PER_PROMPT: int = 1
+    CLAIM_EXTRACTION_MAX_RETRIES: int = 4
+    CLAIM_EXTRACTION_BACKOFF_SECONDS: float = 2.0
 
     # Embeddings
     EMBEDDING_MODEL: str = "all-MiniLM-L6-v2"
     EMBEDDING_DIMENSION: int = 384
+    # EMBEDDING_MODEL's max_seq_length; lets CHUNK_MODE=tokens cap chunks without loading the model
+    EMBEDDING_MAX_SEQ_LENGTH: int = 256
+    EMBEDDING_BATCH_SIZE: int = 64
+    EMBEDDING_DTYPE: str = "float32"  # float16 halves memory until upsert (and runs the model in fp16 on CUDA)
+    EMBEDDING_PROCESSES: int = 1  # >1 encodes large batches with a multi-process CPU pool
+    EMBEDDING_SORT_BY_LENGTH: bool = True
+    # Content-addressed embedding cache: none, sqlite (EMBEDDING_CACHE_PATH,
+    # default <UPLOAD_DIR>/embedding_cache.sqlite3) or redis (REDIS_URL)
+    EMBEDDING_CACHE_BACKEND: str = "none"
+    EMBEDDING_CACHE_PATH: Optional[str] = None
+    EMBEDDING_CACHE_MAX_ENTRIES: int = 500000
+
+    # Query embeddings (/chat): LRU+TTL cache and micro-batching window
+    QUERY_CACHE_MAX_ENTRIES: int = 1024
+    QUERY_CACHE_TTL_SECONDS: float = 600
+    QUERY_BATCH_WINDOW_MS: float = 5
+    QUERY_BATCH_MAX_SIZE: int = 32
+
+    # Semantic /chat answer cache: hit when a cached query under the same filters has
+    # cosine similarity >= CHAT_CACHE_SIMILARITY; dropped when the document is re-indexed
+    CHAT_CACHE_ENABLED: bool = True
+    CHAT_CACHE_SIMILARITY: float = 0.95
+    CHAT_CACHE_TTL_SECONDS: float = 3600
+    CHAT_CACHE_MAX_ENTRIES: int = 2048
 
     # RAG Config
     RAG_TOP_K: int = 5
     SUMMARY_TOP_K_PER_SECTION: int = 8
     SUMMARY_FALLBACK_TOP_K: int = 15
+    # Generated summaries are cached per doc_id + prompt version + LLM model
+    # (default <UPLOAD_DIR>/summaries); precompute builds one at the end of ingestion
+    SUMMARY_CACHE_DIR: Optional[str] = None
+    SUMMARY_PRECOMPUTE: bool = False
     MAX_CONTEXT_TOKENS: int = 4096
     CHUNK_TOKENS: int = 500
     CHUNK_OVERLAP_TOKENS: int = 50
+    # words: CHUNK_TOKENS counts whitespace words; tokens: embedding-model tokens,
+    # capped at the model's max sequence length
+    CHUNK_MODE: str = "words"
+
+    # PDF extraction (1 = serial, 0 = one worker per CPU)
+    PDF_EXTRACTION_WORKERS: int = 1
+    PDF_PARALLEL_MIN_PAGES: int = 16
+    # Scan only this many evenly spaced pages (with early exit) when detecting digital PDFs; 0 scans all
+    DIGITAL_DETECTION_SAMPLE_PAGES: int = 0
+
+    # OCR batching (pages per predictor call, cap on rasterized images held per batch)
+    OCR_BATCH_SIZE: int = 8
+    OCR_BATCH_MAX_MB: int = 512
+    # Render resolution for OCR; per-mode overrides, e.g. {"always": 200}
+    OCR_RENDER_DPI: int = 144
+    OCR_RENDER_DPI_BY_MODE: Dict[str, int] = {}
+
+    # Table detection: auto (caption/ruling-line pre-filter), always, never
+    TABLE_DETECTION_MODE: str = "auto"
+    TABLE_MIN_RULE_ITEMS: int = 3
 
     # Celery
     CELERY_CONCURRENCY: int = 2
@@ -0,0 +1,51 @@
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Callable, Dict, Iterable
+
+from app.core.config import settings
+
+# Separate pools so a backlog of slow LLM calls cannot starve Qdrant lookups,
+# and neither can tie up the default executor or the event loop itself.
+_pools: Dict[str, ThreadPoolExecutor] = {}
+
+
+def _pool_size(name: str) -> int:
+    sizes = {
+        "qdrant": settings.QDRANT_THREADPOOL_SIZE,
+        "llm": settings.LLM_THREADPOOL_SIZE,
+    }
+    if name not in sizes:
+        raise ValueError(f"Invalid executor '{name}'. Allowed values: qdrant, llm.")
+    return max(1, sizes[name])
+
+
+def get_executor(name: str) -> ThreadPoolExecutor:
+    if name not in _pools:
+        _pools[name] = ThreadPoolExecutor(
+            max_workers=_pool_size(name), thread_name_prefix=f"{name}-io"
+        )
+    return _pools[name]
+
+
+async def run_blocking(name: str, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+    """Run a synchronous call on the named bounded pool and await its result."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_executor(name), functools.partial(fn, *args, **kwargs))
+
+
+def shutdown_executors() -> None:
+    for pool in _pools.values():
+        pool.shutdown(wait=False, cancel_futures=True)
+    _pools.clear()
+
+
+async def iterate_blocking(name: str, iterable: Iterable[Any]) -> AsyncIterator[Any]:
+    """Drain a synchronous iterator on the named pool, one item per hop."""
+    iterator = iter(iterable)
+    done = object()
+    while True:
+        item = await run_blocking(name, next, iterator, done)
+        if item is done:
+            return
+        yield item
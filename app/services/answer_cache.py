@@ -0,0 +1,162 @@
+import json
+import os
+import time
+from collections import OrderedDict
+from itertools import count
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import numpy as np
+import structlog
+
+from app.core.config import settings
+from app.services.summaries import SAFE_DOC_ID_RE
+
+logger = structlog.get_logger()
+
+# Version marker bumped on every (re)index; cross-document answers depend on all of them.
+ALL_DOCUMENTS_MARKER = "_all"
+
+
+def _version_path(marker: str) -> str:
+    return os.path.join(settings.UPLOAD_DIR, "index_versions", marker)
+
+
+def index_version(doc_id: Optional[str]) -> int:
+    """Last time doc_id (or, without one, any document) was re-indexed; 0 if never marked."""
+    marker = doc_id if doc_id and SAFE_DOC_ID_RE.match(doc_id) else ALL_DOCUMENTS_MARKER
+    try:
+        return os.stat(_version_path(marker)).st_mtime_ns
+    except OSError:
+        return 0
+
+
+def mark_document_reindexed(doc_id: str) -> None:
+    """Invalidate cached answers for doc_id in every API process sharing UPLOAD_DIR."""
+    now = time.time_ns()
+    markers = [ALL_DOCUMENTS_MARKER]
+    if SAFE_DOC_ID_RE.match(doc_id or ""):
+        markers.append(doc_id)
+    for marker in markers:
+        path = _version_path(marker)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "a"):
+                pass
+            os.utime(path, ns=(now, now))
+        except OSError as e:
+            logger.warning(f"Could not mark {marker} as re-indexed: {e}")
+
+
+def filter_key(filters: Dict[str, Any]) -> str:
+    """Order-insensitive key for normalized search filters (doc_id included)."""
+    normalized = {
+        key: sorted(value) if isinstance(value, list) else value
+        for key, value in filters.items()
+        if value is not None
+    }
+    return json.dumps(normalized, sort_keys=True)
+
+
+class SemanticAnswerCache:
+    """
+    /chat responses keyed by (normalized filters, query embedding). A lookup hits
+    when a cached query under the same filters has cosine similarity of at least
+    `threshold`, the entry is younger than `ttl_seconds`, and the document has not
+    been re-indexed since. LRU-evicted past `max_entries`.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float, threshold: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.threshold = threshold
+        # entry id -> (filter key, unit query vector, response, expires_at, index version)
+        self._entries: "OrderedDict[int, Tuple[str, np.ndarray, Dict[str, Any], float, int]]" = OrderedDict()
+        self._by_filters: Dict[str, Set[int]] = {}
+        self._ids = count()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _unit(vector: List[float]) -> np.ndarray:
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = float(np.linalg.norm(vector))
+        return vector / norm if norm else vector
+
+    def _remove(self, entry_id: int) -> None:
+        key = self._entries.pop(entry_id)[0]
+        ids = self._by_filters.get(key)
+        if ids is not None:
+            ids.discard(entry_id)
+            if not ids:
+                del self._by_filters[key]
+
+    def get(self, filters: Dict[str, Any], query_vector: List[float]) -> Optional[Dict[str, Any]]:
+        key = filter_key(filters)
+        version = index_version(filters.get("doc_id"))
+        now = time.monotonic()
+
+        candidates = []
+        for entry_id in list(self._by_filters.get(key, ())):
+            _, vector, _, expires_at, entry_version = self._entries[entry_id]
+            if expires_at < now or entry_version != version:
+                self._remove(entry_id)
+            else:
+                candidates.append((entry_id, vector))
+
+        if candidates:
+            similarities = np.stack([v for _, v in candidates]) @ self._unit(query_vector)
+            best = int(np.argmax(similarities))
+            if similarities[best] >= self.threshold:
+                entry_id = candidates[best][0]
+                self._entries.move_to_end(entry_id)
+                self.hits += 1
+                return self._entries[entry_id][2]
+
+        self.misses += 1
+        return None
+
+    def put(
+        self,
+        filters: Dict[str, Any],
+        query_vector: List[float],
+        response: Dict[str, Any],
+        version: Optional[int] = None,
+    ) -> None:
+        """
+        Store a response. Pass the index_version read before retrieval so an answer
+        built from a pre-reindex search is not stamped with the new version.
+        """
+        key = filter_key(filters)
+        if version is None:
+            version = index_version(filters.get("doc_id"))
+        entry_id = next(self._ids)
+        self._entries[entry_id] = (
+            key,
+            self._unit(query_vector),
+            response,
+            time.monotonic() + self.ttl_seconds,
+            version,
+        )
+        self._by_filters.setdefault(key, set()).add(entry_id)
+        while len(self._entries) > self.max_entries:
+            self._remove(next(iter(self._entries)))
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._by_filters.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "entries": len(self._entries),
+        }
+
+
+answer_cache = SemanticAnswerCache(
+    max_entries=settings.CHAT_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.CHAT_CACHE_TTL_SECONDS,
+    threshold=settings.CHAT_CACHE_SIMILARITY,
+)
@@ -0,0 +1,104 @@
+import hashlib
+import json
+import os
+import time
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from app.core.config import settings
+
+MANIFEST = "manifest.json"
+# Part of every fingerprint; bump when an artifact's layout or a stage's logic changes
+# so artifacts written by older code are rebuilt instead of reused.
+ARTIFACT_FORMAT_VERSION = 1
+
+
+def artifact_dir(doc_id: str) -> str:
+    """Per-document working directory for intermediate ingestion results."""
+    return os.path.join(settings.UPLOAD_DIR, doc_id)
+
+
+def _artifact_path(doc_id: str, name: str) -> str:
+    return os.path.join(artifact_dir(doc_id), name)
+
+
+def _replace_atomically(path: str, write) -> None:
+    # Stage outputs are read by other workers; never expose a half-written file.
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        write(f)
+    os.replace(tmp_path, path)
+
+
+def save_json(doc_id: str, name: str, data: Any) -> str:
+    path = _artifact_path(doc_id, name)
+    payload = json.dumps(data, separators=(",", ":")).encode("utf-8")
+    _replace_atomically(path, lambda f: f.write(payload))
+    return path
+
+
+def load_json(doc_id: str, name: str) -> Any:
+    with open(_artifact_path(doc_id, name), "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_vectors(doc_id: str, name: str, vectors: np.ndarray) -> str:
+    path = _artifact_path(doc_id, name)
+    _replace_atomically(path, lambda f: np.save(f, np.ascontiguousarray(vectors)))
+    return path
+
+
+def load_vectors(doc_id: str, name: str) -> np.ndarray:
+    return np.load(_artifact_path(doc_id, name))
+
+
+def stage_fingerprint(stage: str, *inputs: Any) -> str:
+    """Stable hash of everything a stage's output depends on."""
+    encoded = json.dumps([ARTIFACT_FORMAT_VERSION, stage, *inputs], sort_keys=True, default=str)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+def load_manifest(doc_id: str) -> Dict[str, Any]:
+    try:
+        manifest = load_json(doc_id, MANIFEST)
+    except (OSError, ValueError):
+        return {"stages": {}}
+    manifest.setdefault("stages", {})
+    return manifest
+
+
+def completed_stage(doc_id: str, stage: str, fingerprint: str) -> Optional[Dict[str, Any]]:
+    """Manifest entry for `stage` if it ran with the same inputs and its artifacts still exist."""
+    entry = load_manifest(doc_id)["stages"].get(stage)
+    if not entry or entry.get("fingerprint") != fingerprint:
+        return None
+    if not all(os.path.exists(_artifact_path(doc_id, name)) for name in entry.get("artifacts", [])):
+        return None
+    return entry
+
+
+def record_stage(
+    doc_id: str,
+    stage: str,
+    fingerprint: str,
+    artifacts: List[str],
+    meta: Optional[Dict[str, Any]] = None,
+) -> None:
+    manifest = load_manifest(doc_id)
+    manifest["doc_id"] = doc_id
+    manifest["stages"][stage] = {
+        "fingerprint": fingerprint,
+        "artifacts": artifacts,
+        "completed_at": time.time(),
+        "meta": meta or {},
+    }
+    save_json(doc_id, MANIFEST, manifest)
+
+
+def forget_stage(doc_id: str, stage: str) -> None:
+    """Drop a stage's manifest entry before its artifact is overwritten with an unrecorded result."""
+    manifest = load_manifest(doc_id)
+    if manifest["stages"].pop(stage, None) is not None:
+        save_json(doc_id, MANIFEST, manifest)
@@ -0,0 +1,168 @@
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+import structlog
+from openai import APIConnectionError, APITimeoutError, InternalServerError, RateLimitError
+
+from app.core.config import settings
+from app.services.llm import LLMClient
+
+logger = structlog.get_logger()
+
+# SDK retries are off so _call_with_backoff is the only retry layer: every 429 goes
+# through the shared _Backoff pause instead of being retried inside the client.
+llm_client = LLMClient(max_retries=0)
+
+RETRYABLE_ERRORS = (RateLimitError, APIConnectionError, APITimeoutError, InternalServerError)
+
+
+# Per-prompt result: claims for each chunk in the group, or None if the prompt failed.
+GroupResult = Optional[List[List[Dict[str, str]]]]
+
+
+class ClaimExtractionError(Exception):
+    """
+    Some prompts still failed after retries. Carries the claims that were extracted
+    and the per-prompt results, so a caller can retry just the failed prompts or go
+    ahead with a partial result. `retryable` is False when every failure was one
+    that retrying will not fix (a missing API key, a 4xx other than 429).
+    """
+
+    def __init__(
+        self,
+        failed_chunks: int,
+        claim_chunks: List[Dict[str, Any]],
+        group_results: Optional[List[GroupResult]] = None,
+        retryable: bool = True,
+    ):
+        super().__init__(f"Claim extraction failed for {failed_chunks} chunk(s)")
+        self.failed_chunks = failed_chunks
+        self.claim_chunks = claim_chunks
+        self.group_results = group_results or []
+        self.retryable = retryable
+
+
+class _Backoff:
+    """
+    Shared pause for all extraction threads: when one request is rate limited,
+    every thread waits out the same delay instead of hammering the provider.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._resume_at = 0.0
+
+    def wait(self) -> None:
+        with self._lock:
+            delay = self._resume_at - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+
+    def pause(self, seconds: float) -> None:
+        with self._lock:
+            self._resume_at = max(self._resume_at, time.monotonic() + seconds)
+
+
+def _retry_after(error: Exception) -> Optional[float]:
+    response = getattr(error, "response", None)
+    value = response.headers.get("retry-after") if response is not None else None
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+def _call_with_backoff(fn: Callable[[], Any], backoff: _Backoff) -> Any:
+    attempts = max(0, settings.CLAIM_EXTRACTION_MAX_RETRIES) + 1
+    for attempt in range(attempts):
+        backoff.wait()
+        try:
+            return fn()
+        except RETRYABLE_ERRORS as e:
+            if attempt == attempts - 1:
+                raise
+            delay = _retry_after(e)
+            if delay is None:
+                delay = settings.CLAIM_EXTRACTION_BACKOFF_SECONDS * 2 ** attempt
+                delay *= 1 + random.random() * 0.25
+            logger.warning(f"Claim extraction throttled ({type(e).__name__}); retrying in {delay:.1f}s")
+            backoff.pause(delay)
+
+
+def _claim_chunk(chunk: Dict[str, Any], claim: Dict[str, str]) -> Optional[Dict[str, Any]]:
+    claim_text = claim.get("text", "").strip()
+    claim_type = claim.get("claim_type", "result").strip().lower()
+    if not claim_text:
+        return None
+    return {
+        "text": claim_text,
+        "metadata": {
+            **chunk["metadata"],
+            "is_claim": True,
+            "claim_type": claim_type,
+            "content_type": "claim",
+            "original_text": chunk["text"][:200]
+        }
+    }
+
+
+def extract_claim_chunks(
+    chunks: List[Dict[str, Any]], previous: Optional[List[GroupResult]] = None
+) -> List[Dict[str, Any]]:
+    """
+    Claim chunks for every non-table chunk, in chunk order, each carrying its source
+    chunk's metadata. Up to CLAIM_EXTRACTION_CONCURRENCY prompts are in flight, each
+    packing CLAIM_EXTRACTION_CHUNKS_PER_PROMPT chunks. `previous` holds the per-prompt
+    results of an earlier failed run over the same chunks; prompts that succeeded
+    there are not sent again. If any prompt still fails after retries, the others
+    are finished and ClaimExtractionError is raised.
+    """
+    # Only extract claims from non-table chunks to save time/resources
+    sources = [chunk for chunk in chunks if not chunk["metadata"].get("is_table")]
+    per_prompt = max(1, settings.CLAIM_EXTRACTION_CHUNKS_PER_PROMPT)
+    groups = [sources[start:start + per_prompt] for start in range(0, len(sources), per_prompt)]
+    if previous is None or len(previous) != len(groups):
+        previous = [None] * len(groups)
+    pending = [index for index, result in enumerate(previous) if result is None]
+    group_results = list(previous)
+    retryable_failures = []
+    backoff = _Backoff()
+
+    def extract(group: List[Dict[str, Any]]) -> GroupResult:
+        texts = [chunk["text"] for chunk in group]
+        try:
+            return _call_with_backoff(lambda: llm_client.extract_claims_batch(texts), backoff)
+        except RETRYABLE_ERRORS as e:
+            logger.error(f"Failed to extract claims from {len(group)} chunk(s): {e}")
+            retryable_failures.append(e)
+            return None
+        except Exception as e:
+            logger.error(f"Failed to extract claims from {len(group)} chunk(s), not retryable: {e}")
+            return None
+
+    if pending:
+        workers = max(1, min(settings.CLAIM_EXTRACTION_CONCURRENCY, len(pending)))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="claims") as pool:
+            # map preserves group order regardless of completion order.
+            for index, result in zip(pending, pool.map(extract, [groups[i] for i in pending])):
+                group_results[index] = result
+
+    claim_chunks = []
+    failed_chunks = 0
+    for group, claims_per_chunk in zip(groups, group_results):
+        if claims_per_chunk is None:
+            failed_chunks += len(group)
+            continue
+        for chunk, claims in zip(group, claims_per_chunk):
+            for claim in claims:
+                claim_chunk = _claim_chunk(chunk, claim)
+                if claim_chunk is not None:
+                    claim_chunks.append(claim_chunk)
+    if failed_chunks:
+        raise ClaimExtractionError(
+            failed_chunks, claim_chunks, group_results, retryable=bool(retryable_failures)
+        )
+    return claim_chunks
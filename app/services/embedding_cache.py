@@ -0,0 +1,182 @@
+import hashlib
+import os
+from abc import ABC, abstractmethod
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import structlog
+
+from app.core.config import settings
+
+logger = structlog.get_logger()
+
+_cache = None
+_cache_pid = None
+ALLOWED_CACHE_BACKENDS = {"none", "sqlite", "redis"}
+# Stay well under SQLite's bound-parameter limit.
+SQLITE_IN_BATCH = 500
+
+
+def cache_key(text: str, model_name: Optional[str] = None) -> str:
+    """sha256 of the whitespace-normalized text, scoped to the embedding model."""
+    normalized = " ".join((text or "").split())
+    model_name = model_name or settings.EMBEDDING_MODEL
+    return hashlib.sha256(f"{model_name}\x00{normalized}".encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache(ABC):
+    """Bulk get/put of float32 vectors by cache key, with LRU eviction past max_entries."""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+
+    def get_many(self, keys: List[str]) -> Dict[str, np.ndarray]:
+        found = self._get_many(list(dict.fromkeys(keys)))
+        hits = sum(1 for key in keys if key in found)
+        self.hits += hits
+        self.misses += len(keys) - hits
+        return found
+
+    def put_many(self, items: Iterable[Tuple[str, np.ndarray]]) -> None:
+        items = [(key, np.asarray(vector, dtype=np.float32)) for key, vector in items]
+        if items:
+            self._put_many(items)
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses}
+
+    @abstractmethod
+    def _get_many(self, keys: List[str]) -> Dict[str, np.ndarray]:
+        """Stored vectors for the keys that are present."""
+
+    @abstractmethod
+    def _put_many(self, items: List[Tuple[str, np.ndarray]]) -> None:
+        """Store vectors, evicting least recently used entries past max_entries."""
+
+
+class SQLiteEmbeddingCache(EmbeddingCache):
+    def __init__(self, path: str, max_entries: int):
+        super().__init__(max_entries)
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        with self._conn:
+            # WAL lets several worker processes read while one writes.
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                "key TEXT PRIMARY KEY, vector BLOB NOT NULL, last_used REAL NOT NULL)"
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used)"
+            )
+
+    def _get_many(self, keys: List[str]) -> Dict[str, np.ndarray]:
+        found = {}
+        with self._lock, self._conn:
+            for start in range(0, len(keys), SQLITE_IN_BATCH):
+                batch = keys[start:start + SQLITE_IN_BATCH]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", batch
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = np.frombuffer(blob, dtype=np.float32)
+            if found:
+                now = time.time()
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE key = ?",
+                    [(now, key) for key in found],
+                )
+        return found
+
+    def _put_many(self, items: List[Tuple[str, np.ndarray]]) -> None:
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector, last_used) VALUES (?, ?, ?)",
+                [(key, vector.tobytes(), now) for key, vector in items],
+            )
+            (count,) = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+            excess = count - self.max_entries
+            if excess > 0:
+                self._conn.execute(
+                    "DELETE FROM embeddings WHERE key IN ("
+                    "SELECT key FROM embeddings ORDER BY last_used ASC LIMIT ?)",
+                    (excess,),
+                )
+                logger.info(f"Evicted {excess} embeddings from cache")
+
+
+class RedisEmbeddingCache(EmbeddingCache):
+    """Vectors under <prefix>:<key>; a sorted set of last-use times drives LRU eviction."""
+
+    def __init__(self, url: str, max_entries: int, prefix: str = "embcache"):
+        super().__init__(max_entries)
+        import redis
+
+        self._redis = redis.Redis.from_url(url)
+        self._prefix = prefix
+        self._lru_key = f"{prefix}:lru"
+
+    def _get_many(self, keys: List[str]) -> Dict[str, np.ndarray]:
+        if not keys:
+            return {}
+        blobs = self._redis.mget([f"{self._prefix}:{key}" for key in keys])
+        found = {
+            key: np.frombuffer(blob, dtype=np.float32)
+            for key, blob in zip(keys, blobs)
+            if blob is not None
+        }
+        if found:
+            now = time.time()
+            self._redis.zadd(self._lru_key, {key: now for key in found})
+        return found
+
+    def _put_many(self, items: List[Tuple[str, np.ndarray]]) -> None:
+        now = time.time()
+        pipe = self._redis.pipeline()
+        pipe.mset({f"{self._prefix}:{key}": vector.tobytes() for key, vector in items})
+        pipe.zadd(self._lru_key, {key: now for key, _ in items})
+        pipe.zcard(self._lru_key)
+        count = pipe.execute()[-1]
+        excess = count - self.max_entries
+        if excess > 0:
+            evicted = [key for key, _ in self._redis.zpopmin(self._lru_key, excess)]
+            self._redis.delete(
+                *[f"{self._prefix}:{key.decode() if isinstance(key, bytes) else key}" for key in evicted]
+            )
+            logger.info(f"Evicted {excess} embeddings from cache")
+
+
+def get_embedding_cache() -> Optional[EmbeddingCache]:
+    """Process-local cache instance for EMBEDDING_CACHE_BACKEND, or None when disabled."""
+    global _cache, _cache_pid
+    backend = (settings.EMBEDDING_CACHE_BACKEND or "none").strip().lower()
+    if backend not in ALLOWED_CACHE_BACKENDS:
+        raise ValueError(
+            f"Invalid EMBEDDING_CACHE_BACKEND '{backend}'. Allowed values: none, sqlite, redis."
+        )
+    if backend == "none":
+        return None
+    # Connections must not be shared across forked worker processes.
+    if _cache is None or _cache_pid != os.getpid():
+        if backend == "sqlite":
+            path = settings.EMBEDDING_CACHE_PATH or os.path.join(
+                settings.UPLOAD_DIR, "embedding_cache.sqlite3"
+            )
+            _cache = SQLiteEmbeddingCache(path, settings.EMBEDDING_CACHE_MAX_ENTRIES)
+        else:
+            _cache = RedisEmbeddingCache(settings.REDIS_URL, settings.EMBEDDING_CACHE_MAX_ENTRIES)
+        _cache_pid = os.getpid()
+    return _cache
+
+
+def embedding_cache_stats() -> Dict[str, int]:
+    cache = _cache if _cache_pid == os.getpid() else None
+    return cache.stats() if cache is not None else {"hits": 0, "misses": 0}
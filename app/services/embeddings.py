@@ -1,9 +1,17 @@
 from app.core.config import settings
+import atexit
+import os
+import numpy as np
 import structlog
+from typing import Iterable, Iterator, List
+from app.services.embedding_cache import cache_key, get_embedding_cache
 
 logger = structlog.get_logger()
 
 _model = None
+_tokenizer = None
+_pool = None
+ALLOWED_EMBEDDING_DTYPES = {"float32", "float16"}
 
 def get_model():
     global _model
@@ -16,26 +24,141 @@ def get_model():
             ) from exc
         logger.info(f"Loading embedding model: {settings.EMBEDDING_MODEL}")
         _model = SentenceTransformer(settings.EMBEDDING_MODEL)
+        if _embedding_dtype() == "float16" and _model.device.type == "cuda":
+            _model.half()
     return _model
 
+def _embedding_dtype() -> str:
+    dtype = (settings.EMBEDDING_DTYPE or "float32").strip().lower()
+    if dtype not in ALLOWED_EMBEDDING_DTYPES:
+        raise ValueError(f"Invalid EMBEDDING_DTYPE '{dtype}'. Allowed values: float32, float16.")
+    return dtype
+
+def _stop_pool():
+    global _pool
+    if _pool is not None:
+        get_model().stop_multi_process_pool(_pool)
+        _pool = None
+
+def _get_pool():
+    """Multi-process encode pool (one CPU worker per EMBEDDING_PROCESSES), started once."""
+    global _pool
+    if _pool is None:
+        logger.info(f"Starting embedding pool with {settings.EMBEDDING_PROCESSES} processes")
+        _pool = get_model().start_multi_process_pool(
+            target_devices=["cpu"] * settings.EMBEDDING_PROCESSES
+        )
+        atexit.register(_stop_pool)
+    return _pool
+
+def encode_texts(texts: List[str]) -> np.ndarray:
+    """
+    Encodes texts into one contiguous (len(texts), dim) array of EMBEDDING_DTYPE.
+    Vectors already in the embedding cache are reused; only misses (deduplicated)
+    reach the model, and are written back to the cache in one bulk put.
+    """
+    if not texts:
+        return np.empty((0, settings.EMBEDDING_DIMENSION), dtype=_embedding_dtype())
+
+    cache = get_embedding_cache()
+    if cache is None:
+        return _encode_uncached(texts)
+
+    keys = [cache_key(text) for text in texts]
+    vectors = cache.get_many(keys)
+    missing = {key: text for key, text in zip(keys, texts) if key not in vectors}
+    if missing:
+        encoded = _encode_uncached(list(missing.values()))
+        new_vectors = dict(zip(missing.keys(), encoded))
+        cache.put_many(new_vectors.items())
+        vectors.update(new_vectors)
+    logger.info(
+        f"Embedding cache: {len(texts) - len(missing)} reused, {len(missing)} encoded"
+    )
+    return np.ascontiguousarray(
+        np.stack([vectors[key] for key in keys]), dtype=_embedding_dtype()
+    )
+
+def _encode_uncached(texts: List[str]) -> np.ndarray:
+    """Runs the model; large inputs use the multi-process pool when EMBEDDING_PROCESSES > 1."""
+    model = get_model()
+    batch_size = settings.EMBEDDING_BATCH_SIZE
+
+    order = None
+    if settings.EMBEDDING_SORT_BY_LENGTH:
+        # encode() already sorts within a call; sorting here also keeps the
+        # per-process slices of the multi-process pool length-homogeneous.
+        order = np.argsort([-len(t) for t in texts], kind="stable")
+        texts = [texts[i] for i in order]
+
+    embeddings = None
+    if settings.EMBEDDING_PROCESSES > 1 and len(texts) > batch_size:
+        try:
+            embeddings = model.encode_multi_process(texts, _get_pool(), batch_size=batch_size)
+        except Exception as e:
+            logger.warning(f"Multi-process encoding failed, falling back to single process: {e}")
+    if embeddings is None:
+        embeddings = model.encode(texts, batch_size=batch_size, convert_to_numpy=True)
+
+    embeddings = np.ascontiguousarray(embeddings, dtype=_embedding_dtype())
+    if order is not None:
+        restored = np.empty_like(embeddings)
+        restored[order] = embeddings
+        embeddings = restored
+    return embeddings
+
+def get_tokenizer():
+    """
+    The embedding model's tokenizer. Reuses the loaded model's when there is one;
+    otherwise loads only the tokenizer, so token-mode chunking in the OCR worker
+    does not pull the full model into memory.
+    """
+    global _tokenizer
+    if _model is not None:
+        return _model.tokenizer
+    if _tokenizer is None:
+        try:
+            from transformers import AutoTokenizer
+        except Exception as exc:
+            raise RuntimeError("transformers is required to load the embedding tokenizer.") from exc
+        name = settings.EMBEDDING_MODEL
+        # Same shorthand SentenceTransformer accepts: bare names live under sentence-transformers/.
+        if "/" not in name and not os.path.exists(name):
+            name = f"sentence-transformers/{name}"
+        logger.info(f"Loading embedding tokenizer: {name}")
+        _tokenizer = AutoTokenizer.from_pretrained(name)
+    return _tokenizer
+
+def max_input_tokens() -> int:
+    """Longest input (in tokens, excluding special tokens) the embedding model encodes without truncation."""
+    max_seq_length = _model.max_seq_length if _model is not None else settings.EMBEDDING_MAX_SEQ_LENGTH
+    return max_seq_length - get_tokenizer().num_special_tokens_to_add(pair=False)
+
+def count_tokens(texts: List[str]) -> List[int]:
+    """Token count of each text under the embedding model's own tokenizer (one batched call)."""
+    if not texts:
+        return []
+    encoded = get_tokenizer()(texts, add_special_tokens=False)
+    return [len(ids) for ids in encoded["input_ids"]]
+
 def generate_embeddings(chunks: list):
     """
     Generates embeddings for a list of chunks.
     chunks: list of dicts with "text" and "metadata"
-    Returns: list of (vector, payload)
+    Returns: list of (vector, payload); each vector is a row view into one
+    contiguous array and is only converted to a list at upsert time.
     """
-    model = get_model()
     texts = [c["text"] for c in chunks]
     
     if not texts:
         return []
         
-    embeddings = model.encode(texts)
+    embeddings = encode_texts(texts)
     
     results = []
     for i, emb in enumerate(embeddings):
         results.append({
-            "vector": emb.tolist(),
+            "vector": emb,
             "payload": {
                 "text": chunks[i]["text"],
                 **chunks[i]["metadata"]
@@ -43,3 +166,17 @@ def generate_embeddings(chunks: list):
         })
         
     return results
+
+def iter_embeddings(chunks: Iterable[dict], batch_size: int = 256) -> Iterator[dict]:
+    """
+    Embeds chunks incrementally (e.g. straight from text_processing.iter_chunks),
+    encoding batch_size chunks at a time and yielding one result per chunk.
+    """
+    batch = []
+    for chunk in chunks:
+        batch.append(chunk)
+        if len(batch) >= batch_size:
+            yield from generate_embeddings(batch)
+            batch = []
+    if batch:
+        yield from generate_embeddings(batch)
@@ -2,14 +2,37 @@ from openai import OpenAI
 from app.core.config import settings
 import structlog
 import re
-from typing import List, Dict, Optional
+from typing import Dict, Iterator, List, Optional
 
 logger = structlog.get_logger()
 
+GENERATION_ERROR_MESSAGE = "Sorry, I encountered an error while generating the response."
+CLAIMS_SYSTEM_PROMPT = (
+    "You are a research assistant. Extract atomic research claims from the input text. "
+    "Allowed claim types are METHOD, RESULT, ASSUMPTION. "
+    "Return only a bulleted list where each item follows this exact format: "
+    "- [TYPE] claim sentence. "
+    "Each claim must be a single standalone sentence grounded in the input. "
+    "If no clear claims exist, return an empty response."
+)
+BATCH_CLAIMS_SYSTEM_PROMPT = (
+    "You are a research assistant. Extract atomic research claims from each passage below. "
+    "Passages are introduced by a line of the form ### PASSAGE n. "
+    "Allowed claim types are METHOD, RESULT, ASSUMPTION. "
+    "For every passage, in order, output its header line ### PASSAGE n followed by a bulleted list "
+    "where each item follows this exact format: "
+    "- [TYPE] claim sentence. "
+    "Each claim must be a single standalone sentence grounded in that passage only. "
+    "Output the header even when a passage has no clear claims."
+)
+PASSAGE_HEADER_RE = re.compile(r"^\s*#{2,}\s*PASSAGE\s+(\d+)\s*:?\s*$", re.IGNORECASE | re.MULTILINE)
+
 class LLMClient:
-    def __init__(self):
+    def __init__(self, max_retries: Optional[int] = None):
         self.provider = settings.LLM_PROVIDER
         self.model = settings.LLM_MODEL
+        # SDK-level retries; defaults to LLM_MAX_RETRIES.
+        self.max_retries = settings.LLM_MAX_RETRIES if max_retries is None else max_retries
         self.client: Optional[OpenAI] = None
 
     def _ensure_client(self):
@@ -20,8 +43,10 @@ class LLMClient:
             if not settings.OPENROUTER_API_KEY:
                 raise ValueError("OPENROUTER_API_KEY is not set. Please add it to your .env file.")
             self.client = OpenAI(
-                base_url="https://openrouter.ai/api/v1",
+                base_url=settings.LLM_BASE_URL,
                 api_key=settings.OPENROUTER_API_KEY,
+                timeout=settings.LLM_TIMEOUT_SECONDS,
+                max_retries=self.max_retries,
             )
         else:
             raise ValueError(f"Unknown provider: {self.provider}. Only 'openrouter' is supported.")
@@ -37,17 +62,7 @@ class LLMClient:
             return "assumption"
         return "result"
 
-    def extract_claims_with_types(self, text: str) -> List[Dict[str, str]]:
-        system_prompt = (
-            "You are a research assistant. Extract atomic research claims from the input text. "
-            "Allowed claim types are METHOD, RESULT, ASSUMPTION. "
-            "Return only a bulleted list where each item follows this exact format: "
-            "- [TYPE] claim sentence. "
-            "Each claim must be a single standalone sentence grounded in the input. "
-            "If no clear claims exist, return an empty response."
-        )
-        response = self.generate_response(text, system_prompt=system_prompt)
-
+    def _parse_claims(self, response: str) -> List[Dict[str, str]]:
         claims: List[Dict[str, str]] = []
         typed_line_re = re.compile(r"^\s*[-*]\s*\[(METHOD|RESULT|ASSUMPTION)\]\s*(.+?)\s*$", re.IGNORECASE)
 
@@ -73,28 +88,93 @@ class LLMClient:
 
         return claims
 
+    def extract_claims_with_types(self, text: str) -> List[Dict[str, str]]:
+        response = self.generate_response(text, system_prompt=CLAIMS_SYSTEM_PROMPT)
+        return self._parse_claims(response)
+
+    def extract_claims_batch(self, texts: List[str]) -> List[List[Dict[str, str]]]:
+        """
+        Claims for several chunks from one completion, one list per input text in
+        order. Provider errors propagate (callers retry); if the reply is not split
+        into the requested passages, each text is extracted on its own.
+        """
+        if len(texts) == 1:
+            return [self._parse_claims(self.complete(texts[0], system_prompt=CLAIMS_SYSTEM_PROMPT))]
+
+        prompt = "\n\n".join(
+            f"### PASSAGE {index}\n{text}" for index, text in enumerate(texts, start=1)
+        )
+        response = self.complete(prompt, system_prompt=BATCH_CLAIMS_SYSTEM_PROMPT)
+
+        parts = PASSAGE_HEADER_RE.split(response)
+        # parts = [preamble, number, body, number, body, ...]
+        if len(parts) < 3:
+            logger.warning("Batched claim reply had no passage headers; extracting chunks one by one")
+            return [
+                self._parse_claims(self.complete(text, system_prompt=CLAIMS_SYSTEM_PROMPT))
+                for text in texts
+            ]
+
+        results: List[List[Dict[str, str]]] = [[] for _ in texts]
+        for number, body in zip(parts[1::2], parts[2::2]):
+            index = int(number) - 1
+            if 0 <= index < len(texts):
+                results[index].extend(self._parse_claims(body))
+        return results
+
     def extract_claims(self, text: str):
         # Backward-compatible helper for older call sites.
         return [c["text"] for c in self.extract_claims_with_types(text)]
 
-    def generate_response(self, prompt: str, system_prompt: str = None):
+    def _messages(self, prompt: str, system_prompt: str = None) -> List[Dict[str, str]]:
         messages = []
         if system_prompt:
             messages.append({"role": "system", "content": system_prompt})
         
         messages.append({"role": "user", "content": prompt})
-        
+        return messages
+
+    def complete(self, prompt: str, system_prompt: str = None) -> str:
+        """Completion text; unlike generate_response, provider errors are raised."""
+        client = self._ensure_client()
+        response = client.chat.completions.create(
+            model=self.model,
+            messages=self._messages(prompt, system_prompt),
+            temperature=0.7,
+        )
+        return response.choices[0].message.content or ""
+
+    def generate_response(self, prompt: str, system_prompt: str = None):
+        try:
+            return self.complete(prompt, system_prompt=system_prompt)
+        except Exception as e:
+            logger.error(f"LLM generation failed: {e}")
+            return GENERATION_ERROR_MESSAGE
+
+    def stream_response(self, prompt: str, system_prompt: str = None) -> Iterator[str]:
+        """
+        Yield completion text deltas as the provider streams them. Any failure, before
+        or after partial output, is logged and re-raised so callers can report it
+        instead of treating an error as answer text.
+        """
+        messages = self._messages(prompt, system_prompt)
+
         try:
             client = self._ensure_client()
-            response = client.chat.completions.create(
+            stream = client.chat.completions.create(
                 model=self.model,
                 messages=messages,
                 temperature=0.7,
-                # stream=True # Support streaming later?
+                stream=True,
             )
-            return response.choices[0].message.content
+            for chunk in stream:
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if delta:
+                    yield delta
         except Exception as e:
-            logger.error(f"LLM generation failed: {e}")
-            return "Sorry, I encountered an error while generating the response."
+            logger.error(f"LLM streaming failed: {e}")
+            raise
 
 llm_client = LLMClient()
@@ -1,19 +1,21 @@
+import os
 import re
+from concurrent.futures import ProcessPoolExecutor
 from typing import Any, Dict, List, Optional, Tuple
 
 import fitz  # PyMuPDF
+import numpy as np
 import pandas as pd
 import structlog
-import torch
-from doctr.models import ocr_predictor
 
+from app.core.config import settings
 from app.services.sections import SECTION_ALIASES, normalize_section_name, section_bucket
 
 logger = structlog.get_logger()
 
 _predictor = None
 KNOWN_CANONICAL_SECTIONS = set(SECTION_ALIASES.values()) - {"General"}
-ALLOWED_OCR_MODES = {"auto", "always", "never"}
+ALLOWED_OCR_MODES = {"auto", "always", "never", "per_page"}
 
 # Most section headers in research papers are short; long lines are likely body text.
 MAX_SECTION_HEADING_WORDS = 8
@@ -23,6 +25,14 @@ HEADING_PREFIX_RE = re.compile(
     flags=re.IGNORECASE,
 )
 
+WHITESPACE_RE = re.compile(r"\s+")
+DIGIT_RE = re.compile(r"\d")
+
+# Table detection pre-filter: find_tables() only runs on pages with a table caption
+# or with enough ruling lines/rectangles to form a grid.
+TABLE_CAPTION_RE = re.compile(r"^\s*tab(?:le|\.)\s*(?:\d+|[IVXLC]+)\b", flags=re.IGNORECASE)
+ALLOWED_TABLE_DETECTION_MODES = {"auto", "always", "never"}
+
 # Digital PDF detection thresholds.
 DIGITAL_TEXT_PAGE_WORD_THRESHOLD = 20
 DIGITAL_TOTAL_WORD_THRESHOLD = 80
@@ -32,6 +42,10 @@ DIGITAL_PAGE_RATIO_THRESHOLD = 0.3
 def get_predictor():
     global _predictor
     if _predictor is None:
+        # Imported lazily so digital-only extraction (and pool workers) never load torch.
+        import torch
+        from doctr.models import ocr_predictor
+
         device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
         logger.info(f"Loading Doctr model on {device}")
         try:
@@ -99,11 +113,19 @@ def _clean_table_columns(columns: List[Any]) -> List[str]:
     return cleaned
 
 
-def _sanitize_cell(value: Any) -> str:
-    if pd.isna(value):
-        return ""
-    text = re.sub(r"\s+", " ", str(value)).strip()
-    return text
+def _sanitize_cells(values: np.ndarray) -> np.ndarray:
+    """Collapse whitespace in every cell, column by column; missing cells become ""."""
+    cells = np.empty(values.shape, dtype=object)
+    for col_pos in range(values.shape[1]):
+        column = pd.Series(values[:, col_pos], dtype=object)
+        cells[:, col_pos] = (
+            column.astype(str)
+            .str.replace(WHITESPACE_RE, " ", regex=True)
+            .str.strip()
+            .to_numpy(dtype=object)
+        )
+    cells[pd.isna(values)] = ""
+    return cells
 
 
 def _table_to_payload(
@@ -116,23 +138,29 @@ def _table_to_payload(
     table_df.columns = _clean_table_columns(list(table_df.columns))
     table_df = table_df.fillna("")
 
-    normalized_rows = []
-    metric_facts = []
-    for row_idx, (_, row) in enumerate(table_df.iterrows(), start=1):
-        pairs = []
-        for col in table_df.columns:
-            value = _sanitize_cell(row[col])
-            if not value:
-                continue
-            pairs.append(f"{col}={value}")
-            if re.search(r"\d", value):
-                metric_facts.append(
-                    f"Table {table_idx + 1}, row {row_idx}: {col} is {value}"
-                )
-        if pairs:
-            normalized_rows.append(
-                f"Table {table_idx + 1}, row {row_idx}: " + "; ".join(pairs)
-            )
+    # to_numpy() yields the same row-wise values (and dtype upcasting) as iterrows().
+    cells = _sanitize_cells(table_df.to_numpy())
+    present = cells != ""
+    has_digit = np.column_stack(
+        [
+            pd.Series(cells[:, col_pos], dtype=object).str.contains(DIGIT_RE).to_numpy(dtype=bool)
+            for col_pos in range(cells.shape[1])
+        ]
+    )
+    columns = np.array(table_df.columns, dtype=object)
+    pairs = (columns + "=") + cells
+    table_label = f"Table {table_idx + 1}"
+
+    normalized_rows = [
+        f"{table_label}, row {row_idx}: " + "; ".join(row_pairs[row_present])
+        for row_idx, (row_pairs, row_present) in enumerate(zip(pairs, present), start=1)
+        if row_present.any()
+    ]
+    fact_rows, fact_cols = np.nonzero(present & has_digit)
+    metric_facts = [
+        f"{table_label}, row {row_pos + 1}: {columns[col_pos]} is {cells[row_pos, col_pos]}"
+        for row_pos, col_pos in zip(fact_rows.tolist(), fact_cols.tolist())
+    ]
 
     dedup_metric_facts = list(dict.fromkeys(metric_facts))
     return {
@@ -146,6 +174,34 @@ def _table_to_payload(
     }
 
 
+def _count_rule_items(page: fitz.Page) -> int:
+    get_drawings = getattr(page, "get_cdrawings", None) or page.get_drawings
+    return sum(
+        1
+        for path in get_drawings()
+        for item in path.get("items", ())
+        if item[0] in ("l", "re", "qu")
+    )
+
+
+def _page_may_contain_tables(page: fitz.Page, page_lines: List[str]) -> bool:
+    mode = (settings.TABLE_DETECTION_MODE or "auto").strip().lower()
+    if mode not in ALLOWED_TABLE_DETECTION_MODES:
+        raise ValueError(
+            f"Invalid TABLE_DETECTION_MODE '{mode}'. Allowed values: auto, always, never."
+        )
+    if mode != "auto":
+        return mode == "always"
+
+    if any(TABLE_CAPTION_RE.match(line or "") for line in page_lines):
+        return True
+    try:
+        return _count_rule_items(page) >= settings.TABLE_MIN_RULE_ITEMS
+    except Exception as e:
+        logger.warning(f"Drawing inspection failed on page {page.number + 1}: {e}")
+        return True
+
+
 def _extract_page_tables(
     page: fitz.Page, page_num: int, current_section: str
 ) -> List[Dict[str, Any]]:
@@ -193,47 +249,115 @@ def _extract_content_from_lines(
     return page_content, section_state
 
 
-def _extract_page_content_from_digital_text(
-    page: fitz.Page, current_section: str
-) -> Tuple[List[Dict[str, Any]], str]:
-    page_text = page.get_text("text") or ""
-    lines = page_text.splitlines()
-    return _extract_content_from_lines(lines, current_section)
+def _digital_page_lines(
+    page: fitz.Page, page_texts: Optional[Dict[int, str]] = None
+) -> List[str]:
+    # Reuse text captured during digital detection; each entry is consumed once.
+    page_text = page_texts.pop(page.number, None) if page_texts is not None else None
+    if page_text is None:
+        page_text = page.get_text("text") or ""
+    return page_text.splitlines()
 
 
-def _extract_page_content_with_ocr(
-    page: fitz.Page, predictor: Any, current_section: str
-) -> Tuple[List[Dict[str, Any]], str]:
-    import cv2
-    import numpy as np
+def _render_page(page: fitz.Page, dpi: int) -> fitz.Pixmap:
+    return page.get_pixmap(dpi=dpi, colorspace=fitz.csRGB, alpha=False)
+
+
+def _pixmap_to_rgb_array(pix: fitz.Pixmap) -> Any:
+    """
+    View the pixmap sample buffer as an HxWx3 uint8 array without copying.
+    The pixmap owns the memory, so it must outlive the returned array.
+    """
+    samples = np.frombuffer(pix.samples_mv, dtype=np.uint8)
+    rows = samples.reshape(pix.height, pix.stride)
+    img = rows[:, : pix.width * pix.n].reshape(pix.height, pix.width, pix.n)
+    if pix.n == 1:
+        return np.repeat(img, 3, axis=2)
+    return img[:, :, :3] if pix.n > 3 else img
+
+
+def _ocr_render_dpi(ocr_mode: Optional[str]) -> int:
+    mode = (ocr_mode or "auto").strip().lower()
+    return settings.OCR_RENDER_DPI_BY_MODE.get(mode, settings.OCR_RENDER_DPI)
 
-    pix = page.get_pixmap(matrix=fitz.Matrix(2, 2))
-    img_bytes = pix.tobytes("png")
-    nparr = np.frombuffer(img_bytes, np.uint8)
-    img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-    img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
-    result = predictor([img])
 
+def _ocr_page_lines(ocr_page: Any) -> List[str]:
     lines = []
-    for block in result.pages[0].blocks:
+    for block in ocr_page.blocks:
         for line in block.lines:
             lines.append(" ".join(word.value for word in line.words).strip())
+    return lines
 
-    return _extract_content_from_lines(lines, current_section)
 
+def _ocr_page_batches(
+    doc: fitz.Document,
+    batch_size: int,
+    max_batch_bytes: int,
+    dpi: int,
+    page_indices: Optional[List[int]] = None,
+) -> List[List[int]]:
+    """
+    Group page indices (all pages by default) into predictor batches bounded by
+    page count and by the estimated size of the rasterized RGB images. A page
+    larger than the memory cap still gets a batch of its own.
+    """
+    batches = []
+    batch: List[int] = []
+    batch_bytes = 0
+    scale = dpi / 72
+    if page_indices is None:
+        page_indices = list(range(len(doc)))
+    for page_idx in page_indices:
+        rect = doc[page_idx].rect
+        page_bytes = int(rect.width * scale) * int(rect.height * scale) * 3
+        if batch and (len(batch) >= batch_size or batch_bytes + page_bytes > max_batch_bytes):
+            batches.append(batch)
+            batch = []
+            batch_bytes = 0
+        batch.append(page_idx)
+        batch_bytes += page_bytes
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+def _detect_digital_pdf(
+    doc: fitz.Document,
+    page_texts: Optional[Dict[int, str]] = None,
+    sample_pages: int = 0,
+) -> Dict[str, Any]:
+    """
+    Decide whether the PDF carries usable embedded text.
 
-def _detect_digital_pdf(doc: fitz.Document) -> Dict[str, Any]:
+    When `page_texts` is given, the text read for each scanned page is stored in it
+    (keyed by page index) so extraction does not read it again. With `sample_pages`
+    set and a longer document, only an evenly spaced sample is scanned and the scan
+    stops as soon as the document qualifies as digital.
+    """
     total_pages = len(doc)
+    sampled = 0 < sample_pages < total_pages
+    if sampled:
+        page_indices = sorted({(idx * total_pages) // sample_pages for idx in range(sample_pages)})
+    else:
+        page_indices = range(total_pages)
+
+    pages_scanned = 0
     pages_with_text = 0
     total_words = 0
 
-    for page in doc:
-        word_count = len((page.get_text("text") or "").split())
+    for page_idx in page_indices:
+        page_text = doc[page_idx].get_text("text") or ""
+        if page_texts is not None:
+            page_texts[page_idx] = page_text
+        word_count = len(page_text.split())
+        pages_scanned += 1
         total_words += word_count
         if word_count >= DIGITAL_TEXT_PAGE_WORD_THRESHOLD:
             pages_with_text += 1
+        if sampled and total_words >= DIGITAL_TOTAL_WORD_THRESHOLD and pages_with_text >= 1:
+            break
 
-    text_page_ratio = (pages_with_text / total_pages) if total_pages else 0.0
+    text_page_ratio = (pages_with_text / pages_scanned) if pages_scanned else 0.0
     is_digital_pdf = (
         total_words >= DIGITAL_TOTAL_WORD_THRESHOLD
         and (
@@ -242,12 +366,14 @@ def _detect_digital_pdf(doc: fitz.Document) -> Dict[str, Any]:
         )
     )
 
-    if total_pages and pages_with_text == total_pages and total_words > 20:
+    if pages_scanned and pages_with_text == pages_scanned and total_words > 20:
         is_digital_pdf = True
 
     return {
         "is_digital_pdf": is_digital_pdf,
         "total_pages": total_pages,
+        "pages_scanned": pages_scanned,
+        "detection_sampled": sampled,
         "pages_with_text": pages_with_text,
         "total_words": total_words,
         "text_page_ratio": round(text_page_ratio, 3),
@@ -260,7 +386,7 @@ def _resolve_ocr_strategy(
     mode = (ocr_mode or "auto").strip().lower()
     if mode not in ALLOWED_OCR_MODES:
         raise ValueError(
-            f"Invalid ocr_mode '{ocr_mode}'. Allowed values: auto, always, never."
+            f"Invalid ocr_mode '{ocr_mode}'. Allowed values: auto, always, never, per_page."
         )
 
     if mode == "always":
@@ -281,6 +407,24 @@ def _resolve_ocr_strategy(
             "ingestion_mode": "digital_text",
         }
 
+    if mode == "per_page":
+        # Only pages below DIGITAL_TEXT_PAGE_WORD_THRESHOLD are OCR'd.
+        if digital_signal.get("pages_with_text") == digital_signal.get("pages_scanned"):
+            return {
+                "ocr_mode_requested": mode,
+                "ocr_used": False,
+                "ocr_skipped": True,
+                "ocr_skip_reason": "all_pages_have_text",
+                "ingestion_mode": "digital_text",
+            }
+        return {
+            "ocr_mode_requested": mode,
+            "ocr_used": True,
+            "ocr_skipped": False,
+            "ocr_skip_reason": None,
+            "ingestion_mode": "hybrid",
+        }
+
     if digital_signal.get("is_digital_pdf"):
         return {
             "ocr_mode_requested": mode,
@@ -299,48 +443,254 @@ def _resolve_ocr_strategy(
     }
 
 
+def _resolve_extraction_workers(workers: Optional[int], total_pages: int) -> int:
+    requested = settings.PDF_EXTRACTION_WORKERS if workers is None else workers
+    if requested <= 0:
+        requested = os.cpu_count() or 1
+    if total_pages < max(settings.PDF_PARALLEL_MIN_PAGES, 2):
+        return 1
+    return max(1, min(requested, total_pages))
+
+
+def _page_shards(total_pages: int, workers: int) -> List[Tuple[int, int]]:
+    # A few shards per worker keeps the pool busy when some pages are table-heavy.
+    shard_count = min(total_pages, workers * 4)
+    shard_size = -(-total_pages // shard_count)
+    return [
+        (start, min(start + shard_size, total_pages))
+        for start in range(0, total_pages, shard_size)
+    ]
+
+
+def _extract_digital_page_range(
+    file_path: str, start: int, stop: int, page_texts: Optional[Dict[int, str]] = None
+) -> List[Dict[str, Any]]:
+    """
+    Pool worker: reopen the document and extract raw lines and tables for pages [start, stop).
+    Sections are not known here; tables carry a placeholder until the pages are stitched.
+    """
+    raw_pages = []
+    with fitz.open(file_path) as doc:
+        for page_idx in range(start, stop):
+            page = doc[page_idx]
+            page_num = page_idx + 1
+            lines = _digital_page_lines(page, page_texts)
+            tables_scanned = _page_may_contain_tables(page, lines)
+            raw_pages.append(
+                {
+                    "page": page_num,
+                    "lines": lines,
+                    "tables": (
+                        _extract_page_tables(page, page_num, "General") if tables_scanned else []
+                    ),
+                    "tables_scanned": tables_scanned,
+                }
+            )
+    return raw_pages
+
+
+def _stitch_page_results(raw_pages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Thread section state across worker-extracted pages in page order."""
+    results = []
+    current_section = "General"
+    for raw_page in sorted(raw_pages, key=lambda p: p["page"]):
+        page_content, current_section = _extract_content_from_lines(
+            raw_page["lines"], current_section
+        )
+        # Tables are labeled with the section active at the end of their page,
+        # matching the serial extraction path.
+        for table in raw_page["tables"]:
+            table["section"] = current_section
+            table["section_bucket"] = section_bucket(current_section)
+        results.append(
+            {
+                "page": raw_page["page"],
+                "content": page_content,
+                "tables": raw_page["tables"],
+                "tables_scanned": raw_page["tables_scanned"],
+            }
+        )
+    return results
+
+
+def _extract_digital_pages_parallel(
+    file_path: str,
+    total_pages: int,
+    workers: int,
+    page_texts: Optional[Dict[int, str]] = None,
+) -> List[Dict[str, Any]]:
+    page_texts = page_texts or {}
+    shards = _page_shards(total_pages, workers)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        shard_results = pool.map(
+            _extract_digital_page_range,
+            [file_path] * len(shards),
+            [start for start, _ in shards],
+            [stop for _, stop in shards],
+            [
+                {idx: page_texts[idx] for idx in range(start, stop) if idx in page_texts}
+                for start, stop in shards
+            ],
+        )
+        raw_pages = [raw_page for shard in shard_results for raw_page in shard]
+    return _stitch_page_results(raw_pages)
+
+
+def _extract_digital_pages_serial(
+    doc: fitz.Document, page_texts: Optional[Dict[int, str]] = None
+) -> List[Dict[str, Any]]:
+    results = []
+    current_section = "General"
+
+    for page_num, page in enumerate(doc, start=1):
+        lines = _digital_page_lines(page, page_texts)
+        page_content, current_section = _extract_content_from_lines(lines, current_section)
+        tables_scanned = _page_may_contain_tables(page, lines)
+        page_tables = (
+            _extract_page_tables(page, page_num, current_section) if tables_scanned else []
+        )
+        results.append(
+            {
+                "page": page_num,
+                "content": page_content,
+                "tables": page_tables,
+                "tables_scanned": tables_scanned,
+            }
+        )
+    return results
+
+
+def _low_text_pages(doc: fitz.Document, page_texts: Dict[int, str]) -> List[int]:
+    return [
+        page_idx
+        for page_idx in range(len(doc))
+        if len(page_texts.get(page_idx, "").split()) < DIGITAL_TEXT_PAGE_WORD_THRESHOLD
+    ]
+
+
+def _ocr_lines_by_page(
+    doc: fitz.Document, predictor: Any, dpi: int, page_indices: List[int]
+) -> Dict[int, List[str]]:
+    ocr_lines = {}
+    batches = _ocr_page_batches(
+        doc,
+        batch_size=max(1, settings.OCR_BATCH_SIZE),
+        max_batch_bytes=settings.OCR_BATCH_MAX_MB * 1024 * 1024,
+        dpi=dpi,
+        page_indices=page_indices,
+    )
+
+    for batch in batches:
+        # Keep the pixmaps referenced until inference is done: the arrays are views into them.
+        pixmaps = [_render_page(doc[page_idx], dpi) for page_idx in batch]
+        images = [_pixmap_to_rgb_array(pix) for pix in pixmaps]
+        ocr_result = predictor(images)
+        del images, pixmaps
+
+        for page_idx, ocr_page in zip(batch, ocr_result.pages):
+            ocr_lines[page_idx] = _ocr_page_lines(ocr_page)
+    return ocr_lines
+
+
+def _extract_pages_with_ocr(
+    doc: fitz.Document,
+    predictor: Any,
+    dpi: int,
+    ocr_pages: Optional[List[int]] = None,
+    page_texts: Optional[Dict[int, str]] = None,
+) -> List[Dict[str, Any]]:
+    """OCR `ocr_pages` (all pages by default); every other page uses its embedded text."""
+    if ocr_pages is None:
+        ocr_pages = list(range(len(doc)))
+    ocr_lines = _ocr_lines_by_page(doc, predictor, dpi, ocr_pages)
+
+    results = []
+    current_section = "General"
+    for page_num, page in enumerate(doc, start=1):
+        if page.number in ocr_lines:
+            lines = ocr_lines.pop(page.number)
+        else:
+            lines = _digital_page_lines(page, page_texts)
+        page_content, current_section = _extract_content_from_lines(lines, current_section)
+        tables_scanned = _page_may_contain_tables(page, lines)
+        page_tables = (
+            _extract_page_tables(page, page_num, current_section) if tables_scanned else []
+        )
+        results.append(
+            {
+                "page": page_num,
+                "content": page_content,
+                "tables": page_tables,
+                "tables_scanned": tables_scanned,
+            }
+        )
+    return results
+
+
 def extract_text_from_pdf(
-    file_path: str, ocr_mode: str = "auto"
+    file_path: str, ocr_mode: str = "auto", workers: Optional[int] = None
 ) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
     """
     Extract text and tables from PDF with optional OCR:
     - auto: skip OCR for digital PDFs
     - always: always run OCR
     - never: never run OCR (embedded text only)
+    - per_page: OCR only pages whose embedded text is below the per-page word threshold
+
+    Digital text extraction is sharded across a process pool of `workers` processes
+    (defaults to settings.PDF_EXTRACTION_WORKERS; 0 means one per CPU). OCR pages
+    always run in-process because the predictor is already multi-threaded; they are
+    rasterized and recognized in batches of settings.OCR_BATCH_SIZE pages.
     """
     doc = None
     try:
         doc = fitz.open(file_path)
-        digital_signal = _detect_digital_pdf(doc)
+        per_page = (ocr_mode or "").strip().lower() == "per_page"
+        page_texts: Dict[int, str] = {}
+        # Per-page routing needs a word count for every page, so it never samples.
+        digital_signal = _detect_digital_pdf(
+            doc,
+            page_texts,
+            sample_pages=0 if per_page else settings.DIGITAL_DETECTION_SAMPLE_PAGES,
+        )
         strategy = _resolve_ocr_strategy(ocr_mode, digital_signal)
 
-        results = []
-        predictor = get_predictor() if strategy["ocr_used"] else None
-        current_section = "General"
+        extraction_workers = 1
+        if not strategy["ocr_used"]:
+            extraction_workers = _resolve_extraction_workers(workers, len(doc))
 
-        for page_num, page in enumerate(doc, start=1):
-            if strategy["ocr_used"]:
-                page_content, current_section = _extract_page_content_with_ocr(
-                    page, predictor, current_section
+        results = None
+        if extraction_workers > 1:
+            try:
+                results = _extract_digital_pages_parallel(
+                    file_path, len(doc), extraction_workers, page_texts
                 )
-            else:
-                page_content, current_section = _extract_page_content_from_digital_text(
-                    page, current_section
+            except Exception as e:
+                logger.warning(
+                    f"Parallel page extraction failed, falling back to serial: {e}"
                 )
-
-            page_tables = _extract_page_tables(page, page_num, current_section)
-            results.append(
-                {
-                    "page": page_num,
-                    "content": page_content,
-                    "tables": page_tables,
-                }
+                extraction_workers = 1
+        ocr_render_dpi = None
+        ocr_pages: List[int] = []
+        if results is None and strategy["ocr_used"]:
+            ocr_render_dpi = _ocr_render_dpi(strategy["ocr_mode_requested"])
+            ocr_pages = _low_text_pages(doc, page_texts) if per_page else list(range(len(doc)))
+            results = _extract_pages_with_ocr(
+                doc, get_predictor(), ocr_render_dpi, ocr_pages, page_texts
             )
+        elif results is None:
+            results = _extract_digital_pages_serial(doc, page_texts)
 
         extraction_meta = {
             **strategy,
             "pdf_type": "digital" if digital_signal["is_digital_pdf"] else "scanned_or_image",
             "digital_signal": digital_signal,
+            "extraction_workers": extraction_workers,
+            "ocr_render_dpi": ocr_render_dpi,
+            "ocr_pages_count": len(ocr_pages),
+            "digital_pages_count": len(doc) - len(ocr_pages),
+            "table_pages_scanned": sum(1 for page in results if page["tables_scanned"]),
+            "table_pages_skipped": sum(1 for page in results if not page["tables_scanned"]),
         }
         return results, extraction_meta
     except Exception as e:
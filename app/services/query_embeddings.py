@@ -0,0 +1,133 @@
+import asyncio
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import numpy as np
+import structlog
+
+from app.core.config import settings
+
+logger = structlog.get_logger()
+
+
+class QueryEmbedder:
+    """
+    Embeds /chat queries off the event loop.
+
+    Recent query vectors are kept in a bounded LRU with a TTL. Cache misses that
+    arrive within batch_window_ms of each other are coalesced (identical queries
+    share one slot) into a single model.encode call on a dedicated thread.
+    """
+
+    def __init__(
+        self,
+        max_entries: int,
+        ttl_seconds: float,
+        batch_window_ms: float,
+        max_batch_size: int,
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.batch_window = batch_window_ms / 1000
+        self.max_batch_size = max(1, max_batch_size)
+        self._cache: "OrderedDict[str, Tuple[float, List[float]]]" = OrderedDict()
+        self._pending: Dict[str, Tuple[str, asyncio.Future]] = {}
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self._tasks: Set[asyncio.Task] = set()
+        # One thread: torch already parallelizes inside encode, and batches queue up behind it.
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="query-embed")
+        self.hits = 0
+        self.misses = 0
+        self.batches = 0
+
+    @staticmethod
+    def _key(query: str) -> str:
+        return f"{settings.EMBEDDING_MODEL}\x00{' '.join(query.split())}"
+
+    def _cache_get(self, key: str) -> Optional[List[float]]:
+        entry = self._cache.get(key)
+        if entry is None:
+            return None
+        expires_at, vector = entry
+        if expires_at < time.monotonic():
+            del self._cache[key]
+            return None
+        self._cache.move_to_end(key)
+        return vector
+
+    def _cache_put(self, key: str, vector: List[float]) -> None:
+        self._cache[key] = (time.monotonic() + self.ttl_seconds, vector)
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.max_entries:
+            self._cache.popitem(last=False)
+
+    async def embed(self, query: str, model: Any) -> List[float]:
+        key = self._key(query)
+        vector = self._cache_get(key)
+        if vector is not None:
+            self.hits += 1
+            return vector
+        self.misses += 1
+
+        pending = self._pending.get(key)
+        if pending is None:
+            loop = asyncio.get_running_loop()
+            pending = (query, loop.create_future())
+            self._pending[key] = pending
+            if len(self._pending) >= self.max_batch_size:
+                self._flush(model)
+            elif self._flush_handle is None:
+                self._flush_handle = loop.call_later(self.batch_window, self._flush, model)
+        # Shielded so one cancelled request does not cancel the shared result.
+        return await asyncio.shield(pending[1])
+
+    def _flush(self, model: Any) -> None:
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        batch, self._pending = self._pending, {}
+        if batch:
+            task = asyncio.get_running_loop().create_task(self._run_batch(batch, model))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    @staticmethod
+    def _encode(model: Any, texts: List[str]) -> List[List[float]]:
+        return np.atleast_2d(model.encode(texts, batch_size=len(texts))).tolist()
+
+    async def _run_batch(self, batch: Dict[str, Tuple[str, asyncio.Future]], model: Any) -> None:
+        texts = [query for query, _ in batch.values()]
+        self.batches += 1
+        try:
+            vectors = await asyncio.get_running_loop().run_in_executor(
+                self._executor, self._encode, model, texts
+            )
+        except Exception as e:
+            logger.error(f"Query embedding failed: {e}")
+            for _, future in batch.values():
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (key, (_, future)), vector in zip(batch.items(), vectors):
+            self._cache_put(key, vector)
+            if not future.done():
+                future.set_result(vector)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "batches": self.batches,
+            "cached": len(self._cache),
+        }
+
+
+query_embedder = QueryEmbedder(
+    max_entries=settings.QUERY_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.QUERY_CACHE_TTL_SECONDS,
+    batch_window_ms=settings.QUERY_BATCH_WINDOW_MS,
+    max_batch_size=settings.QUERY_BATCH_MAX_SIZE,
+)
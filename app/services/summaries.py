@@ -0,0 +1,196 @@
+import asyncio
+import hashlib
+import json
+import os
+import re
+import shutil
+import time
+from typing import Any, Callable, List, Optional
+
+import structlog
+
+from app.core.config import settings
+from app.core.executors import run_blocking
+from app.services.llm import GENERATION_ERROR_MESSAGE, llm_client
+from app.services.text_store import hydrate_hits
+from app.services.vector_store import search_vectors
+
+logger = structlog.get_logger()
+
+# Bump whenever SUMMARY_SYSTEM_PROMPT, the evidence layout or SUMMARY_TARGETS change,
+# so summaries produced by the old prompt stop being served.
+SUMMARY_PROMPT_VERSION = "v1"
+SUMMARY_SYSTEM_PROMPT = (
+    "You are a research assistant. Produce a paper-at-a-glance summary from evidence only.\n"
+    "Return exactly these sections in order:\n"
+    "1) Problem\n"
+    "2) Method\n"
+    "3) Key Results\n"
+    "4) Limitations\n"
+    "Under each section, provide bullet points and include citations in the form [Page X, Section Y].\n"
+    "Use short verbatim quotes when possible.\n"
+    "If evidence for a section is missing, write one bullet: Insufficient evidence."
+)
+SUMMARY_TARGETS = {
+    "Problem": ["Abstract", "Introduction", "Related Work"],
+    "Method": ["Methods"],
+    "Key Results": ["Results"],
+    "Limitations": ["Limitations", "Conclusion"],
+}
+# doc_ids are sha256 hex digests; anything else is never used as a path component.
+SAFE_DOC_ID_RE = re.compile(r"^[A-Za-z0-9_-]{1,128}$")
+
+
+def _summary_bucket(label: str) -> str:
+    bucket_name = label.lower().replace(" ", "_")
+    return "results" if bucket_name == "key_results" else bucket_name
+
+
+def _format_hit(hit: Any) -> str:
+    payload = hit.payload
+    return (
+        f"[Page {payload.get('page')}, Section {payload.get('section', 'General')}] "
+        f"{payload.get('text', '')}"
+    )
+
+
+async def gather_summary_context(doc_id: str, search: Callable[..., List[Any]]) -> str:
+    """
+    Evidence text for the summary prompt, or "" when the document has no chunks.
+    The section lookups run together on the Qdrant pool, then the coarse bucket
+    fallbacks run together for just the labels that came back empty.
+    """
+    labels = list(SUMMARY_TARGETS)
+    section_results = await asyncio.gather(*(
+        run_blocking(
+            "qdrant",
+            search,
+            doc_id=doc_id,
+            sections=SUMMARY_TARGETS[label],
+            top_k=settings.SUMMARY_TOP_K_PER_SECTION,
+        )
+        for label in labels
+    ))
+    hits_by_label = dict(zip(labels, section_results))
+
+    # Fallback to coarse bucket retrieval.
+    missing = [label for label in labels if not hits_by_label[label]]
+    bucket_results = await asyncio.gather(*(
+        run_blocking(
+            "qdrant",
+            search,
+            doc_id=doc_id,
+            section_bucket=_summary_bucket(label),
+            top_k=settings.SUMMARY_TOP_K_PER_SECTION,
+        )
+        for label in missing
+    ))
+    hits_by_label.update(zip(missing, bucket_results))
+
+    selected = [(label, list(hits_by_label[label] or [])) for label in labels]
+    # One side-store lookup for every hit that made it into the prompt.
+    await run_blocking("qdrant", hydrate_hits, [hit for _, hits in selected for hit in hits])
+
+    context_sections = []
+    for label, hits in selected:
+        if hits:
+            context_sections.append(
+                f"{label} Evidence:\n" + "\n".join(_format_hit(hit) for hit in hits)
+            )
+
+    context_text = "\n\n".join(context_sections)
+    if not context_text:
+        # Fallback: get first few chunks if no section cues were captured.
+        hits = await run_blocking(
+            "qdrant", search, doc_id=doc_id, top_k=settings.SUMMARY_FALLBACK_TOP_K
+        )
+        hits = await run_blocking("qdrant", hydrate_hits, list(hits or []))
+        context_text = "\n".join(_format_hit(hit) for hit in hits)
+    return context_text
+
+
+def summary_prompt(context_text: str) -> str:
+    return (
+        f"Evidence:\n{context_text}\n\n"
+        "Generate the structured summary now."
+    )
+
+
+class SummaryStore:
+    """
+    Generated summaries on disk, one JSON file per (prompt version, LLM model) under
+    <root>/<doc_id>/. The directory is shared by the API and the worker through the
+    uploads volume; any I/O problem degrades to a cache miss.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def _doc_dir(self, doc_id: str) -> Optional[str]:
+        if not SAFE_DOC_ID_RE.match(doc_id or ""):
+            return None
+        return os.path.join(self.root, doc_id)
+
+    def _path(self, doc_id: str, model: Optional[str]) -> Optional[str]:
+        doc_dir = self._doc_dir(doc_id)
+        if doc_dir is None:
+            return None
+        model = model or settings.LLM_MODEL
+        model_hash = hashlib.sha256(model.encode("utf-8")).hexdigest()[:16]
+        return os.path.join(doc_dir, f"{SUMMARY_PROMPT_VERSION}-{model_hash}.json")
+
+    def get(self, doc_id: str, model: Optional[str] = None) -> Optional[str]:
+        path = self._path(doc_id, model)
+        if path is None:
+            return None
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                record = json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable summary cache entry {path}: {e}")
+            return None
+        return record.get("summary")
+
+    def put(self, doc_id: str, summary: str, model: Optional[str] = None) -> None:
+        path = self._path(doc_id, model)
+        if path is None:
+            return
+        record = {
+            "doc_id": doc_id,
+            "prompt_version": SUMMARY_PROMPT_VERSION,
+            "model": model or settings.LLM_MODEL,
+            "created_at": time.time(),
+            "summary": summary,
+        }
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(record, f)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"Could not store summary for {doc_id}: {e}")
+
+    def invalidate(self, doc_id: str) -> None:
+        doc_dir = self._doc_dir(doc_id)
+        if doc_dir is not None:
+            shutil.rmtree(doc_dir, ignore_errors=True)
+
+
+def get_summary_store() -> SummaryStore:
+    return SummaryStore(settings.SUMMARY_CACHE_DIR or os.path.join(settings.UPLOAD_DIR, "summaries"))
+
+
+def generate_summary(doc_id: str) -> Optional[str]:
+    """Build and store the summary for doc_id outside a request (used by the worker)."""
+    context_text = asyncio.run(gather_summary_context(doc_id, search_vectors))
+    if not context_text:
+        return None
+    summary = llm_client.generate_response(
+        summary_prompt(context_text), system_prompt=SUMMARY_SYSTEM_PROMPT
+    )
+    if summary and summary != GENERATION_ERROR_MESSAGE:
+        get_summary_store().put(doc_id, summary, model=llm_client.model)
+    return summary
@@ -1,148 +1,293 @@
-from typing import List, Dict, Any
+from bisect import bisect_left, bisect_right
+from itertools import accumulate
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
 from app.core.config import settings
+from app.services.embeddings import count_tokens, max_input_tokens
 from app.services.sections import normalize_section_name, section_bucket
 
+ALLOWED_CHUNK_MODES = {"words", "tokens"}
 
-def _chunk_words(
-    words: List[str],
-    pages: List[int],
+
+class _SectionWords:
+    """
+    Words of the section being chunked. Page boundaries are kept as run-length
+    offsets (one entry per page change, not per word), and words that no pending
+    chunk can reach any more are dropped as chunks are emitted.
+    """
+
+    def __init__(self, chunk_size: int, overlap: int):
+        self.chunk_size = chunk_size
+        self.overlap = overlap
+        self.step = chunk_size - overlap
+        if chunk_size <= overlap:
+            self.step += 1
+        self.step = max(self.step, 1)
+        self.reset()
+
+    def reset(self) -> None:
+        self.words: List[str] = []
+        self.base = 0  # section offset of self.words[0]
+        self.total = 0
+        self.next_start = 0
+        self.run_offsets: List[int] = []
+        self.run_pages: List[int] = []
+
+    def extend(self, words: List[str], page: int) -> None:
+        if not words:
+            return
+        if not self.run_pages or self.run_pages[-1] != page:
+            self.run_offsets.append(self.total)
+            self.run_pages.append(page)
+        self.words.extend(words)
+        self.total += len(words)
+
+    def _page_at(self, offset: int) -> int:
+        return self.run_pages[bisect_right(self.run_offsets, offset) - 1]
+
+    def _chunk_bounds(self, start: int, final: bool) -> Optional[Tuple[int, int]]:
+        """(end, next_start) of the chunk starting at `start`, or None while it is incomplete."""
+        if not final and start + self.chunk_size > self.total:
+            return None
+        return min(start + self.chunk_size, self.total), start + self.step
+
+    def _drop_front(self, count: int) -> None:
+        del self.words[:count]
+        self.base += count
+        keep_from = bisect_right(self.run_offsets, self.base) - 1
+        del self.run_offsets[:keep_from]
+        del self.run_pages[:keep_from]
+
+    def pop_chunks(self, final: bool = False) -> Iterator[Tuple[str, int, int]]:
+        """Yield (text, start_page, end_page) for every chunk that is complete (or all, if final)."""
+        while self.next_start < self.total:
+            bounds = self._chunk_bounds(self.next_start, final)
+            if bounds is None:
+                break
+            start = self.next_start
+            end, self.next_start = bounds
+            yield (
+                " ".join(self.words[start - self.base:end - self.base]),
+                self._page_at(start),
+                self._page_at(end - 1),
+            )
+
+        if final:
+            self.reset()
+            return
+
+        drop = min(self.next_start, self.total) - self.base
+        if drop > 0:
+            self._drop_front(drop)
+
+
+class _SectionTokens(_SectionWords):
+    """
+    Same buffer, but chunk_size and overlap are counted in embedding-model tokens.
+    Chunks still break on word boundaries; per-word token counts come from one
+    batched tokenizer call per page and are kept as cumulative offsets.
+    """
+
+    def __init__(
+        self,
+        chunk_size: int,
+        overlap: int,
+        count_tokens_fn: Callable[[List[str]], List[int]],
+    ):
+        self.count_tokens_fn = count_tokens_fn
+        super().__init__(chunk_size, min(overlap, chunk_size - 1))
+
+    def reset(self) -> None:
+        super().reset()
+        # word_starts[i] = tokens before word (base + i); total_tokens closes the last word.
+        self.word_starts: List[int] = []
+        self.total_tokens = 0
+
+    def _count_pending(self) -> None:
+        pending = self.words[len(self.word_starts):]
+        if not pending:
+            return
+        starts = list(accumulate(self.count_tokens_fn(pending), initial=self.total_tokens))
+        self.total_tokens = starts.pop()
+        self.word_starts.extend(starts)
+
+    def _tokens_before(self, offset: int) -> int:
+        if offset >= self.total:
+            return self.total_tokens
+        return self.word_starts[offset - self.base]
+
+    def _chunk_bounds(self, start: int, final: bool) -> Optional[Tuple[int, int]]:
+        limit = self._tokens_before(start) + self.chunk_size
+        if self.total_tokens <= limit:
+            if not final:
+                return None
+            end = self.total
+        else:
+            # Largest end whose words [start, end) fit within the token budget.
+            end = self.base + bisect_right(self.word_starts, limit, lo=start - self.base) - 1
+            end = max(end, start + 1)
+
+        if end >= self.total:
+            return end, self.total
+        overlap_from = self._tokens_before(end) - self.overlap
+        next_start = self.base + bisect_left(
+            self.word_starts, overlap_from, lo=start + 1 - self.base
+        )
+        return end, min(next_start, end)
+
+    def _drop_front(self, count: int) -> None:
+        super()._drop_front(count)
+        del self.word_starts[:count]
+
+    def pop_chunks(self, final: bool = False) -> Iterator[Tuple[str, int, int]]:
+        self._count_pending()
+        return super().pop_chunks(final=final)
+
+
+def _text_chunk(
+    text: str,
+    doc_id: str,
+    start_page: int,
+    end_page: int,
     section: str,
     section_group: str,
+) -> Dict[str, Any]:
+    return {
+        "text": text,
+        "metadata": {
+            "doc_id": doc_id,
+            "page": start_page,
+            "end_page": end_page,
+            "section": section,
+            "section_bucket": section_group,
+            "filename": f"{doc_id}.pdf",
+            "is_table": False,
+            "is_claim": False,
+            "content_type": "text",
+        }
+    }
+
+
+def _table_chunks(
+    table_obj: Any,
+    page_num: int,
+    current_section: str,
+    current_section_bucket: str,
     doc_id: str,
-    chunk_size: int,
-    overlap: int,
 ) -> List[Dict[str, Any]]:
     chunks = []
-    if not words:
-        return chunks
-
-    i = 0
-    while i < len(words):
-        end = min(i + chunk_size, len(words))
-        chunk_words = words[i:end]
-        chunk_str = " ".join(chunk_words)
-
-        # Determine the page range for this chunk
-        chunk_pages = pages[i:end]
-        start_page = chunk_pages[0]
-        end_page = chunk_pages[-1]
-
-        chunks.append({
-            "text": chunk_str,
-            "metadata": {
-                "doc_id": doc_id,
-                "page": start_page,
-                "end_page": end_page,
-                "section": section,
-                "section_bucket": section_group,
-                "filename": f"{doc_id}.pdf",
-                "is_table": False,
-                "is_claim": False,
-                "content_type": "text",
-            }
-        })
-
-        i += (chunk_size - overlap)
-        if chunk_size <= overlap:
-            i += 1
+    if isinstance(table_obj, str):
+        table_payloads = [{
+            "table_id": f"page{page_num}_table_legacy",
+            "section": current_section,
+            "section_bucket": current_section_bucket,
+            "markdown": table_obj,
+            "normalized_rows": [],
+            "metric_facts": [],
+        }]
+    else:
+        table_payloads = [table_obj]
 
+    for table_payload in table_payloads:
+        table_section = normalize_section_name(
+            table_payload.get("section", current_section)
+        )
+        table_section_bucket = table_payload.get("section_bucket") or section_bucket(table_section)
+        table_id = table_payload.get("table_id", f"page{page_num}_table")
+        table_shape = table_payload.get("shape")
+
+        markdown_text = table_payload.get("markdown", "")
+        if markdown_text:
+            chunks.append({
+                "text": markdown_text,
+                "metadata": {
+                    "doc_id": doc_id,
+                    "page": page_num,
+                    "section": table_section,
+                    "section_bucket": table_section_bucket,
+                    "filename": f"{doc_id}.pdf",
+                    "is_table": True,
+                    "is_claim": False,
+                    "table_id": table_id,
+                    "table_shape": table_shape,
+                    "table_variant": "raw_markdown",
+                    "content_type": "table",
+                }
+            })
+
+        for row_text in table_payload.get("normalized_rows", []):
+            chunks.append({
+                "text": row_text,
+                "metadata": {
+                    "doc_id": doc_id,
+                    "page": page_num,
+                    "section": table_section,
+                    "section_bucket": table_section_bucket,
+                    "filename": f"{doc_id}.pdf",
+                    "is_table": True,
+                    "is_claim": False,
+                    "table_id": table_id,
+                    "table_shape": table_shape,
+                    "table_variant": "normalized_row",
+                    "content_type": "table_row",
+                }
+            })
+
+        for metric_text in table_payload.get("metric_facts", []):
+            chunks.append({
+                "text": metric_text,
+                "metadata": {
+                    "doc_id": doc_id,
+                    "page": page_num,
+                    "section": table_section,
+                    "section_bucket": table_section_bucket,
+                    "filename": f"{doc_id}.pdf",
+                    "is_table": True,
+                    "is_claim": False,
+                    "table_id": table_id,
+                    "table_shape": table_shape,
+                    "table_variant": "metric_fact",
+                    "content_type": "table_metric",
+                }
+            })
     return chunks
 
 
-def chunk_text(pages_data: List[Dict[str, Any]], doc_id: str) -> List[Dict[str, Any]]:
-    """
-    Chunks text while respecting section boundaries and handles tables.
-    pages_data: list of { "page": int, "content": [{"text": str, "section": str}], "tables": [table_payload|str] }
-    Returns list of dicts: { "text": chunk_text, "metadata": { "doc_id": ..., "page": ..., "section": ..., "is_table": bool } }
-    """
-    chunks = []
-    chunk_size = settings.CHUNK_TOKENS
-    overlap = settings.CHUNK_OVERLAP_TOKENS
+def _section_buffer() -> _SectionWords:
+    mode = (settings.CHUNK_MODE or "words").strip().lower()
+    if mode not in ALLOWED_CHUNK_MODES:
+        raise ValueError(f"Invalid CHUNK_MODE '{mode}'. Allowed values: words, tokens.")
+    if mode == "words":
+        return _SectionWords(settings.CHUNK_TOKENS, settings.CHUNK_OVERLAP_TOKENS)
+
+    # Anything beyond the model's max sequence length is silently truncated at encode time.
+    chunk_size = max(1, min(settings.CHUNK_TOKENS, max_input_tokens()))
+    return _SectionTokens(chunk_size, settings.CHUNK_OVERLAP_TOKENS, count_tokens)
 
+
+def _iter_chunks(
+    pages_data: Iterable[Dict[str, Any]], doc_id: str, stream: bool
+) -> Iterator[Dict[str, Any]]:
     current_section = "General"
     current_section_bucket = section_bucket(current_section)
-    section_words = []
-    section_pages = []
+    section_words = _section_buffer()
+    # Without streaming, completed text chunks wait for the section to end, which keeps
+    # chunk_text's ordering (a page's tables before the text of the section around them).
+    held: List[Dict[str, Any]] = []
+
+    def text_chunks(final: bool) -> Iterator[Dict[str, Any]]:
+        for text, start_page, end_page in section_words.pop_chunks(final=final):
+            yield _text_chunk(
+                text, doc_id, start_page, end_page, current_section, current_section_bucket
+            )
 
     for page_data in pages_data:
         page_num = page_data["page"]
 
         # Handle tables first
         for table_obj in page_data.get("tables", []):
-            if isinstance(table_obj, str):
-                table_payloads = [{
-                    "table_id": f"page{page_num}_table_legacy",
-                    "section": current_section,
-                    "section_bucket": current_section_bucket,
-                    "markdown": table_obj,
-                    "normalized_rows": [],
-                    "metric_facts": [],
-                }]
-            else:
-                table_payloads = [table_obj]
-
-            for table_payload in table_payloads:
-                table_section = normalize_section_name(
-                    table_payload.get("section", current_section)
-                )
-                table_section_bucket = table_payload.get("section_bucket") or section_bucket(table_section)
-                table_id = table_payload.get("table_id", f"page{page_num}_table")
-                table_shape = table_payload.get("shape")
-
-                markdown_text = table_payload.get("markdown", "")
-                if markdown_text:
-                    chunks.append({
-                        "text": markdown_text,
-                        "metadata": {
-                            "doc_id": doc_id,
-                            "page": page_num,
-                            "section": table_section,
-                            "section_bucket": table_section_bucket,
-                            "filename": f"{doc_id}.pdf",
-                            "is_table": True,
-                            "is_claim": False,
-                            "table_id": table_id,
-                            "table_shape": table_shape,
-                            "table_variant": "raw_markdown",
-                            "content_type": "table",
-                        }
-                    })
-
-                for row_text in table_payload.get("normalized_rows", []):
-                    chunks.append({
-                        "text": row_text,
-                        "metadata": {
-                            "doc_id": doc_id,
-                            "page": page_num,
-                            "section": table_section,
-                            "section_bucket": table_section_bucket,
-                            "filename": f"{doc_id}.pdf",
-                            "is_table": True,
-                            "is_claim": False,
-                            "table_id": table_id,
-                            "table_shape": table_shape,
-                            "table_variant": "normalized_row",
-                            "content_type": "table_row",
-                        }
-                    })
-
-                for metric_text in table_payload.get("metric_facts", []):
-                    chunks.append({
-                        "text": metric_text,
-                        "metadata": {
-                            "doc_id": doc_id,
-                            "page": page_num,
-                            "section": table_section,
-                            "section_bucket": table_section_bucket,
-                            "filename": f"{doc_id}.pdf",
-                            "is_table": True,
-                            "is_claim": False,
-                            "table_id": table_id,
-                            "table_shape": table_shape,
-                            "table_variant": "metric_fact",
-                            "content_type": "table_metric",
-                        }
-                    })
+            yield from _table_chunks(
+                table_obj, page_num, current_section, current_section_bucket, doc_id
+            )
 
         for line in page_data["content"]:
             text = line["text"]
@@ -150,38 +295,40 @@ def chunk_text(pages_data: List[Dict[str, Any]], doc_id: str) -> List[Dict[str,
             section_group = line.get("section_bucket") or section_bucket(section)
 
             if section != current_section and section is not None:
-                if section_words:
-                    chunks.extend(
-                        _chunk_words(
-                            section_words,
-                            section_pages,
-                            current_section,
-                            current_section_bucket,
-                            doc_id,
-                            chunk_size,
-                            overlap,
-                        )
-                    )
-                    section_words = []
-                    section_pages = []
+                if section_words.total:
+                    yield from held
+                    held.clear()
+                    yield from text_chunks(final=True)
                 current_section = section
                 current_section_bucket = section_group
 
-            words = text.split()
-            section_words.extend(words)
-            section_pages.extend([page_num] * len(words))
-
-    if section_words:
-        chunks.extend(
-            _chunk_words(
-                section_words,
-                section_pages,
-                current_section,
-                current_section_bucket,
-                doc_id,
-                chunk_size,
-                overlap,
-            )
-        )
+            section_words.extend(text.split(), page_num)
 
-    return chunks
+        if stream:
+            yield from text_chunks(final=False)
+        else:
+            held.extend(text_chunks(final=False))
+
+    yield from held
+    yield from text_chunks(final=True)
+
+
+def iter_chunks(
+    pages_data: Iterable[Dict[str, Any]], doc_id: str
+) -> Iterator[Dict[str, Any]]:
+    """
+    Streaming variant of chunk_text: yields each chunk as soon as it is complete,
+    so pages can be produced and chunks embedded incrementally. Yields the same
+    chunks as chunk_text, in document order (a table can precede the tail of the
+    section text around it).
+    """
+    return _iter_chunks(pages_data, doc_id, stream=True)
+
+
+def chunk_text(pages_data: List[Dict[str, Any]], doc_id: str) -> List[Dict[str, Any]]:
+    """
+    Chunks text while respecting section boundaries and handles tables.
+    pages_data: list of { "page": int, "content": [{"text": str, "section": str}], "tables": [table_payload|str] }
+    Returns list of dicts: { "text": chunk_text, "metadata": { "doc_id": ..., "page": ..., "section": ..., "is_table": bool } }
+    """
+    return list(_iter_chunks(pages_data, doc_id, stream=False))
@@ -0,0 +1,119 @@
+import json
+import os
+import sqlite3
+import threading
+import zlib
+from typing import Any, Dict, List, Optional, Tuple
+
+import structlog
+
+from app.core.config import settings
+
+logger = structlog.get_logger()
+
+_store = None
+_store_key = None
+# Stay well under SQLite's bound-parameter limit.
+SQLITE_IN_BATCH = 500
+
+
+class TextStore:
+    """
+    Chunk text and non-filterable metadata for slim Qdrant points, keyed by point id.
+    Each row is zlib-compressed JSON; the file lives on the uploads volume shared by
+    the worker (writer) and the API (reader).
+    """
+
+    def __init__(self, path: str):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        with self._conn:
+            # WAL lets the API read while the worker writes.
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS chunk_text ("
+                "point_id TEXT PRIMARY KEY, doc_id TEXT NOT NULL, data BLOB NOT NULL)"
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS chunk_text_doc_id ON chunk_text (doc_id)"
+            )
+
+    def put_many(self, rows: List[Tuple[str, str, Dict[str, Any]]]) -> None:
+        """rows: (point_id, doc_id, fields) triples."""
+        if not rows:
+            return
+        encoded = [
+            (point_id, doc_id, zlib.compress(json.dumps(fields, separators=(",", ":")).encode("utf-8")))
+            for point_id, doc_id, fields in rows
+        ]
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO chunk_text (point_id, doc_id, data) VALUES (?, ?, ?)",
+                encoded,
+            )
+
+    def get_many(self, point_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        found = {}
+        point_ids = list(dict.fromkeys(point_ids))
+        with self._lock:
+            for start in range(0, len(point_ids), SQLITE_IN_BATCH):
+                batch = point_ids[start:start + SQLITE_IN_BATCH]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT point_id, data FROM chunk_text WHERE point_id IN ({placeholders})", batch
+                ).fetchall()
+                for point_id, blob in rows:
+                    found[point_id] = json.loads(zlib.decompress(blob))
+        return found
+
+    def delete_many(self, point_ids: List[str]) -> None:
+        with self._lock, self._conn:
+            for start in range(0, len(point_ids), SQLITE_IN_BATCH):
+                batch = point_ids[start:start + SQLITE_IN_BATCH]
+                placeholders = ",".join("?" * len(batch))
+                self._conn.execute(f"DELETE FROM chunk_text WHERE point_id IN ({placeholders})", batch)
+
+    def delete_document(self, doc_id: str) -> None:
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM chunk_text WHERE doc_id = ?", (doc_id,))
+
+
+def text_store_path() -> str:
+    return settings.TEXT_STORE_PATH or os.path.join(settings.UPLOAD_DIR, "text_store.sqlite3")
+
+
+def get_text_store(create: bool = True) -> Optional[TextStore]:
+    """Process-local store; with create=False, None until a slim ingestion has created it."""
+    global _store, _store_key
+    path = text_store_path()
+    # Connections must not be shared across forked worker processes.
+    key = (os.getpid(), path)
+    if _store is None or _store_key != key:
+        if not create and not os.path.exists(path):
+            return None
+        _store = TextStore(path)
+        _store_key = key
+    return _store
+
+
+def hydrate_hits(hits: List[Any]) -> List[Any]:
+    """
+    Fill in text and metadata for slim points (those without "text" in their payload)
+    with one batched side-store lookup. Full points pass through untouched.
+    """
+    missing = [hit for hit in hits if "text" not in (hit.payload or {})]
+    if not missing:
+        return hits
+    store = get_text_store(create=False)
+    if store is None:
+        logger.warning(f"{len(missing)} search hits have no text and no text store exists")
+        return hits
+    rows = store.get_many([str(hit.id) for hit in missing])
+    for hit in missing:
+        row = rows.get(str(hit.id))
+        if row is None:
+            logger.warning(f"No stored text for point {hit.id}")
+            continue
+        hit.payload = {**(hit.payload or {}), **row}
+    return hits
@@ -1,26 +1,112 @@
 from qdrant_client import QdrantClient
 from qdrant_client.http import models
+from qdrant_client.http.exceptions import ResponseHandlingException, UnexpectedResponse
 from app.core.config import settings
+from app.services.text_store import get_text_store
+from concurrent.futures import ThreadPoolExecutor
+import grpc
+import hashlib
+import httpx
+import json
+import numpy as np
 import structlog
+import threading
+import time
 import uuid
-from typing import Optional, List
+from typing import Dict, Optional, List
 
 logger = structlog.get_logger()
 
+# Fixed namespace for point ids, so a chunk maps to the same id on every ingestion run.
+POINT_ID_NAMESPACE = uuid.UUID("6f1c2a4e-3b5d-5e8f-9a7b-0c1d2e3f4a5b")
+SCROLL_PAGE_SIZE = 256
+RETRYABLE_GRPC_CODES = {
+    grpc.StatusCode.UNAVAILABLE,
+    grpc.StatusCode.DEADLINE_EXCEEDED,
+    grpc.StatusCode.RESOURCE_EXHAUSTED,
+}
+# Every payload field search_vectors filters on. Without an index Qdrant scans
+# every point's payload for each filtered search or scroll.
+PAYLOAD_INDEXES = {
+    "doc_id": models.PayloadSchemaType.KEYWORD,
+    "section": models.PayloadSchemaType.KEYWORD,
+    "section_bucket": models.PayloadSchemaType.KEYWORD,
+    "is_claim": models.PayloadSchemaType.BOOL,
+    "claim_type": models.PayloadSchemaType.KEYWORD,
+    "is_table": models.PayloadSchemaType.BOOL,
+    "table_variant": models.PayloadSchemaType.KEYWORD,
+}
+# Payload kept in Qdrant under QDRANT_PAYLOAD_MODE=slim; everything else goes to the text store.
+SLIM_PAYLOAD_FIELDS = set(PAYLOAD_INDEXES) | {"page", "content_type"}
+
 _client = None
+# Collections this process has already seen or created; saves a get_collections
+# round trip per upsert. Cleared for a collection when a write to it fails.
+_ready_collections = set()
+_ready_lock = threading.Lock()
 
 def get_client():
     global _client
     if _client is None:
         _client = QdrantClient(
             url=settings.QDRANT_URL,
-            api_key=settings.QDRANT_API_KEY
+            api_key=settings.QDRANT_API_KEY,
+            prefer_grpc=settings.QDRANT_PREFER_GRPC,
+            grpc_port=settings.QDRANT_GRPC_PORT
         )
     return _client
 
+def _quantization_config():
+    mode = settings.QDRANT_QUANTIZATION.strip().lower()
+    if mode == "none":
+        return None
+    if mode == "scalar":
+        return models.ScalarQuantization(
+            scalar=models.ScalarQuantizationConfig(
+                type=models.ScalarType.INT8,
+                quantile=0.99,
+                always_ram=settings.QDRANT_QUANTIZATION_ALWAYS_RAM
+            )
+        )
+    if mode == "binary":
+        return models.BinaryQuantization(
+            binary=models.BinaryQuantizationConfig(always_ram=settings.QDRANT_QUANTIZATION_ALWAYS_RAM)
+        )
+    raise ValueError(f"Invalid QDRANT_QUANTIZATION '{mode}'. Allowed values: none, scalar, binary.")
+
+def collection_config() -> dict:
+    """create_collection arguments for the configured storage layout."""
+    return {
+        "vectors_config": models.VectorParams(
+            size=settings.EMBEDDING_DIMENSION,
+            distance=models.Distance.COSINE,
+            on_disk=settings.QDRANT_ON_DISK_VECTORS
+        ),
+        "hnsw_config": models.HnswConfigDiff(
+            m=settings.QDRANT_HNSW_M,
+            ef_construct=settings.QDRANT_HNSW_EF_CONSTRUCT
+        ),
+        "quantization_config": _quantization_config(),
+        "on_disk_payload": settings.QDRANT_ON_DISK_PAYLOAD,
+    }
+
+def search_params() -> Optional[models.SearchParams]:
+    """Search-time HNSW ef and quantization rescoring; None keeps Qdrant's defaults."""
+    quantization = None
+    if _quantization_config() is not None:
+        quantization = models.QuantizationSearchParams(
+            rescore=settings.QDRANT_QUANTIZATION_RESCORE,
+            oversampling=settings.QDRANT_QUANTIZATION_OVERSAMPLING
+        )
+    if quantization is None and settings.QDRANT_HNSW_EF is None:
+        return None
+    return models.SearchParams(hnsw_ef=settings.QDRANT_HNSW_EF, quantization=quantization)
+
 def init_collection():
     client = get_client()
     collection_name = settings.QDRANT_COLLECTION_NAME
+    if collection_name in _ready_collections:
+        return
     
     # Check if exists
     collections = client.get_collections().collections
@@ -32,45 +118,199 @@ def init_collection():
         # We should ideally get this from the model, but hardcoding for now or config.
         # SentenceTransformer default is 384.
         
-        client.create_collection(
+        client.create_collection(collection_name=collection_name, **collection_config())
+    ensure_payload_indexes(client, collection_name)
+    with _ready_lock:
+        _ready_collections.add(collection_name)
+
+def ensure_payload_indexes(client, collection_name: str) -> List[str]:
+    """
+    Create any missing PAYLOAD_INDEXES on the collection; existing collections are
+    migrated the first time this process touches them. Returns the fields created.
+    """
+    existing = client.get_collection(collection_name).payload_schema or {}
+    created = []
+    for field_name, schema in PAYLOAD_INDEXES.items():
+        if field_name in existing:
+            continue
+        client.create_payload_index(
             collection_name=collection_name,
-            vectors_config=models.VectorParams(
-                size=settings.EMBEDDING_DIMENSION, 
-                distance=models.Distance.COSINE
-            )
+            field_name=field_name,
+            field_schema=schema,
+            wait=True
+        )
+        created.append(field_name)
+    if created:
+        logger.info(f"Created payload indexes on {collection_name}: {', '.join(created)}")
+    return created
+
+def _to_list(vector) -> list:
+    # Embeddings stay NumPy arrays until here; Qdrant needs plain floats.
+    return vector.tolist() if hasattr(vector, "tolist") else list(vector)
+
+def point_id(doc_id: str, content_type: str, ordinal: int, text: str) -> str:
+    """Deterministic UUIDv5 for the ordinal-th chunk of a content type in a document."""
+    text_hash = hashlib.sha256(text.encode("utf-8")).hexdigest()
+    return str(uuid.uuid5(POINT_ID_NAMESPACE, f"{doc_id}:{content_type}:{ordinal}:{text_hash}"))
+
+def _content_hash(vector: list, payload: dict) -> str:
+    # Covers what the id does not: the vector (embedding model) and the rest of the payload.
+    digest = hashlib.sha256(np.asarray(vector, dtype=np.float32).tobytes())
+    digest.update(json.dumps(payload, sort_keys=True, default=str).encode("utf-8"))
+    return digest.hexdigest()
+
+def _existing_points(client, collection_name: str, doc_id: str) -> Dict[str, Optional[str]]:
+    """point id -> stored content_hash for every point of doc_id."""
+    doc_filter = build_filter(doc_id=doc_id)
+    existing = {}
+    offset = None
+    while True:
+        hits, offset = client.scroll(
+            collection_name=collection_name,
+            scroll_filter=doc_filter,
+            limit=SCROLL_PAGE_SIZE,
+            offset=offset,
+            with_payload=["content_hash"],
+            with_vectors=False
         )
+        for hit in hits:
+            existing[str(hit.id)] = (hit.payload or {}).get("content_hash")
+        if offset is None:
+            return existing
+
+def _is_retryable(error: Exception) -> bool:
+    # Only transport failures, throttling and server errors are transient; anything else
+    # (wrong vector size, missing collection, local validation) fails the same way again.
+    if isinstance(error, (ResponseHandlingException, httpx.TransportError)):
+        return True
+    if isinstance(error, UnexpectedResponse):
+        status = error.status_code
+        return status is not None and (status == 429 or status >= 500)
+    if isinstance(error, grpc.RpcError):
+        return error.code() in RETRYABLE_GRPC_CODES
+    return False
+
+def _upsert_batch(client, collection_name: str, batch: List[models.PointStruct]) -> None:
+    attempts = max(0, settings.QDRANT_UPSERT_MAX_RETRIES) + 1
+    for attempt in range(attempts):
+        try:
+            client.upsert(
+                collection_name=collection_name,
+                points=batch,
+                wait=settings.QDRANT_UPSERT_WAIT
+            )
+            return
+        except Exception as e:
+            if attempt == attempts - 1 or not _is_retryable(e):
+                raise
+            delay = settings.QDRANT_UPSERT_BACKOFF_SECONDS * 2 ** attempt
+            logger.warning(f"Upsert of {len(batch)} points failed ({e}); retrying in {delay:.1f}s")
+            time.sleep(delay)
+
+def _upsert_batches(client, collection_name: str, points: List[models.PointStruct]) -> None:
+    batch_size = max(1, settings.QDRANT_UPSERT_BATCH_SIZE)
+    batches = [points[start:start + batch_size] for start in range(0, len(points), batch_size)]
+    workers = max(1, min(settings.QDRANT_UPSERT_PARALLELISM, len(batches)))
+    if workers == 1:
+        for batch in batches:
+            _upsert_batch(client, collection_name, batch)
+        return
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="qdrant-upsert") as pool:
+        # list() re-raises the first batch that exhausted its retries.
+        list(pool.map(lambda batch: _upsert_batch(client, collection_name, batch), batches))
 
-def upsert_vectors(collection_name: str, embeddings_data: list):
+def _slim_payloads() -> bool:
+    mode = settings.QDRANT_PAYLOAD_MODE.strip().lower()
+    if mode not in ("full", "slim"):
+        raise ValueError(f"Invalid QDRANT_PAYLOAD_MODE '{mode}'. Allowed values: full, slim.")
+    return mode == "slim"
+
+def upsert_vectors(collection_name: str, embeddings_data: list, doc_id: str = None) -> Dict[str, int]:
     """
     embeddings_data: list of dicts { "vector": ..., "payload": ... }
+
+    Point ids are derived from (doc_id, content type, ordinal within that type, text),
+    so re-ingesting a document overwrites its points instead of duplicating them.
+    With doc_id, the document's current points are diffed first: unchanged points
+    are not rewritten and points no longer produced are deleted.
+    Under slim payloads, text and non-filter metadata are written to the text store
+    and only SLIM_PAYLOAD_FIELDS go to Qdrant.
+    Returns {"inserted", "unchanged", "deleted"} point counts.
     """
     client = get_client()
     
     # Ensure collection exists
     init_collection()
-    
+
+    slim = _slim_payloads()
+    existing = _existing_points(client, collection_name, doc_id) if doc_id else {}
+
     points = []
+    seen_ids = set()
+    side_rows = []
+    ordinals: Dict[str, int] = {}
     for item in embeddings_data:
+        payload = item["payload"]
+        content_type = payload.get("content_type", "text")
+        ordinal = ordinals.get(content_type, 0)
+        ordinals[content_type] = ordinal + 1
+
+        point_doc_id = payload.get("doc_id") or doc_id or ""
+        pid = point_id(point_doc_id, content_type, ordinal, payload.get("text", ""))
+        if slim:
+            side_rows.append((pid, point_doc_id, {k: v for k, v in payload.items() if k not in SLIM_PAYLOAD_FIELDS}))
+            payload = {k: v for k, v in payload.items() if k in SLIM_PAYLOAD_FIELDS}
+        vector = _to_list(item["vector"])
+        # Hashing the stored payload means switching QDRANT_PAYLOAD_MODE rewrites every point.
+        content_hash = _content_hash(vector, payload)
+        seen_ids.add(pid)
+        if existing.get(pid) == content_hash:
+            continue
         points.append(models.PointStruct(
-            id=str(uuid.uuid4()), # Generate random UUID for the point
-            vector=item["vector"],
-            payload=item["payload"]
+            id=pid,
+            vector=vector,
+            payload={**payload, "content_hash": content_hash}
         ))
-        
-    # Batch upsert
-    # Qdrant client handles batching but explicit batching is good for huge lists.
-    # For now, just upsert all.
-    
-    if points:
-        client.upsert(
-            collection_name=collection_name,
-            points=points
-        )
-        logger.info(f"Upserted {len(points)} points to {collection_name}")
 
-def search_vectors(
-    query_vector: list = None,
-    top_k: int = 5,
+    stale_ids = [pid for pid in existing if pid not in seen_ids]
+    # Text goes in before the points that reference it become searchable.
+    text_store = get_text_store(create=slim)
+    if text_store is not None:
+        text_store.put_many(side_rows)
+    try:
+        # Batched, parallel upsert; ids are deterministic, so a batch retried after a
+        # partial failure (or a whole retried task) just overwrites the same points.
+        if points:
+            _upsert_batches(client, collection_name, points)
+            logger.info(f"Upserted {len(points)} points to {collection_name}")
+
+        # Delete only after the new points are in, so the document never drops out of search.
+        if stale_ids:
+            client.delete(
+                collection_name=collection_name,
+                points_selector=models.PointIdsList(points=stale_ids),
+                wait=settings.QDRANT_UPSERT_WAIT
+            )
+            logger.info(f"Deleted {len(stale_ids)} stale points for doc_id {doc_id}")
+        if text_store is not None:
+            if slim:
+                text_store.delete_many(stale_ids)
+            elif doc_id:
+                # Back to full payloads: the document's rows are no longer referenced.
+                text_store.delete_document(doc_id)
+    except Exception:
+        # The collection may have been dropped underneath us; check again next time.
+        with _ready_lock:
+            _ready_collections.discard(collection_name)
+        raise
+
+    return {
+        "inserted": len(points),
+        "unchanged": len(seen_ids) - len(points),
+        "deleted": len(stale_ids),
+    }
+
+def build_filter(
     doc_id: str = None,
     section: str = None,
     sections: Optional[List[str]] = None,
@@ -79,10 +319,7 @@ def search_vectors(
     claim_type: str = None,
     is_table: bool = None,
     table_variant: str = None,
-):
-    client = get_client()
-    collection_name = settings.QDRANT_COLLECTION_NAME
-    
+) -> Optional[models.Filter]:
     must_filters = []
     if doc_id:
         must_filters.append(models.FieldCondition(key="doc_id", match=models.MatchValue(value=doc_id)))
@@ -103,13 +340,40 @@ def search_vectors(
     if table_variant:
         must_filters.append(models.FieldCondition(key="table_variant", match=models.MatchValue(value=table_variant)))
         
-    query_filter = models.Filter(must=must_filters) if must_filters else None
+    return models.Filter(must=must_filters) if must_filters else None
+
+def search_vectors(
+    query_vector: list = None,
+    top_k: int = 5,
+    doc_id: str = None,
+    section: str = None,
+    sections: Optional[List[str]] = None,
+    section_bucket: str = None,
+    is_claim: bool = None,
+    claim_type: str = None,
+    is_table: bool = None,
+    table_variant: str = None,
+):
+    client = get_client()
+    collection_name = settings.QDRANT_COLLECTION_NAME
+
+    query_filter = build_filter(
+        doc_id=doc_id,
+        section=section,
+        sections=sections,
+        section_bucket=section_bucket,
+        is_claim=is_claim,
+        claim_type=claim_type,
+        is_table=is_table,
+        table_variant=table_variant,
+    )
     
     if query_vector is not None:
         results = client.search(
             collection_name=collection_name,
             query_vector=query_vector,
             query_filter=query_filter,
+            search_params=search_params(),
             limit=top_k
         )
     else:
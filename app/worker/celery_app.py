@@ -16,4 +16,14 @@ celery_app.conf.update(
     enable_utc=True,
     task_track_started=True,
     broker_connection_retry_on_startup=True,
+    # Ingestion stages run on dedicated queues so OCR (CPU), embedding (CPU/GPU),
+    # claim extraction (LLM-bound) and indexing workers can be scaled separately.
+    # The entry task (process_pdf_task) stays on the default "celery" queue.
+    task_routes={
+        "app.worker.tasks.extract_stage": {"queue": "ocr"},
+        "app.worker.tasks.claims_stage": {"queue": "llm"},
+        "app.worker.tasks.summary_stage": {"queue": "llm"},
+        "app.worker.tasks.embed_stage": {"queue": "embed"},
+        "app.worker.tasks.index_stage": {"queue": "index"},
+    },
 )
@@ -1,106 +1,359 @@
+from celery import chain
 from app.worker.celery_app import celery_app
 from celery.utils.log import get_task_logger
 from app.services.ocr import extract_text_from_pdf
 from app.services.text_processing import chunk_text
-from app.services.embeddings import generate_embeddings
+from app.services.embeddings import encode_texts
+from app.services.embedding_cache import embedding_cache_stats
 from app.services.vector_store import upsert_vectors
-from app.services.llm import llm_client
+from app.services.claims import ClaimExtractionError, extract_claim_chunks
+from app.services.summaries import generate_summary, get_summary_store
+from app.services.answer_cache import mark_document_reindexed
+from app.services.artifacts import (
+    completed_stage,
+    forget_stage,
+    load_json,
+    load_vectors,
+    record_stage,
+    save_json,
+    save_vectors,
+    stage_fingerprint,
+)
+from app.services.llm import BATCH_CLAIMS_SYSTEM_PROMPT, CLAIMS_SYSTEM_PROMPT
 from app.core.config import settings
 
 logger = get_task_logger(__name__)
 
+# Stage outputs live under UPLOAD_DIR/<doc_id>/ next to a manifest recording each
+# stage's input fingerprint; only a small context dict travels through the broker.
+# A stage whose fingerprint matches the manifest is skipped and its artifact reused.
+PAGES_ARTIFACT = "pages.json"
+CHUNKS_ARTIFACT = "chunks.json"
+CLAIMS_ARTIFACT = "claims.json"
+# Per-prompt claim results of a failed extraction, so a retry only re-sends failed prompts.
+CLAIM_GROUPS_ARTIFACT = "claim_groups.json"
+EMBEDDINGS_ARTIFACT = "embeddings.npy"
+
+
+def _report(task, step: str, ctx: dict) -> None:
+    # Progress goes to the id the API handed out (the chain's root), not the stage's own id.
+    task.update_state(
+        task_id=task.request.root_id or task.request.id,
+        state='PROCESSING',
+        meta={'step': step, **ctx["progress_meta"]},
+    )
+
+
+def _retry(task, e: Exception):
+    logger.error(f"Error in {task.name}: {e}")
+    # Only this stage re-runs; earlier stages' outputs are already on disk.
+    raise task.retry(exc=e, countdown=2 ** task.request.retries)
+
+
 @celery_app.task(bind=True, name="app.worker.tasks.process_pdf_task", max_retries=3)
 def process_pdf_task(self, doc_id: str, file_path: str, ocr_mode: str = "auto"):
+    """
+    Entry point enqueued by the API. Replaces itself with the stage chain
+    (extract -> claims -> embed -> index [-> summary]); the last stage inherits
+    this task's id, so its result is what /status/{task_id} reports.
+    """
+    logger.info(f"Starting processing for doc_id: {doc_id}")
+    ctx = {
+        "doc_id": doc_id,
+        "file_path": file_path,
+        "progress_meta": {"doc_id": doc_id, "ocr_mode": ocr_mode},
+    }
+    self.update_state(state='PROCESSING', meta={'step': 'QUEUED', **ctx["progress_meta"]})
+
+    stages = [
+        extract_stage.s(ctx),
+        claims_stage.s(),
+        embed_stage.s(),
+        index_stage.s(),
+    ]
+    if settings.SUMMARY_PRECOMPUTE:
+        stages.append(summary_stage.s())
+    return self.replace(chain(*stages))
+
+
+def _extract_fingerprint(ctx: dict) -> str:
+    # The doc_id is the PDF's sha256, so it stands in for the file contents.
+    return stage_fingerprint(
+        "extract",
+        ctx["doc_id"],
+        ctx["progress_meta"]["ocr_mode"],
+        settings.OCR_RENDER_DPI,
+        settings.OCR_RENDER_DPI_BY_MODE,
+        settings.TABLE_DETECTION_MODE,
+        settings.TABLE_MIN_RULE_ITEMS,
+        settings.DIGITAL_DETECTION_SAMPLE_PAGES,
+    )
+
+
+def _chunk_fingerprint(extract_fingerprint: str) -> str:
+    return stage_fingerprint(
+        "chunk",
+        extract_fingerprint,
+        settings.CHUNK_MODE,
+        settings.CHUNK_TOKENS,
+        settings.CHUNK_OVERLAP_TOKENS,
+        # Token-mode chunk boundaries depend on the embedding model's tokenizer.
+        settings.EMBEDDING_MODEL if settings.CHUNK_MODE == "tokens" else None,
+    )
+
+
+@celery_app.task(bind=True, name="app.worker.tasks.extract_stage", max_retries=3)
+def extract_stage(self, ctx: dict):
+    doc_id = ctx["doc_id"]
+    progress_meta = ctx["progress_meta"]
     try:
-        logger.info(f"Starting processing for doc_id: {doc_id}")
-        progress_meta = {"doc_id": doc_id, "ocr_mode": ocr_mode}
-        self.update_state(state='PROCESSING', meta={'step': 'OCR', **progress_meta})
-        
-        # 1. OCR / Digital text extraction
-        logger.info("Step 1: Text Extraction")
-        pages_text, extraction_meta = extract_text_from_pdf(file_path, ocr_mode=ocr_mode)
-        progress_meta.update(
-            {
+        extract_fingerprint = _extract_fingerprint(ctx)
+        chunk_fingerprint = _chunk_fingerprint(extract_fingerprint)
+        ctx = {**ctx, "fingerprints": {"chunk": chunk_fingerprint}, "reused_stages": []}
+
+        extracted = completed_stage(doc_id, "extract", extract_fingerprint)
+        chunked = extracted and completed_stage(doc_id, "chunk", chunk_fingerprint)
+        if chunked:
+            logger.info(f"Reusing extracted pages and chunks for doc_id: {doc_id}")
+            progress_meta.update(extracted["meta"])
+            ctx["reused_stages"] += ["extract", "chunk"]
+            return {**ctx, "chunks_count": chunked["meta"]["count"]}
+
+        if extracted:
+            logger.info(f"Reusing extracted pages for doc_id: {doc_id}")
+            pages_text = load_json(doc_id, PAGES_ARTIFACT)
+            progress_meta.update(extracted["meta"])
+            ctx["reused_stages"].append("extract")
+        else:
+            _report(self, 'OCR', ctx)
+
+            # 1. OCR / Digital text extraction
+            logger.info("Step 1: Text Extraction")
+            pages_text, extraction_meta = extract_text_from_pdf(
+                ctx["file_path"], ocr_mode=progress_meta["ocr_mode"]
+            )
+            extraction_progress = {
                 "ocr_mode": extraction_meta.get("ocr_mode_requested"),
                 "ocr_used": extraction_meta.get("ocr_used"),
                 "ocr_skipped": extraction_meta.get("ocr_skipped"),
                 "ocr_skip_reason": extraction_meta.get("ocr_skip_reason"),
                 "ingestion_mode": extraction_meta.get("ingestion_mode"),
                 "pdf_type": extraction_meta.get("pdf_type"),
+                "ocr_pages_count": extraction_meta.get("ocr_pages_count"),
+                "digital_pages_count": extraction_meta.get("digital_pages_count"),
+                "table_pages_scanned": extraction_meta.get("table_pages_scanned"),
+                "table_pages_skipped": extraction_meta.get("table_pages_skipped"),
             }
-        )
-        
-        if not pages_text:
-            logger.warning("No text extracted from PDF.")
-            return {
-                "status": "failed",
-                "reason": "No text extracted",
-                **progress_meta,
-            }
+            progress_meta.update(extraction_progress)
+
+            if not pages_text:
+                logger.warning("No text extracted from PDF.")
+                return {**ctx, "failed": "No text extracted"}
+
+            save_json(doc_id, PAGES_ARTIFACT, pages_text)
+            record_stage(
+                doc_id, "extract", extract_fingerprint, [PAGES_ARTIFACT], meta=extraction_progress
+            )
 
-        self.update_state(state='PROCESSING', meta={'step': 'CHUNKING', **progress_meta})
+        _report(self, 'CHUNKING', ctx)
 
         # 2. Chunking
         logger.info("Step 2: Chunking")
         chunks = chunk_text(pages_text, doc_id)
-        
-        self.update_state(state='PROCESSING', meta={'step': 'EMBEDDING', **progress_meta})
-        
-        # 3. Embeddings
-        logger.info("Step 3: Generating Embeddings")
-        embeddings_data = generate_embeddings(chunks) # Returns list of (vector, payload)
-        
-        # 4. Claim Extraction
-        self.update_state(state='PROCESSING', meta={'step': 'CLAIM_EXTRACTION', **progress_meta})
-        logger.info("Step 4: Extracting Claims")
-        claim_chunks = []
-        # Only extract claims from non-table chunks to save time/resources
-        for chunk in chunks:
-            if chunk["metadata"].get("is_table"):
-                continue
-            
-            try:
-                extracted_claims = llm_client.extract_claims_with_types(chunk["text"])
-                for claim_obj in extracted_claims:
-                    claim_text = claim_obj.get("text", "").strip()
-                    claim_type = claim_obj.get("claim_type", "result").strip().lower()
-                    if not claim_text:
-                        continue
-
-                    claim_chunks.append({
-                        "text": claim_text,
-                        "metadata": {
-                            **chunk["metadata"],
-                            "is_claim": True,
-                            "claim_type": claim_type,
-                            "content_type": "claim",
-                            "original_text": chunk["text"][:200]
-                        }
-                    })
-            except Exception as e:
-                logger.error(f"Failed to extract claims from chunk: {e}")
+        save_json(doc_id, CHUNKS_ARTIFACT, chunks)
+        record_stage(doc_id, "chunk", chunk_fingerprint, [CHUNKS_ARTIFACT], meta={"count": len(chunks)})
+        return {**ctx, "chunks_count": len(chunks)}
+    except Exception as e:
+        _retry(self, e)
+
+
+def _claim_progress(doc_id: str, fingerprint: str):
+    """Per-prompt results saved by an earlier failed extraction with the same inputs."""
+    try:
+        progress = load_json(doc_id, CLAIM_GROUPS_ARTIFACT)
+    except (OSError, ValueError):
+        return None
+    return progress["groups"] if progress.get("fingerprint") == fingerprint else None
+
+
+@celery_app.task(bind=True, name="app.worker.tasks.claims_stage", max_retries=3)
+def claims_stage(self, ctx: dict):
+    if ctx.get("failed"):
+        return ctx
+    doc_id = ctx["doc_id"]
+    try:
+        claims_fingerprint = stage_fingerprint(
+            "claims",
+            ctx["fingerprints"]["chunk"],
+            settings.LLM_MODEL,
+            CLAIMS_SYSTEM_PROMPT,
+            BATCH_CLAIMS_SYSTEM_PROMPT,
+            settings.CLAIM_EXTRACTION_CHUNKS_PER_PROMPT,
+        )
+        ctx = {**ctx, "fingerprints": {**ctx["fingerprints"], "claims": claims_fingerprint}}
+        reused = completed_stage(doc_id, "claims", claims_fingerprint)
+        if reused:
+            logger.info(f"Reusing extracted claims for doc_id: {doc_id}")
+            return {
+                **ctx,
+                "claims_count": reused["meta"]["count"],
+                "reused_stages": ctx["reused_stages"] + ["claims"],
+            }
 
+        # 3. Claim Extraction
+        _report(self, 'CLAIM_EXTRACTION', ctx)
+        logger.info("Step 3: Extracting Claims")
+        chunks = load_json(doc_id, CHUNKS_ARTIFACT)
+        try:
+            claim_chunks = extract_claim_chunks(chunks, _claim_progress(doc_id, claims_fingerprint))
+        except ClaimExtractionError as e:
+            save_json(
+                doc_id,
+                CLAIM_GROUPS_ARTIFACT,
+                {"fingerprint": claims_fingerprint, "groups": e.group_results},
+            )
+            if e.retryable and self.request.retries < self.max_retries:
+                raise
+            # Out of retries, or retrying cannot help: index what we have, but never
+            # checkpoint it, so the next run (or force=true) re-sends the failed prompts
+            # instead of reusing a partial set.
+            logger.warning(f"{e}; continuing with {len(e.claim_chunks)} claims")
+            forget_stage(doc_id, "claims")
+            save_json(doc_id, CLAIMS_ARTIFACT, e.claim_chunks)
+            return {
+                **ctx,
+                "fingerprints": {**ctx["fingerprints"], "claims": None},
+                "claims_count": len(e.claim_chunks),
+                "claims_failed_chunks": e.failed_chunks,
+            }
         if claim_chunks:
             logger.info(f"Generated {len(claim_chunks)} claims")
-            claim_embeddings = generate_embeddings(claim_chunks)
-            embeddings_data.extend(claim_embeddings)
+        save_json(doc_id, CLAIMS_ARTIFACT, claim_chunks)
+        record_stage(
+            doc_id, "claims", claims_fingerprint, [CLAIMS_ARTIFACT], meta={"count": len(claim_chunks)}
+        )
+        return {**ctx, "claims_count": len(claim_chunks)}
+    except Exception as e:
+        _retry(self, e)
+
+
+@celery_app.task(bind=True, name="app.worker.tasks.embed_stage", max_retries=3)
+def embed_stage(self, ctx: dict):
+    if ctx.get("failed"):
+        return ctx
+    doc_id = ctx["doc_id"]
+    try:
+        # Only the model and output dtype matter here, so switching EMBEDDING_MODEL
+        # re-embeds existing chunks and claims without re-running OCR or the LLM.
+        # Embeddings of a partial claim set (no claims fingerprint) are not checkpointed.
+        embed_fingerprint = None
+        if ctx["fingerprints"]["claims"] is not None:
+            embed_fingerprint = stage_fingerprint(
+                "embed",
+                ctx["fingerprints"]["chunk"],
+                ctx["fingerprints"]["claims"],
+                settings.EMBEDDING_MODEL,
+                settings.EMBEDDING_DTYPE,
+            )
+        if embed_fingerprint and completed_stage(doc_id, "embed", embed_fingerprint):
+            logger.info(f"Reusing embeddings for doc_id: {doc_id}")
+            return {
+                **ctx,
+                "embedding_cache_hits": 0,
+                "embedding_cache_misses": 0,
+                "reused_stages": ctx["reused_stages"] + ["embed"],
+            }
+
+        # 4. Embeddings (chunks and claims in one pass)
+        _report(self, 'EMBEDDING', ctx)
+        logger.info("Step 4: Generating Embeddings")
+        chunks = load_json(doc_id, CHUNKS_ARTIFACT)
+        claim_chunks = load_json(doc_id, CLAIMS_ARTIFACT)
+        if not embed_fingerprint:
+            forget_stage(doc_id, "embed")
+        cache_stats_before = embedding_cache_stats()
+        vectors = encode_texts([c["text"] for c in chunks + claim_chunks])
+        cache_stats_after = embedding_cache_stats()
+        save_vectors(doc_id, EMBEDDINGS_ARTIFACT, vectors)
+        if embed_fingerprint:
+            record_stage(
+                doc_id, "embed", embed_fingerprint, [EMBEDDINGS_ARTIFACT], meta={"count": len(vectors)}
+            )
+        return {
+            **ctx,
+            "embedding_cache_hits": cache_stats_after["hits"] - cache_stats_before["hits"],
+            "embedding_cache_misses": cache_stats_after["misses"] - cache_stats_before["misses"],
+        }
+    except Exception as e:
+        _retry(self, e)
 
-        self.update_state(state='PROCESSING', meta={'step': 'UPSERTING', **progress_meta})
-        
+
+@celery_app.task(bind=True, name="app.worker.tasks.index_stage", max_retries=3)
+def index_stage(self, ctx: dict):
+    if ctx.get("failed"):
+        return _final_result(ctx)
+    doc_id = ctx["doc_id"]
+    try:
         # 5. Upsert to Qdrant
+        _report(self, 'UPSERTING', ctx)
         logger.info("Step 5: Upserting to Qdrant")
-        upsert_vectors(settings.QDRANT_COLLECTION_NAME, embeddings_data)
-        
+        chunks = load_json(doc_id, CHUNKS_ARTIFACT) + load_json(doc_id, CLAIMS_ARTIFACT)
+        vectors = load_vectors(doc_id, EMBEDDINGS_ARTIFACT)
+        embeddings_data = [
+            {"vector": vector, "payload": {"text": chunk["text"], **chunk["metadata"]}}
+            for chunk, vector in zip(chunks, vectors)
+        ]
+        index_counts = upsert_vectors(settings.QDRANT_COLLECTION_NAME, embeddings_data, doc_id=doc_id)
+        ctx = {
+            **ctx,
+            "points_inserted": index_counts["inserted"],
+            "points_unchanged": index_counts["unchanged"],
+            "points_deleted": index_counts["deleted"],
+        }
+
+        if index_counts["inserted"] or index_counts["deleted"]:
+            # The index changed, so cached summaries and chat answers are stale.
+            get_summary_store().invalidate(doc_id)
+            mark_document_reindexed(doc_id)
         logger.info(f"Processing complete for doc_id: {doc_id}")
+        return _final_result(ctx)
+    except Exception as e:
+        _retry(self, e)
+
+
+@celery_app.task(bind=True, name="app.worker.tasks.summary_stage", max_retries=3)
+def summary_stage(self, result: dict):
+    if result.get("status") != "completed":
+        return result
+    # 6. Summary precompute (best effort; ingestion already succeeded)
+    self.update_state(state='PROCESSING', meta={'step': 'SUMMARY', **result})
+    logger.info("Step 6: Precomputing summary")
+    try:
+        result["summary_precomputed"] = generate_summary(result["doc_id"]) is not None
+    except Exception as e:
+        logger.error(f"Failed to precompute summary: {e}")
+    return result
+
+
+def _final_result(ctx: dict) -> dict:
+    if ctx.get("failed"):
         return {
-            "status": "completed",
-            "doc_id": doc_id,
-            "chunks_count": len(chunks),
-            "claims_count": len(claim_chunks),
-            **progress_meta,
+            "status": "failed",
+            "reason": ctx["failed"],
+            **ctx["progress_meta"],
         }
-        
-    except Exception as e:
-        logger.error(f"Error processing PDF: {e}")
-        self.retry(exc=e, countdown=2 ** self.request.retries)
-        raise e
+    return {
+        "status": "completed",
+        "doc_id": ctx["doc_id"],
+        "chunks_count": ctx["chunks_count"],
+        "claims_count": ctx["claims_count"],
+        "claims_failed_chunks": ctx.get("claims_failed_chunks", 0),
+        "summary_precomputed": False,
+        "embedding_cache_hits": ctx["embedding_cache_hits"],
+        "embedding_cache_misses": ctx["embedding_cache_misses"],
+        "reused_stages": ctx["reused_stages"],
+        "points_inserted": ctx["points_inserted"],
+        "points_unchanged": ctx["points_unchanged"],
+        "points_deleted": ctx["points_deleted"],
+        **ctx["progress_meta"],
+    }
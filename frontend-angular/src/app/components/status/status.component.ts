@@ -598,12 +598,14 @@ export class StatusComponent implements OnDestroy {
     if (!mode) return 'Auto';
     if (mode === 'always') return 'Always OCR';
     if (mode === 'never') return 'Never OCR';
+    if (mode === 'per_page') return 'Per-page OCR';
     return 'Auto';
   }
 
   formatIngestionMode(mode?: string): string {
     if (mode === 'ocr') return 'OCR extraction';
     if (mode === 'digital_text') return 'Digital text path';
+    if (mode === 'hybrid') return 'Hybrid (OCR + digital text)';
     return 'Unknown';
   }
 
@@ -630,6 +632,7 @@ export class StatusComponent implements OnDestroy {
   private formatSkipReason(reason: string): string {
     if (reason === 'digital_pdf_detected') return 'digital PDF detected';
     if (reason === 'ocr_disabled_by_request') return 'disabled by request';
+    if (reason === 'all_pages_have_text') return 'all pages have text';
     return reason;
   }
 
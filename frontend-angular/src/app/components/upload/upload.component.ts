@@ -102,6 +102,7 @@ import { ApiService } from '../../services/api.service';
             <option value="auto">Auto detect</option>
             <option value="always">Always OCR</option>
             <option value="never">Never OCR</option>
+            <option value="per_page">OCR pages without text</option>
           </select>
         </label>
       </div>
@@ -1,4 +1,4 @@
-export type OcrMode = 'auto' | 'always' | 'never';
+export type OcrMode = 'auto' | 'always' | 'never' | 'per_page';
 export type SectionBucket = 'problem' | 'method' | 'results' | 'limitations' | 'other';
 export type ClaimType = 'method' | 'result' | 'assumption';
 export type TableVariant = 'raw_markdown' | 'normalized_row' | 'metric_fact';
@@ -18,8 +18,12 @@ export interface TaskProcessingInfo {
   ocr_used?: boolean;
   ocr_skipped?: boolean;
   ocr_skip_reason?: string;
-  ingestion_mode?: 'ocr' | 'digital_text';
+  ingestion_mode?: 'ocr' | 'digital_text' | 'hybrid';
   pdf_type?: string;
+  ocr_pages_count?: number;
+  digital_pages_count?: number;
+  table_pages_scanned?: number;
+  table_pages_skipped?: number;
 }
 
 export interface TaskResult {
@@ -31,8 +35,12 @@ export interface TaskResult {
   ocr_used?: boolean;
   ocr_skipped?: boolean;
   ocr_skip_reason?: string;
-  ingestion_mode?: 'ocr' | 'digital_text';
+  ingestion_mode?: 'ocr' | 'digital_text' | 'hybrid';
   pdf_type?: string;
+  ocr_pages_count?: number;
+  digital_pages_count?: number;
+  table_pages_scanned?: number;
+  table_pages_skipped?: number;
 }
 
 export interface TaskStatus {
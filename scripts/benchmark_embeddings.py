@@ -0,0 +1,74 @@
+"""
+Report embedding throughput (chunks/second) on CPU for different encode settings.
+
+Usage (from the repo root):
+    python scripts/benchmark_embeddings.py --chunks 2000 --processes 4
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.config import settings  # noqa: E402
+from app.services import embeddings  # noqa: E402
+
+VOCAB = (
+    "retrieval augmented generation transformer encoder baseline ablation accuracy "
+    "dataset benchmark contrastive loss we propose evaluate results table figure method"
+).split()
+
+
+def synthetic_chunks(count: int, seed: int = 0):
+    rng = random.Random(seed)
+    # Mix of short table rows / claims and long text chunks, like a real paper.
+    lengths = [rng.choice([12, 25, 60, 200, 400]) for _ in range(count)]
+    return [{"text": " ".join(rng.choices(VOCAB, k=n)), "metadata": {}} for n in lengths]
+
+
+def run(label: str, chunks, **overrides):
+    previous = {key: getattr(settings, key) for key in overrides}
+    for key, value in overrides.items():
+        setattr(settings, key, value)
+    try:
+        embeddings.generate_embeddings(chunks[:32])  # warm up / start pool
+        start = time.perf_counter()
+        embeddings.generate_embeddings(chunks)
+        elapsed = time.perf_counter() - start
+    finally:
+        embeddings._stop_pool()
+        for key, value in previous.items():
+            setattr(settings, key, value)
+    print(f"{label:<34} {len(chunks) / elapsed:8.1f} chunks/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=1000)
+    parser.add_argument("--processes", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    chunks = synthetic_chunks(args.chunks)
+    embeddings.get_model()
+    run("batch 32 (encode default)", chunks, EMBEDDING_BATCH_SIZE=32, EMBEDDING_SORT_BY_LENGTH=False)
+    run("batch 64", chunks, EMBEDDING_BATCH_SIZE=64)
+    run("batch 128", chunks, EMBEDDING_BATCH_SIZE=128)
+    run("batch 64, float16 output", chunks, EMBEDDING_BATCH_SIZE=64, EMBEDDING_DTYPE="float16")
+    if args.processes > 1:
+        run(
+            f"batch 64, {args.processes} processes, unsorted",
+            chunks,
+            EMBEDDING_PROCESSES=args.processes,
+            EMBEDDING_SORT_BY_LENGTH=False,
+        )
+        run(
+            f"batch 64, {args.processes} processes, sorted",
+            chunks,
+            EMBEDDING_PROCESSES=args.processes,
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Compare serial vs. process-pool PDF extraction.
+
+Usage (from the repo root):
+    python scripts/benchmark_extraction.py [pdf_path] --workers 4 --repeat 3
+
+If the PDF does not exist, a synthetic digital paper with --pages pages is generated.
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import fitz  # noqa: E402
+
+from app.core.config import settings  # noqa: E402
+from app.services.ocr import extract_text_from_pdf  # noqa: E402
+
+
+def create_synthetic_pdf(path: str, pages: int) -> None:
+    doc = fitz.open()
+    headings = ["Abstract", "Introduction", "Methods", "Results", "Limitations", "Conclusion"]
+    for idx in range(pages):
+        page = doc.new_page()
+        y = 72
+        if idx % max(1, pages // len(headings)) == 0:
+            page.insert_text((72, y), headings[(idx * len(headings)) // pages], fontsize=14)
+            y += 24
+        while y < 760:
+            page.insert_text(
+                (72, y),
+                f"Page {idx + 1}: the proposed retriever improves recall on every benchmark split.",
+                fontsize=10,
+            )
+            y += 14
+    doc.save(path)
+    doc.close()
+
+
+def time_extraction(pdf_path: str, workers: int, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        extract_text_from_pdf(pdf_path, ocr_mode="never", workers=workers)
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("pdf_path", nargs="?", default="tests/data/large.pdf")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--pages", type=int, default=300)
+    args = parser.parse_args()
+
+    if not os.path.exists(args.pdf_path):
+        print(f"{args.pdf_path} not found, generating a {args.pages}-page synthetic PDF")
+        os.makedirs(os.path.dirname(args.pdf_path) or ".", exist_ok=True)
+        create_synthetic_pdf(args.pdf_path, args.pages)
+
+    settings.PDF_PARALLEL_MIN_PAGES = 1
+    with fitz.open(args.pdf_path) as doc:
+        page_count = len(doc)
+
+    serial = time_extraction(args.pdf_path, 1, args.repeat)
+    parallel = time_extraction(args.pdf_path, args.workers, args.repeat)
+    print(f"pages={page_count} repeat={args.repeat}")
+    print(f"serial:               {serial:.2f}s ({page_count / serial:.1f} pages/s)")
+    print(f"parallel ({args.workers} workers): {parallel:.2f}s ({page_count / parallel:.1f} pages/s)")
+    print(f"speedup:              {serial / parallel:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+"""
+Filtered search and scroll latency vs. collection size, with and without the
+payload indexes init_collection creates.
+
+Two scratch collections (one indexed, one not) are filled with the same synthetic
+chunks in steps; after each step the filters /chat and /summary issue are timed
+against both.
+
+Usage (from the repo root):
+    python scripts/benchmark_payload_indexes.py --url http://localhost:6333 --sizes 10000 50000 200000
+    python scripts/benchmark_payload_indexes.py --memory --sizes 2000 10000
+
+The in-memory client ignores payload indexes (it always scans), so --memory only
+checks the harness and gives a scan baseline; use a Qdrant server for real numbers.
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+import uuid
+import warnings
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from qdrant_client import QdrantClient  # noqa: E402
+from qdrant_client.http import models  # noqa: E402
+
+from app.services import vector_store  # noqa: E402
+
+SECTIONS = ["Abstract", "Introduction", "Related Work", "Methods", "Results", "Limitations", "Conclusion"]
+BUCKETS = ["problem", "methods", "results", "limitations", "other"]
+CLAIM_TYPES = ["result", "method", "limitation", "comparison"]
+TABLE_VARIANTS = ["raw_markdown", "normalized_row", "metric_fact"]
+
+
+def synthetic_points(rng: random.Random, count: int, dim: int, docs: int):
+    vectors = np.random.default_rng(rng.randrange(2 ** 32)).standard_normal((count, dim), dtype=np.float32)
+    points = []
+    for vector in vectors:
+        is_table = rng.random() < 0.2
+        is_claim = not is_table and rng.random() < 0.3
+        payload = {
+            "doc_id": f"doc-{rng.randrange(docs)}",
+            "section": rng.choice(SECTIONS),
+            "section_bucket": rng.choice(BUCKETS),
+            "is_claim": is_claim,
+            "is_table": is_table,
+            "text": "synthetic chunk",
+        }
+        if is_claim:
+            payload["claim_type"] = rng.choice(CLAIM_TYPES)
+        if is_table:
+            payload["table_variant"] = rng.choice(TABLE_VARIANTS)
+        points.append(models.PointStruct(id=str(uuid.uuid4()), vector=vector.tolist(), payload=payload))
+    return points
+
+
+def search(client, collection_name, vector, query_filter, limit):
+    if hasattr(client, "search"):  # qdrant-client pinned in requirements.txt
+        return client.search(
+            collection_name=collection_name, query_vector=vector, query_filter=query_filter, limit=limit
+        )
+    return client.query_points(
+        collection_name=collection_name, query=vector, query_filter=query_filter, limit=limit
+    ).points
+
+
+def workload(rng: random.Random, docs: int, dim: int):
+    """(label, callable(client, collection)) pairs mirroring the API's filtered queries."""
+    doc_id = f"doc-{rng.randrange(docs)}"
+    vector = np.random.default_rng(rng.randrange(2 ** 32)).standard_normal(dim).tolist()
+    chat_filter = vector_store.build_filter(doc_id=doc_id, is_claim=True)
+    claim_filter = vector_store.build_filter(doc_id=doc_id, claim_type="result")
+    summary_filter = vector_store.build_filter(doc_id=doc_id, sections=["Methods"])
+    bucket_filter = vector_store.build_filter(doc_id=doc_id, section_bucket="results")
+    return [
+        ("chat search doc+is_claim", lambda c, n: search(c, n, vector, chat_filter, 5)),
+        ("chat search doc+claim_type", lambda c, n: search(c, n, vector, claim_filter, 5)),
+        ("summary scroll doc+sections", lambda c, n: c.scroll(
+            collection_name=n, scroll_filter=summary_filter, limit=8, with_vectors=False)),
+        ("summary scroll doc+bucket", lambda c, n: c.scroll(
+            collection_name=n, scroll_filter=bucket_filter, limit=8, with_vectors=False)),
+    ]
+
+
+def timed(fn, repeats: int):
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return statistics.median(samples), samples[int(0.95 * (len(samples) - 1))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument("--url", default="http://localhost:6333")
+    target.add_argument("--memory", action="store_true", help="use QdrantClient(':memory:')")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 50000, 100000])
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--docs", type=int, default=200, help="distinct doc_ids in the corpus")
+    parser.add_argument("--repeats", type=int, default=50)
+    parser.add_argument("--batch", type=int, default=1000)
+    parser.add_argument("--keep", action="store_true", help="keep the scratch collections")
+    args = parser.parse_args()
+
+    warnings.filterwarnings("ignore", message="Payload indexes have no effect")
+    client = QdrantClient(":memory:") if args.memory else QdrantClient(url=args.url)
+    collections = {"indexed": "bench_payload_indexed", "unindexed": "bench_payload_unindexed"}
+    for name in collections.values():
+        if any(c.name == name for c in client.get_collections().collections):
+            client.delete_collection(name)
+        client.create_collection(
+            collection_name=name,
+            vectors_config=models.VectorParams(size=args.dim, distance=models.Distance.COSINE),
+        )
+    vector_store.ensure_payload_indexes(client, collections["indexed"])
+
+    rng = random.Random(0)
+    size = 0
+    try:
+        print(f"{'points':>8}  {'query':<28} {'unindexed p50/p95 ms':>22} {'indexed p50/p95 ms':>20}")
+        for target_size in sorted(args.sizes):
+            while size < target_size:
+                batch = synthetic_points(rng, min(args.batch, target_size - size), args.dim, args.docs)
+                for name in collections.values():
+                    client.upsert(collection_name=name, points=batch, wait=True)
+                size += len(batch)
+
+            for label, query in workload(random.Random(target_size), args.docs, args.dim):
+                results = {}
+                for kind, name in collections.items():
+                    query(client, name)  # warm up
+                    results[kind] = timed(lambda: query(client, name), args.repeats)
+                unindexed, indexed = results["unindexed"], results["indexed"]
+                print(
+                    f"{size:>8}  {label:<28} {unindexed[0]:>10.2f}/{unindexed[1]:<10.2f}"
+                    f" {indexed[0]:>9.2f}/{indexed[1]:<9.2f}"
+                )
+    finally:
+        if not args.keep:
+            for name in collections.values():
+                client.delete_collection(name)
+
+
+if __name__ == "__main__":
+    main()
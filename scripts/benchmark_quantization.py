@@ -0,0 +1,154 @@
+"""
+Recall@k vs. search latency for the collection storage settings (quantization,
+rescoring, on-disk vectors, HNSW m / ef_construct / ef) over a synthetic corpus.
+
+Vectors are drawn around a few hundred cluster centres, like chunks from many
+papers, and exact top-k neighbours are computed with NumPy as ground truth. Each
+configuration gets its own scratch collection built through collection_config()
+and queried through search_params(), so the numbers match what the app runs.
+
+Usage (from the repo root):
+    python scripts/benchmark_quantization.py --url http://localhost:6333 --points 200000
+    python scripts/benchmark_quantization.py --memory --points 5000 --queries 50
+
+The in-memory client does exact search and ignores quantization and HNSW
+settings, so --memory only checks the harness; use a Qdrant server for real numbers.
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+import warnings
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from qdrant_client import QdrantClient  # noqa: E402
+from qdrant_client.http import models  # noqa: E402
+
+from app.core.config import settings  # noqa: E402
+from app.services import vector_store  # noqa: E402
+
+CONFIGS = [
+    ("float32, in RAM", {}),
+    ("float32, ef=32", {"QDRANT_HNSW_EF": 32}),
+    ("float32, ef=256", {"QDRANT_HNSW_EF": 256}),
+    ("float32, on-disk vectors", {"QDRANT_ON_DISK_VECTORS": True}),
+    ("scalar int8, rescore", {"QDRANT_QUANTIZATION": "scalar"}),
+    ("scalar int8, no rescore", {"QDRANT_QUANTIZATION": "scalar", "QDRANT_QUANTIZATION_RESCORE": False}),
+    ("scalar int8, rescore, on-disk", {"QDRANT_QUANTIZATION": "scalar", "QDRANT_ON_DISK_VECTORS": True}),
+    ("binary, rescore x3", {"QDRANT_QUANTIZATION": "binary", "QDRANT_QUANTIZATION_OVERSAMPLING": 3.0}),
+    ("binary, no rescore", {"QDRANT_QUANTIZATION": "binary", "QDRANT_QUANTIZATION_RESCORE": False}),
+    ("m=32, ef_construct=200", {"QDRANT_HNSW_M": 32, "QDRANT_HNSW_EF_CONSTRUCT": 200}),
+]
+
+
+def synthetic_corpus(points: int, queries: int, dim: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    centres = rng.standard_normal((max(1, points // 500), dim), dtype=np.float32)
+    corpus = centres[rng.integers(len(centres), size=points)]
+    corpus += 0.35 * rng.standard_normal((points, dim), dtype=np.float32)
+    query_vectors = centres[rng.integers(len(centres), size=queries)]
+    query_vectors += 0.35 * rng.standard_normal((queries, dim), dtype=np.float32)
+    return _normalize(corpus), _normalize(query_vectors)
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def exact_neighbours(corpus: np.ndarray, query_vectors: np.ndarray, k: int):
+    scores = query_vectors @ corpus.T
+    return [set(row) for row in np.argpartition(-scores, k, axis=1)[:, :k].tolist()]
+
+
+def search(client, collection_name, vector, limit, params):
+    if hasattr(client, "search"):  # qdrant-client pinned in requirements.txt
+        return client.search(
+            collection_name=collection_name, query_vector=vector, search_params=params, limit=limit
+        )
+    return client.query_points(
+        collection_name=collection_name, query=vector, search_params=params, limit=limit
+    ).points
+
+
+def wait_until_indexed(client, collection_name, timeout: float = 600):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        info = client.get_collection(collection_name)
+        if info.status == models.CollectionStatus.GREEN:
+            return
+        time.sleep(0.5)
+    print(f"warning: {collection_name} still optimizing after {timeout:.0f}s")
+
+
+def run(client, label, overrides, corpus, query_vectors, truth, k, batch):
+    previous = {key: getattr(settings, key) for key in overrides}
+    for key, value in overrides.items():
+        setattr(settings, key, value)
+    collection_name = "bench_quantization"
+    try:
+        if any(c.name == collection_name for c in client.get_collections().collections):
+            client.delete_collection(collection_name)
+        client.create_collection(collection_name=collection_name, **vector_store.collection_config())
+        start = time.perf_counter()
+        for offset in range(0, len(corpus), batch):
+            client.upsert(
+                collection_name=collection_name,
+                points=models.Batch(
+                    ids=list(range(offset, min(offset + batch, len(corpus)))),
+                    vectors=corpus[offset:offset + batch].tolist(),
+                ),
+                wait=True,
+            )
+        wait_until_indexed(client, collection_name)
+        build_seconds = time.perf_counter() - start
+
+        params = vector_store.search_params()
+        search(client, collection_name, query_vectors[0].tolist(), k, params)  # warm up
+        latencies, recalls = [], []
+        for vector, expected in zip(query_vectors, truth):
+            start = time.perf_counter()
+            hits = search(client, collection_name, vector.tolist(), k, params)
+            latencies.append((time.perf_counter() - start) * 1000)
+            recalls.append(len(expected & {hit.id for hit in hits}) / k)
+    finally:
+        client.delete_collection(collection_name)
+        for key, value in previous.items():
+            setattr(settings, key, value)
+
+    latencies.sort()
+    p95 = latencies[int(0.95 * (len(latencies) - 1))]
+    print(
+        f"{label:<32} recall@{k} {statistics.mean(recalls):6.3f}  "
+        f"p50 {statistics.median(latencies):7.2f} ms  p95 {p95:7.2f} ms  build {build_seconds:6.1f}s"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument("--url", default="http://localhost:6333")
+    target.add_argument("--memory", action="store_true", help="use QdrantClient(':memory:')")
+    parser.add_argument("--points", type=int, default=100000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--dim", type=int, default=settings.EMBEDDING_DIMENSION)
+    parser.add_argument("--k", type=int, default=settings.RAG_TOP_K)
+    parser.add_argument("--batch", type=int, default=1000)
+    args = parser.parse_args()
+
+    warnings.filterwarnings("ignore", message="Local mode performs exact")
+    client = QdrantClient(":memory:") if args.memory else QdrantClient(url=args.url)
+    corpus, query_vectors = synthetic_corpus(args.points, args.queries, args.dim)
+    truth = exact_neighbours(corpus, query_vectors, args.k)
+
+    settings.EMBEDDING_DIMENSION = args.dim
+    print(f"{args.points} points, {args.dim} dims, {args.queries} queries")
+    for label, overrides in CONFIGS:
+        run(client, label, overrides, corpus, query_vectors, truth, args.k, args.batch)
+
+
+if __name__ == "__main__":
+    main()
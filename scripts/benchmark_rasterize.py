@@ -0,0 +1,60 @@
+"""
+Micro-benchmark: PNG encode/decode rasterization vs. direct pixmap buffer view.
+
+Usage (from the repo root):
+    python scripts/benchmark_rasterize.py [pdf_path] --dpi 144 --pages 10
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import cv2  # noqa: E402
+import fitz  # noqa: E402
+import numpy as np  # noqa: E402
+
+from app.services.ocr import _pixmap_to_rgb_array, _render_page  # noqa: E402
+
+
+def rasterize_png_round_trip(page: fitz.Page, dpi: int) -> np.ndarray:
+    pix = page.get_pixmap(dpi=dpi)
+    nparr = np.frombuffer(pix.tobytes("png"), np.uint8)
+    img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+    return cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
+
+
+def rasterize_buffer_view(page: fitz.Page, dpi: int):
+    pix = _render_page(page, dpi)
+    return pix, _pixmap_to_rgb_array(pix)
+
+
+def time_per_page(fn, doc: fitz.Document, dpi: int, pages: int) -> float:
+    start = time.perf_counter()
+    for page_idx in range(pages):
+        fn(doc[page_idx], dpi)
+    return (time.perf_counter() - start) / pages
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("pdf_path", nargs="?", default="tests/data/small.pdf")
+    parser.add_argument("--dpi", type=int, default=144)
+    parser.add_argument("--pages", type=int, default=10)
+    args = parser.parse_args()
+
+    with fitz.open(args.pdf_path) as doc:
+        pages = min(args.pages, len(doc))
+        _, sample = rasterize_buffer_view(doc[0], args.dpi)
+        print(f"pages={pages} dpi={args.dpi} image={sample.shape} ({sample.nbytes / 1e6:.1f} MB)")
+
+        png = time_per_page(rasterize_png_round_trip, doc, args.dpi, pages)
+        view = time_per_page(rasterize_buffer_view, doc, args.dpi, pages)
+        print(f"png round trip: {png * 1000:.1f} ms/page")
+        print(f"buffer view:    {view * 1000:.1f} ms/page")
+        print(f"speedup:        {png / view:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
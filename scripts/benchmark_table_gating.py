@@ -0,0 +1,57 @@
+"""
+Measure extraction time saved by the table-detection pre-filter on text-heavy PDFs.
+
+Usage (from the repo root):
+    python scripts/benchmark_table_gating.py [pdf_path] --pages 100 --repeat 3
+
+If the PDF does not exist, a synthetic prose-only paper with --pages pages is generated.
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmark_extraction import create_synthetic_pdf  # noqa: E402
+
+from app.core.config import settings  # noqa: E402
+from app.services.ocr import extract_text_from_pdf  # noqa: E402
+
+
+def time_mode(pdf_path: str, mode: str, repeat: int):
+    settings.TABLE_DETECTION_MODE = mode
+    timings = []
+    meta = {}
+    for _ in range(repeat):
+        start = time.perf_counter()
+        _, meta = extract_text_from_pdf(pdf_path, ocr_mode="never", workers=1)
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings), meta
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("pdf_path", nargs="?", default="tests/data/text_heavy.pdf")
+    parser.add_argument("--pages", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    if not os.path.exists(args.pdf_path):
+        print(f"{args.pdf_path} not found, generating a {args.pages}-page synthetic PDF")
+        os.makedirs(os.path.dirname(args.pdf_path) or ".", exist_ok=True)
+        create_synthetic_pdf(args.pdf_path, args.pages)
+
+    always, always_meta = time_mode(args.pdf_path, "always", args.repeat)
+    gated, gated_meta = time_mode(args.pdf_path, "auto", args.repeat)
+    print(f"always: {always:.2f}s (scanned {always_meta['table_pages_scanned']} pages)")
+    print(
+        f"auto:   {gated:.2f}s (scanned {gated_meta['table_pages_scanned']}, "
+        f"skipped {gated_meta['table_pages_skipped']} pages)"
+    )
+    print(f"saved:  {always - gated:.2f}s ({(1 - gated / always) * 100:.0f}%)")
+
+
+if __name__ == "__main__":
+    main()
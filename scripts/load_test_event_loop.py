@@ -0,0 +1,144 @@
+"""
+Saturate /chat with slow (simulated) Qdrant and LLM calls and report /health and
+/status latency percentiles measured at the same time. With --inline the blocking
+calls run on the event loop, as they did before the bounded thread pools.
+
+Runs the app in-process; no Qdrant, Redis, OpenRouter or embedding model needed.
+
+Usage (from the repo root):
+    python scripts/load_test_event_loop.py --chat-concurrency 32 --llm-seconds 1.0
+    python scripts/load_test_event_loop.py --inline
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+from unittest.mock import MagicMock, patch
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np  # noqa: E402
+from httpx import ASGITransport, AsyncClient  # noqa: E402
+
+from app.api import routes  # noqa: E402
+from app.api.main import app  # noqa: E402
+
+
+def fake_services(search_seconds: float, llm_seconds: float):
+    model = MagicMock()
+    model.encode.side_effect = lambda texts, **kwargs: np.full((len(texts), 384), 0.1)
+
+    hit = MagicMock()
+    hit.payload = {"text": "Evidence.", "page": 1, "section": "Results"}
+
+    def search(*args, **kwargs):
+        time.sleep(search_seconds)
+        return [hit]
+
+    def generate(prompt, system_prompt=None):
+        time.sleep(llm_seconds)
+        return "Answer [Page 1, Section Results]."
+
+    llm = MagicMock()
+    llm.generate_response.side_effect = generate
+    celery = MagicMock()
+    celery.AsyncResult.return_value.status = "PENDING"
+    return model, search, llm, celery
+
+
+async def run_inline(name, fn, *args, **kwargs):
+    return fn(*args, **kwargs)
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+async def probe(client: AsyncClient, path: str, stop: asyncio.Event, interval: float):
+    # Latency is measured from when the probe was due, not when it got to run, so
+    # time spent waiting for a blocked event loop counts (no coordinated omission).
+    latencies = []
+    due = time.perf_counter()
+    while True:
+        await asyncio.sleep(max(0.0, due - time.perf_counter()))
+        response = await client.get(path)
+        response.raise_for_status()
+        latencies.append((time.perf_counter() - due) * 1000)
+        if stop.is_set():
+            return latencies
+        due = max(due + interval, time.perf_counter())
+
+
+async def chat_worker(client: AsyncClient, worker: int, requests: int):
+    for i in range(requests):
+        response = await client.post("/api/v1/chat", json={"query": f"question {worker}-{i}"})
+        response.raise_for_status()
+
+
+async def run(args) -> None:
+    routes.limiter.enabled = False
+    stop = asyncio.Event()
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test", timeout=None) as client:
+        idle = await probe_for(client, args.interval, args.idle_seconds)
+        probes = [
+            asyncio.create_task(probe(client, "/api/v1/health", stop, args.interval)),
+            asyncio.create_task(probe(client, "/api/v1/status/some-task", stop, args.interval)),
+        ]
+        start = time.perf_counter()
+        await asyncio.gather(*[
+            chat_worker(client, worker, args.chat_requests)
+            for worker in range(args.chat_concurrency)
+        ])
+        elapsed = time.perf_counter() - start
+        stop.set()
+        health, status = await asyncio.gather(*probes)
+
+    chats = args.chat_concurrency * args.chat_requests
+    print(f"mode: {'inline (blocking)' if args.inline else 'thread pools'}")
+    print(f"/chat: {chats} requests in {elapsed:.1f}s ({chats / elapsed:.1f} req/s)")
+    for label, values in (("/health idle", idle), ("/health", health), ("/status", status)):
+        if not values:
+            print(f"{label:<14} no samples")
+            continue
+        print(
+            f"{label:<14} n={len(values):<5} p50={statistics.median(values):8.2f}ms "
+            f"p99={percentile(values, 99):8.2f}ms max={max(values):8.2f}ms"
+        )
+
+
+async def probe_for(client: AsyncClient, interval: float, seconds: float):
+    stop = asyncio.Event()
+    task = asyncio.create_task(probe(client, "/api/v1/health", stop, interval))
+    await asyncio.sleep(seconds)
+    stop.set()
+    return await task
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chat-concurrency", type=int, default=32)
+    parser.add_argument("--chat-requests", type=int, default=3, help="requests per concurrent client")
+    parser.add_argument("--search-seconds", type=float, default=0.05)
+    parser.add_argument("--llm-seconds", type=float, default=1.0)
+    parser.add_argument("--interval", type=float, default=0.01, help="seconds between probe requests")
+    parser.add_argument("--idle-seconds", type=float, default=1.0)
+    parser.add_argument("--inline", action="store_true", help="run blocking calls on the event loop")
+    args = parser.parse_args()
+
+    model, search, llm, celery = fake_services(args.search_seconds, args.llm_seconds)
+    with patch.object(routes, "get_model", return_value=model), \
+         patch.object(routes, "search_vectors", search), \
+         patch.object(routes, "llm_client", llm), \
+         patch.object(routes, "celery_app", celery):
+        if args.inline:
+            with patch.object(routes, "run_blocking", run_inline):
+                asyncio.run(run(args))
+        else:
+            asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
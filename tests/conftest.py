@@ -0,0 +1,11 @@
+import pytest
+
+from app.core.config import settings
+from app.services.answer_cache import answer_cache
+
+
+@pytest.fixture(autouse=True)
+def isolated_upload_dir(tmp_path, monkeypatch):
+    # Uploads, cached summaries and cached answers must not leak between tests (or from a real /app/uploads).
+    monkeypatch.setattr(settings, "UPLOAD_DIR", str(tmp_path / "uploads"))
+    answer_cache.clear()
@@ -0,0 +1,105 @@
+from unittest.mock import MagicMock, patch
+
+import numpy as np
+import pytest
+from httpx import ASGITransport, AsyncClient
+
+from app.api.main import app
+from app.services.answer_cache import SemanticAnswerCache, mark_document_reindexed
+from app.services.llm import GENERATION_ERROR_MESSAGE
+
+FILTERS = {"doc_id": "doc-1", "sections": ["Results", "Methods"], "is_table": None}
+
+
+def _cache(**overrides):
+    options = {"max_entries": 10, "ttl_seconds": 60, "threshold": 0.95}
+    options.update(overrides)
+    return SemanticAnswerCache(**options)
+
+
+def test_near_duplicate_query_hits_under_same_filters():
+    cache = _cache()
+    cache.put(FILTERS, [1.0, 0.0, 0.0], {"answer": "A", "citations": []})
+
+    assert cache.get(FILTERS, [0.99, 0.05, 0.0]) == {"answer": "A", "citations": []}
+    assert cache.get({**FILTERS, "sections": ["Methods", "Results"]}, [1.0, 0.0, 0.0]) is not None
+    assert cache.get(FILTERS, [0.0, 1.0, 0.0]) is None
+    assert cache.get({**FILTERS, "is_table": True}, [1.0, 0.0, 0.0]) is None
+    assert cache.get({**FILTERS, "doc_id": "doc-2"}, [1.0, 0.0, 0.0]) is None
+    assert cache.stats() == {"hits": 2, "misses": 3, "hit_rate": 0.4, "entries": 1}
+
+
+def test_entries_expire_and_are_bounded():
+    cache = _cache(ttl_seconds=0)
+    cache.put(FILTERS, [1.0, 0.0], {"answer": "A", "citations": []})
+    assert cache.get(FILTERS, [1.0, 0.0]) is None
+    assert cache.stats()["entries"] == 0
+
+    cache = _cache(max_entries=2)
+    for i in range(3):
+        cache.put({"doc_id": f"doc-{i}"}, [1.0, 0.0], {"answer": str(i), "citations": []})
+    assert cache.stats()["entries"] == 2
+    assert cache.get({"doc_id": "doc-0"}, [1.0, 0.0]) is None
+
+
+def test_reindexing_a_document_invalidates_its_answers():
+    cache = _cache()
+    cache.put(FILTERS, [1.0, 0.0], {"answer": "A", "citations": []})
+    cache.put({"doc_id": "doc-2"}, [1.0, 0.0], {"answer": "B", "citations": []})
+    cache.put({}, [1.0, 0.0], {"answer": "all docs", "citations": []})
+
+    mark_document_reindexed("doc-1")
+
+    assert cache.get(FILTERS, [1.0, 0.0]) is None
+    assert cache.get({"doc_id": "doc-2"}, [1.0, 0.0]) == {"answer": "B", "citations": []}
+    assert cache.get({}, [1.0, 0.0]) is None
+
+
+@pytest.mark.asyncio
+async def test_chat_serves_repeated_question_from_cache():
+    with patch("app.api.routes.search_vectors") as mock_search, \
+         patch("app.api.routes.llm_client") as mock_llm, \
+         patch("app.api.routes.get_model") as mock_get_model:
+        mock_model = MagicMock()
+        mock_model.encode.side_effect = lambda texts, **kwargs: np.tile([0.5, 0.5, 0.1], (len(texts), 1))
+        mock_get_model.return_value = mock_model
+        hit = MagicMock()
+        hit.payload = {"text": "Accuracy is 91%.", "page": 4, "section": "Results"}
+        mock_search.return_value = [hit]
+        mock_llm.generate_response.return_value = "Accuracy is 91% [Page 4, Section Results]."
+
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+            first = await ac.post("/api/v1/chat", json={"query": "What accuracy?", "doc_id": "doc-9"})
+            second = await ac.post("/api/v1/chat", json={"query": "What accuracy ?", "doc_id": "doc-9"})
+            stats = await ac.get("/api/v1/cache/stats")
+
+    assert first.json() == second.json()
+    assert mock_search.call_count == 1
+    assert mock_llm.generate_response.call_count == 1
+    assert stats.json()["chat_answers"]["hits"] >= 1
+
+
+@pytest.mark.asyncio
+async def test_chat_does_not_repair_or_cache_failed_generation():
+    with patch("app.api.routes.search_vectors") as mock_search, \
+         patch("app.api.routes.llm_client") as mock_llm, \
+         patch("app.api.routes.get_model") as mock_get_model:
+        mock_model = MagicMock()
+        mock_model.encode.side_effect = lambda texts, **kwargs: np.tile([0.2, 0.7, 0.3], (len(texts), 1))
+        mock_get_model.return_value = mock_model
+        hit = MagicMock()
+        hit.payload = {"text": "Accuracy is 91%.", "page": 4, "section": "Results"}
+        mock_search.return_value = [hit]
+        mock_llm.generate_response.side_effect = [
+            GENERATION_ERROR_MESSAGE,
+            "Accuracy is 91% [Page 4, Section Results].",
+        ]
+
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+            first = await ac.post("/api/v1/chat", json={"query": "What accuracy?", "doc_id": "doc-8"})
+            second = await ac.post("/api/v1/chat", json={"query": "What accuracy?", "doc_id": "doc-8"})
+
+    assert first.json()["answer"] == GENERATION_ERROR_MESSAGE
+    assert second.json()["answer"] == "Accuracy is 91% [Page 4, Section Results]."
+    # One generation per request; the failed one got no citation-repair call.
+    assert mock_llm.generate_response.call_count == 2
@@ -0,0 +1,143 @@
+import random
+import time
+from unittest.mock import patch
+
+import httpx
+import pytest
+from openai import RateLimitError
+
+from app.services.claims import ClaimExtractionError, extract_claim_chunks
+from app.services.llm import LLMClient
+
+
+def _chunk(text, page, is_table=False):
+    return {"text": text, "metadata": {"doc_id": "doc-1", "page": page, "is_table": is_table}}
+
+
+def test_batched_prompt_is_split_back_per_passage():
+    client = LLMClient()
+    reply = (
+        "### PASSAGE 1\n- [METHOD] We fine-tune a small encoder.\n\n"
+        "### PASSAGE 2\n\n"
+        "### PASSAGE 3\n- [RESULT] Recall improves by 4 points.\n- Assume clean labels."
+    )
+    with patch.object(client, "complete", return_value=reply) as complete:
+        claims = client.extract_claims_batch(["a", "b", "c"])
+
+    assert complete.call_count == 1
+    assert "### PASSAGE 2\nb" in complete.call_args.args[0]
+    assert claims == [
+        [{"text": "We fine-tune a small encoder.", "claim_type": "method"}],
+        [],
+        [
+            {"text": "Recall improves by 4 points.", "claim_type": "result"},
+            {"text": "Assume clean labels.", "claim_type": "assumption"},
+        ],
+    ]
+
+
+def test_batched_reply_without_headers_falls_back_to_single_prompts():
+    client = LLMClient()
+    replies = ["- [RESULT] Mixed up reply.", "- [RESULT] First.", "- [METHOD] Second."]
+    with patch.object(client, "complete", side_effect=replies) as complete:
+        claims = client.extract_claims_batch(["a", "b"])
+
+    assert complete.call_count == 3
+    assert claims == [
+        [{"text": "First.", "claim_type": "result"}],
+        [{"text": "Second.", "claim_type": "method"}],
+    ]
+
+
+def test_concurrent_extraction_preserves_order_and_attribution():
+    chunks = [_chunk(f"text {i}", page=i, is_table=(i % 5 == 0)) for i in range(20)]
+
+    def fake_batch(texts):
+        time.sleep(random.random() * 0.01)
+        return [[{"text": f"claim from {text}", "claim_type": "RESULT"}] for text in texts]
+
+    with patch("app.services.claims.llm_client.extract_claims_batch", side_effect=fake_batch), \
+         patch("app.services.claims.settings.CLAIM_EXTRACTION_CONCURRENCY", 4), \
+         patch("app.services.claims.settings.CLAIM_EXTRACTION_CHUNKS_PER_PROMPT", 3):
+        claim_chunks = extract_claim_chunks(chunks)
+
+    expected_pages = [i for i in range(20) if i % 5]
+    assert [c["metadata"]["page"] for c in claim_chunks] == expected_pages
+    assert [c["text"] for c in claim_chunks] == [f"claim from text {i}" for i in expected_pages]
+    first = claim_chunks[0]["metadata"]
+    assert first["is_claim"] is True
+    assert first["claim_type"] == "result"
+    assert first["content_type"] == "claim"
+    assert first["original_text"] == "text 1"
+
+
+def test_rate_limited_prompt_is_retried():
+    response = httpx.Response(
+        429, headers={"retry-after": "0"}, request=httpx.Request("POST", "http://llm.test")
+    )
+    calls = []
+
+    def flaky_batch(texts):
+        calls.append(texts)
+        if len(calls) == 1:
+            raise RateLimitError("slow down", response=response, body=None)
+        return [[{"text": "Recovered.", "claim_type": "result"}] for _ in texts]
+
+    with patch("app.services.claims.llm_client.extract_claims_batch", side_effect=flaky_batch):
+        claim_chunks = extract_claim_chunks([_chunk("text", page=1)])
+
+    assert len(calls) == 2
+    assert [c["text"] for c in claim_chunks] == ["Recovered."]
+
+
+def test_prompt_failing_after_retries_is_reported_with_partial_claims():
+    def batch(texts):
+        if texts == ["broken"]:
+            raise ValueError("bad")
+        return [[{"text": f"claim from {text}", "claim_type": "result"}] for text in texts]
+
+    with patch("app.services.claims.llm_client.extract_claims_batch", side_effect=batch):
+        with pytest.raises(ClaimExtractionError) as excinfo:
+            extract_claim_chunks([_chunk("fine", page=1), _chunk("broken", page=2)])
+
+    assert excinfo.value.failed_chunks == 1
+    assert [c["text"] for c in excinfo.value.claim_chunks] == ["claim from fine"]
+    # A ValueError (e.g. no API key) will not go away on retry.
+    assert excinfo.value.retryable is False
+
+
+def test_rate_limit_failure_is_retryable_and_keeps_finished_prompts():
+    response = httpx.Response(429, request=httpx.Request("POST", "http://llm.test"))
+
+    def batch(texts):
+        if texts == ["throttled"]:
+            raise RateLimitError("slow down", response=response, body=None)
+        return [[{"text": f"claim from {text}", "claim_type": "result"}] for text in texts]
+
+    chunks = [_chunk("fine", page=1), _chunk("throttled", page=2)]
+    with patch("app.services.claims.llm_client.extract_claims_batch", side_effect=batch), \
+         patch("app.services.claims.settings.CLAIM_EXTRACTION_MAX_RETRIES", 0):
+        with pytest.raises(ClaimExtractionError) as excinfo:
+            extract_claim_chunks(chunks)
+
+    assert excinfo.value.retryable is True
+    assert excinfo.value.group_results == [[[{"text": "claim from fine", "claim_type": "result"}]], None]
+
+    with patch("app.services.claims.llm_client.extract_claims_batch") as retried:
+        retried.return_value = [[{"text": "claim from throttled", "claim_type": "result"}]]
+        claim_chunks = extract_claim_chunks(chunks, previous=excinfo.value.group_results)
+
+    retried.assert_called_once_with(["throttled"])
+    assert [c["text"] for c in claim_chunks] == ["claim from fine", "claim from throttled"]
+
+
+def test_claim_client_leaves_retries_to_backoff(monkeypatch):
+    from app.services import claims
+
+    monkeypatch.setattr(claims.settings, "OPENROUTER_API_KEY", "test-key")
+    client = claims.llm_client
+    previous, client.client = client.client, None
+    try:
+        assert client._ensure_client().max_retries == 0
+    finally:
+        client.client = previous
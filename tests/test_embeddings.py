@@ -0,0 +1,107 @@
+from unittest.mock import MagicMock, patch
+
+import numpy as np
+import pytest
+
+from app.services import embeddings
+from app.services.embedding_cache import EmbeddingCache, SQLiteEmbeddingCache, cache_key
+
+
+def _fake_model():
+    model = MagicMock()
+    # Each vector encodes its text length so ordering can be checked after sorting.
+    model.encode.side_effect = lambda texts, **kwargs: np.array(
+        [[float(len(t)), 1.0] for t in texts], dtype=np.float32
+    )
+    return model
+
+
+def test_generate_embeddings_keeps_vectors_as_contiguous_array_rows():
+    chunks = [
+        {"text": "short", "metadata": {"page": 1}},
+        {"text": "a much longer chunk of text", "metadata": {"page": 2}},
+        {"text": "mid length", "metadata": {"page": 3}},
+    ]
+    model = _fake_model()
+
+    with patch("app.services.embeddings.get_model", return_value=model), \
+         patch("app.services.embeddings.settings.EMBEDDING_BATCH_SIZE", 16):
+        results = embeddings.generate_embeddings(chunks)
+
+    _, kwargs = model.encode.call_args
+    assert kwargs["batch_size"] == 16
+    # Sorted longest-first for encoding, then restored to input order.
+    assert model.encode.call_args.args[0][0] == "a much longer chunk of text"
+    assert [r["vector"][0] for r in results] == [5.0, 27.0, 10.0]
+    assert [r["payload"]["page"] for r in results] == [1, 2, 3]
+    assert isinstance(results[0]["vector"], np.ndarray)
+    assert results[0]["vector"].base is results[1]["vector"].base
+
+
+def test_encode_texts_honours_float16_dtype():
+    with patch("app.services.embeddings.get_model", return_value=_fake_model()), \
+         patch("app.services.embeddings.settings.EMBEDDING_DTYPE", "float16"):
+        vectors = embeddings.encode_texts(["one", "three"])
+
+    assert vectors.dtype == np.float16
+    assert vectors.flags["C_CONTIGUOUS"]
+
+
+def test_sqlite_cache_bulk_round_trip_and_lru_eviction(tmp_path):
+    cache = SQLiteEmbeddingCache(str(tmp_path / "cache.sqlite3"), max_entries=2)
+    vectors = {key: np.full(3, idx, dtype=np.float32) for idx, key in enumerate("abc")}
+
+    cache.put_many([("a", vectors["a"]), ("b", vectors["b"])])
+    assert set(cache.get_many(["a", "zzz"])) == {"a"}  # touches "a"
+    cache.put_many([("c", vectors["c"])])  # evicts least recently used "b"
+
+    found = cache.get_many(["a", "b", "c"])
+    assert set(found) == {"a", "c"}
+    assert np.array_equal(found["c"], vectors["c"])
+    assert cache.stats() == {"hits": 3, "misses": 2}
+
+
+def test_cache_key_normalizes_whitespace_and_scopes_by_model():
+    assert cache_key("the  result\n is 42", "m1") == cache_key("the result is 42", "m1")
+    assert cache_key("the result is 42", "m1") != cache_key("the result is 42", "m2")
+
+
+def test_encode_texts_only_encodes_cache_misses(tmp_path):
+    cache = SQLiteEmbeddingCache(str(tmp_path / "cache.sqlite3"), max_entries=100)
+    model = _fake_model()
+
+    with patch("app.services.embeddings.get_model", return_value=model), \
+         patch("app.services.embeddings.get_embedding_cache", return_value=cache):
+        first = embeddings.encode_texts(["license text", "claim one", "license text"])
+        second = embeddings.encode_texts(["claim one", "new claim", "license text"])
+
+    encoded_calls = [sorted(call.args[0]) for call in model.encode.call_args_list]
+    assert encoded_calls == [["claim one", "license text"], ["new claim"]]
+    assert np.array_equal(first[0], first[2])
+    assert np.array_equal(second[0], first[1])
+    assert second[1][0] == len("new claim")
+
+
+def test_cache_backend_missing_overrides_fails_at_construction():
+    class IncompleteCache(EmbeddingCache):
+        def _get_many(self, keys):
+            return {}
+
+    with pytest.raises(TypeError):
+        IncompleteCache(max_entries=10)
+
+
+def test_token_counting_loads_only_the_tokenizer(monkeypatch):
+    tokenizer = MagicMock()
+    tokenizer.num_special_tokens_to_add.return_value = 2
+    tokenizer.side_effect = lambda texts, **kwargs: {"input_ids": [t.split() for t in texts]}
+    monkeypatch.setattr(embeddings, "_model", None)
+    monkeypatch.setattr(embeddings, "_tokenizer", None)
+    monkeypatch.setattr(embeddings.settings, "EMBEDDING_MODEL", "all-MiniLM-L6-v2")
+
+    with patch("transformers.AutoTokenizer.from_pretrained", return_value=tokenizer) as load, \
+         patch("app.services.embeddings.get_model", side_effect=AssertionError("model loaded")):
+        assert embeddings.count_tokens(["two words", "three more words"]) == [2, 3]
+        assert embeddings.max_input_tokens() == embeddings.settings.EMBEDDING_MAX_SEQ_LENGTH - 2
+
+    load.assert_called_once_with("sentence-transformers/all-MiniLM-L6-v2")
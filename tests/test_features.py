@@ -1,3 +1,6 @@
+import asyncio
+import threading
+
 import pytest
 from httpx import AsyncClient, ASGITransport
 from app.api.main import app
@@ -114,3 +117,116 @@ async def test_chat_supports_section_filters():
         _, kwargs = mock_search.call_args
         assert kwargs["doc_id"] == "test_doc"
         assert kwargs["sections"] == ["Methods", "Results"]
+
+
+@pytest.mark.asyncio
+async def test_slow_llm_call_does_not_block_other_requests():
+    release = threading.Event()
+
+    def slow_generate(prompt, system_prompt=None):
+        release.wait(timeout=5)
+        return "Answer [Page 1, Section Results]."
+
+    with patch("app.api.routes.search_vectors") as mock_search, \
+         patch("app.api.routes.llm_client") as mock_llm, \
+         patch("app.api.routes.get_model") as mock_get_model:
+        mock_model = MagicMock()
+        mock_model.encode.return_value = np.array([0.2] * 384)
+        mock_get_model.return_value = mock_model
+        mock_hit = MagicMock()
+        mock_hit.payload = {"text": "Evidence.", "page": 1, "section": "Results"}
+        mock_search.return_value = [mock_hit]
+        mock_llm.generate_response.side_effect = slow_generate
+
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+            chat = asyncio.create_task(
+                ac.post("/api/v1/chat", json={"query": "Is the loop free while the LLM runs?"})
+            )
+            await asyncio.sleep(0.05)
+            health = await asyncio.wait_for(ac.get("/api/v1/health"), timeout=1)
+            assert health.status_code == 200
+            assert not chat.done()
+
+            release.set()
+            response = await asyncio.wait_for(chat, timeout=5)
+
+    assert response.status_code == 200
+    assert response.json()["answer"] == "Answer [Page 1, Section Results]."
+
+
+@pytest.mark.asyncio
+async def test_summary_keeps_bucket_fallback_per_label():
+    def search(doc_id=None, sections=None, section_bucket=None, top_k=5):
+        hit = MagicMock()
+        if sections == ["Methods"]:
+            hit.payload = {"text": "We fine-tune.", "page": 2, "section": "Methods"}
+            return [hit]
+        if section_bucket == "problem":
+            hit.payload = {"text": "Search is slow.", "page": 1, "section": "Overview"}
+            return [hit]
+        return []
+
+    with patch("app.api.routes.search_vectors", side_effect=search) as mock_search, \
+         patch("app.api.routes.llm_client") as mock_llm:
+        mock_llm.generate_response.return_value = "Structured summary content"
+
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+            response = await ac.get("/api/v1/summary/test_doc")
+
+    assert response.status_code == 200
+    prompt = mock_llm.generate_response.call_args.args[0]
+    assert "Problem Evidence:\n[Page 1, Section Overview] Search is slow." in prompt
+    assert "Method Evidence:\n[Page 2, Section Methods] We fine-tune." in prompt
+    assert "Key Results Evidence" not in prompt
+    assert "Limitations Evidence" not in prompt
+    # Four section lookups, then bucket fallbacks only for the three empty labels.
+    assert mock_search.call_count == 7
+    buckets = [
+        c.kwargs["section_bucket"] for c in mock_search.call_args_list if c.kwargs.get("section_bucket")
+    ]
+    assert len(buckets) == 3
+    assert "method" not in buckets
+    assert sorted(buckets) == ["limitations", "problem", "results"]
+
+
+@pytest.mark.asyncio
+async def test_summary_skips_bucket_fallback_when_sections_match():
+    hit = MagicMock()
+    hit.payload = {"text": "Evidence.", "page": 1, "section": "Abstract"}
+
+    with patch("app.api.routes.search_vectors", return_value=[hit]) as mock_search, \
+         patch("app.api.routes.llm_client") as mock_llm:
+        mock_llm.generate_response.return_value = "Structured summary content"
+
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+            response = await ac.get("/api/v1/summary/test_doc")
+
+    assert response.status_code == 200
+    assert mock_search.call_count == 4
+    assert all("section_bucket" not in c.kwargs for c in mock_search.call_args_list)
+
+@pytest.mark.asyncio
+async def test_chat_hydrates_slim_hits_from_text_store():
+    from app.services.text_store import get_text_store
+
+    get_text_store().put_many([
+        ("point-1", "doc_1", {"text": "Recall improves by 4 points.", "filename": "doc_1.pdf"}),
+    ])
+    slim_hit = MagicMock()
+    slim_hit.id = "point-1"
+    slim_hit.payload = {"doc_id": "doc_1", "page": 2, "section": "Results", "content_type": "text"}
+
+    with patch("app.api.routes.search_vectors", return_value=[slim_hit]), \
+         patch("app.api.routes.llm_client") as mock_llm, \
+         patch("app.api.routes.get_model") as mock_get_model:
+        mock_get_model.return_value.encode.return_value = np.array([0.3] * 384)
+        mock_llm.generate_response.return_value = "Recall improves [Page 2, Section Results]."
+
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+            response = await ac.post("/api/v1/chat", json={"query": "How much does recall improve?"})
+
+    assert response.status_code == 200
+    citation = response.json()["citations"][0]
+    assert citation["filename"] == "doc_1.pdf"
+    assert citation["text_snippet"].startswith("Recall improves by 4 points.")
+    assert "Recall improves by 4 points." in mock_llm.generate_response.call_args.args[0]
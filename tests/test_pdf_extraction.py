@@ -0,0 +1,264 @@
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import fitz
+import numpy as np
+import pandas as pd
+
+from app.services.ocr import (
+    _detect_digital_pdf,
+    _ocr_page_batches,
+    _page_shards,
+    _pixmap_to_rgb_array,
+    _render_page,
+    _table_to_payload,
+    extract_text_from_pdf,
+)
+
+
+def _write_paper(path, pages=6):
+    doc = fitz.open()
+    headings = {0: "Abstract", 2: "Methods", 4: "Results"}
+    for idx in range(pages):
+        page = doc.new_page()
+        y = 72
+        if idx in headings:
+            page.insert_text((72, y), headings[idx], fontsize=14)
+            y += 24
+        for line_idx in range(12):
+            page.insert_text(
+                (72, y),
+                f"Page {idx + 1} line {line_idx + 1} describes the retrieval experiment in detail.",
+                fontsize=10,
+            )
+            y += 14
+    doc.save(str(path))
+    doc.close()
+
+
+def _draw_ruled_table(page, rows, x0=72, y0=400):
+    for r in range(len(rows) + 1):
+        page.draw_line((x0, y0 + r * 20), (x0 + 300, y0 + r * 20))
+    for c in range(len(rows[0]) + 1):
+        page.draw_line((x0 + c * 150, y0), (x0 + c * 150, y0 + len(rows) * 20))
+    for r, row in enumerate(rows):
+        for c, value in enumerate(row):
+            page.insert_text((x0 + 5 + c * 150, y0 + 15 + r * 20), value, fontsize=10)
+
+
+def test_page_shards_cover_every_page_in_order():
+    shards = _page_shards(10, 2)
+    covered = [page for start, stop in shards for page in range(start, stop)]
+    assert covered == list(range(10))
+
+
+def test_parallel_extraction_matches_serial(tmp_path):
+    pdf_path = tmp_path / "paper.pdf"
+    _write_paper(pdf_path)
+
+    serial_pages, serial_meta = extract_text_from_pdf(str(pdf_path), ocr_mode="never", workers=1)
+    with patch("app.services.ocr.settings.PDF_PARALLEL_MIN_PAGES", 2):
+        parallel_pages, parallel_meta = extract_text_from_pdf(
+            str(pdf_path), ocr_mode="never", workers=2
+        )
+
+    assert serial_meta["extraction_workers"] == 1
+    assert parallel_meta["extraction_workers"] == 2
+    assert parallel_pages == serial_pages
+
+    # Section state carries over page boundaries (page 2 has no heading of its own).
+    assert {line["section"] for line in parallel_pages[1]["content"]} == {"Abstract"}
+    assert parallel_pages[-1]["content"][-1]["section"] == "Results"
+
+
+class _FakePredictor:
+    """Returns one OCR line per image, labelled with the image's global position."""
+
+    def __init__(self, headings=None):
+        self.batch_sizes = []
+        self.headings = headings or {}
+        self.seen = 0
+
+    def __call__(self, images):
+        self.batch_sizes.append(len(images))
+        pages = []
+        for _ in images:
+            self.seen += 1
+            texts = [self.headings.get(self.seen), f"ocr text for image {self.seen}"]
+            lines = [
+                SimpleNamespace(words=[SimpleNamespace(value=w) for w in text.split()])
+                for text in texts
+                if text
+            ]
+            pages.append(SimpleNamespace(blocks=[SimpleNamespace(lines=lines)]))
+        return SimpleNamespace(pages=pages)
+
+
+def test_ocr_page_batches_respect_size_and_memory_cap(tmp_path):
+    pdf_path = tmp_path / "scan.pdf"
+    _write_paper(pdf_path, pages=5)
+    with fitz.open(str(pdf_path)) as doc:
+        assert _ocr_page_batches(doc, batch_size=2, max_batch_bytes=10**9, dpi=144) == [[0, 1], [2, 3], [4]]
+        # A cap smaller than a single page still makes progress one page at a time.
+        assert _ocr_page_batches(doc, batch_size=8, max_batch_bytes=1, dpi=144) == [[0], [1], [2], [3], [4]]
+
+
+def test_ocr_batches_map_results_back_to_pages(tmp_path):
+    pdf_path = tmp_path / "scan.pdf"
+    _write_paper(pdf_path, pages=5)
+    predictor = _FakePredictor(headings={3: "Methods"})
+
+    with patch("app.services.ocr.get_predictor", return_value=predictor), patch(
+        "app.services.ocr.settings.OCR_BATCH_SIZE", 2
+    ):
+        pages, meta = extract_text_from_pdf(str(pdf_path), ocr_mode="always")
+
+    assert meta["ocr_used"] is True
+    assert predictor.batch_sizes == [2, 2, 1]
+    assert [p["page"] for p in pages] == [1, 2, 3, 4, 5]
+    assert pages[1]["content"][-1]["text"] == "ocr text for image 2"
+    assert pages[2]["content"][0]["section"] == "Methods"
+    assert pages[4]["content"][-1]["section"] == "Methods"
+
+
+def test_pixmap_view_matches_png_round_trip(tmp_path):
+    import cv2
+    import numpy as np
+
+    pdf_path = tmp_path / "paper.pdf"
+    _write_paper(pdf_path, pages=1)
+    with fitz.open(str(pdf_path)) as doc:
+        pix = _render_page(doc[0], dpi=144)
+        img = _pixmap_to_rgb_array(pix)
+
+        png_img = cv2.imdecode(np.frombuffer(pix.tobytes("png"), np.uint8), cv2.IMREAD_COLOR)
+        png_img = cv2.cvtColor(png_img, cv2.COLOR_BGR2RGB)
+
+        assert img.shape == (pix.height, pix.width, 3)
+        assert img.dtype == np.uint8
+        assert np.array_equal(img, png_img)
+
+
+def test_digital_extraction_reads_each_page_once(tmp_path):
+    pdf_path = tmp_path / "paper.pdf"
+    _write_paper(pdf_path, pages=4)
+    original_get_text = fitz.Page.get_text
+
+    with patch.object(
+        fitz.Page, "get_text", autospec=True, side_effect=original_get_text
+    ) as mock_get_text:
+        pages, meta = extract_text_from_pdf(str(pdf_path), ocr_mode="auto", workers=1)
+
+    text_calls = [c for c in mock_get_text.call_args_list if c.args[1:2] == ("text",)]
+    assert meta["pdf_type"] == "digital"
+    assert len(text_calls) == 4
+    assert len(pages) == 4
+
+
+def test_sampled_detection_stops_early_on_digital_pdf(tmp_path):
+    pdf_path = tmp_path / "paper.pdf"
+    _write_paper(pdf_path, pages=6)
+    page_texts = {}
+
+    with fitz.open(str(pdf_path)) as doc:
+        full = _detect_digital_pdf(doc)
+        sampled = _detect_digital_pdf(doc, page_texts, sample_pages=3)
+
+    assert full["pages_scanned"] == 6
+    assert full["detection_sampled"] is False
+    assert sampled["is_digital_pdf"] is True
+    assert sampled["detection_sampled"] is True
+    assert sampled["pages_scanned"] == 1
+    assert list(page_texts) == [0]
+
+
+def test_per_page_mode_only_ocrs_pages_without_text(tmp_path):
+    pdf_path = tmp_path / "mixed.pdf"
+    _write_paper(pdf_path, pages=4)
+    with fitz.open(str(pdf_path)) as doc:
+        doc.delete_page(2)
+        doc.insert_page(2)  # blank stand-in for a scanned figure page
+        doc.save(str(tmp_path / "mixed_scan.pdf"))
+    predictor = _FakePredictor()
+
+    with patch("app.services.ocr.get_predictor", return_value=predictor):
+        pages, meta = extract_text_from_pdf(str(tmp_path / "mixed_scan.pdf"), ocr_mode="per_page")
+
+    assert predictor.batch_sizes == [1]
+    assert meta["ingestion_mode"] == "hybrid"
+    assert meta["ocr_pages_count"] == 1
+    assert meta["digital_pages_count"] == 3
+    assert pages[2]["content"][0]["text"] == "ocr text for image 1"
+    assert pages[3]["content"][0]["text"].startswith("Page 4 line 1")
+
+
+def test_table_detection_skips_pages_without_rules_or_captions(tmp_path):
+    pdf_path = tmp_path / "paper.pdf"
+    _write_paper(pdf_path, pages=3)
+    with fitz.open(str(pdf_path)) as doc:
+        _draw_ruled_table(doc[2], [["metric", "value"], ["accuracy", "91.2"], ["f1", "88.0"]])
+        doc.save(str(tmp_path / "paper_table.pdf"))
+
+    pages, meta = extract_text_from_pdf(str(tmp_path / "paper_table.pdf"), ocr_mode="never")
+
+    assert [page["tables_scanned"] for page in pages] == [False, False, True]
+    assert meta["table_pages_scanned"] == 1
+    assert meta["table_pages_skipped"] == 2
+    assert pages[2]["tables"][0]["shape"] == [2, 2]
+
+    with patch("app.services.ocr.settings.TABLE_DETECTION_MODE", "always"):
+        _, always_meta = extract_text_from_pdf(str(pdf_path), ocr_mode="never")
+    with patch("app.services.ocr.settings.TABLE_DETECTION_MODE", "never"):
+        never_pages, never_meta = extract_text_from_pdf(
+            str(tmp_path / "paper_table.pdf"), ocr_mode="never"
+        )
+
+    assert always_meta["table_pages_scanned"] == 3
+    assert never_meta["table_pages_scanned"] == 0
+    assert never_pages[2]["tables"] == []
+
+
+def test_table_payload_output_format_is_pinned():
+    df = pd.DataFrame(
+        [
+            ["Baseline", "  81.0\n", None, ""],
+            ["Ours  (full)", "91.2", "x1", "n/a"],
+            [None, None, None, None],
+        ],
+        columns=["Model", "Acc", "", "Acc"],
+    )
+
+    payload = _table_to_payload(df, page_num=3, current_section="Results", table_idx=1)
+
+    assert payload["table_id"] == "page3_table2"
+    assert payload["section"] == "Results"
+    assert payload["section_bucket"] == "results"
+    assert payload["shape"] == [3, 4]
+    assert payload["normalized_rows"] == [
+        "Table 2, row 1: Model=Baseline; Acc=81.0",
+        "Table 2, row 2: Model=Ours (full); Acc=91.2; col_3=x1; Acc_2=n/a",
+    ]
+    assert payload["metric_facts"] == [
+        "Table 2, row 1: Acc is 81.0",
+        "Table 2, row 2: Acc is 91.2",
+        "Table 2, row 2: col_3 is x1",
+    ]
+    header = [cell.strip() for cell in payload["markdown"].splitlines()[0].strip("|").split("|")]
+    assert header == ["Model", "Acc", "col_3", "Acc_2"]
+
+
+def test_table_payload_keeps_numeric_row_upcasting():
+    # An all-numeric frame is read row-wise as floats, so integer cells render as "3.0".
+    df = pd.DataFrame({"epoch": np.array([3], dtype=np.int64), "loss": [0.25]})
+
+    payload = _table_to_payload(df, page_num=1, current_section="Methods", table_idx=0)
+
+    assert payload["normalized_rows"] == ["Table 1, row 1: epoch=3.0; loss=0.25"]
+    assert payload["metric_facts"] == [
+        "Table 1, row 1: epoch is 3.0",
+        "Table 1, row 1: loss is 0.25",
+    ]
+
+
+def test_empty_table_payload_is_skipped():
+    assert _table_to_payload(pd.DataFrame(), 1, "Results", 0) is None
@@ -0,0 +1,201 @@
+import os
+from unittest.mock import patch
+
+import numpy as np
+import pytest
+
+from app.core.config import settings
+from app.services.artifacts import load_manifest
+from app.services.claims import ClaimExtractionError
+from app.worker import tasks
+from app.worker.celery_app import celery_app
+
+PAGES = [{
+    "page": 1,
+    "content": [{"text": "We propose a retrieval method that improves recall.", "section": "Methods"}],
+    "tables": [],
+}]
+CLAIM = {"text": "The method improves recall.", "claim_type": "result"}
+INDEX_COUNTS = {"inserted": 2, "unchanged": 0, "deleted": 0}
+
+
+@pytest.fixture
+def eager_celery():
+    previous = {
+        key: celery_app.conf[key]
+        for key in ("task_always_eager", "task_eager_propagates", "result_backend")
+    }
+    celery_app.conf.update(
+        task_always_eager=True, task_eager_propagates=True, result_backend="cache+memory://"
+    )
+    yield
+    celery_app.conf.update(previous)
+
+
+def _claims_for(chunks, previous=None):
+    return [
+        {"text": CLAIM["text"], "metadata": {**chunk["metadata"], "is_claim": True, "claim_type": "result"}}
+        for chunk in chunks
+    ]
+
+
+def _encode(texts):
+    return np.arange(len(texts) * 4, dtype=np.float32).reshape(len(texts), 4)
+
+
+def test_stage_chain_produces_final_result_and_artifacts(eager_celery):
+    with patch.object(tasks, "extract_text_from_pdf", return_value=(PAGES, {"ocr_mode_requested": "auto"})), \
+         patch.object(tasks, "extract_claim_chunks", side_effect=_claims_for), \
+         patch.object(tasks, "encode_texts", side_effect=_encode), \
+         patch.object(tasks, "upsert_vectors", return_value=INDEX_COUNTS) as upsert:
+        result = tasks.process_pdf_task.apply(args=["doc-1", "/tmp/doc-1.pdf", "auto"]).get()
+
+    assert result["status"] == "completed"
+    assert result["chunks_count"] == 1
+    assert result["claims_count"] == 1
+    assert result["points_inserted"] == 2
+    assert upsert.call_args.kwargs["doc_id"] == "doc-1"
+    points = upsert.call_args.args[1]
+    assert [p["payload"]["is_claim"] for p in points] == [False, True]
+    assert points[1]["payload"]["text"] == CLAIM["text"]
+    np.testing.assert_array_equal(points[1]["vector"], [4, 5, 6, 7])
+    for name in ("pages.json", "chunks.json", "claims.json", "embeddings.npy"):
+        assert os.path.exists(os.path.join(settings.UPLOAD_DIR, "doc-1", name))
+
+
+def test_failed_index_stage_retries_without_redoing_earlier_stages(eager_celery):
+    # Eager apply() re-runs a retried task in place when errors are not propagated.
+    celery_app.conf.task_eager_propagates = False
+    with patch.object(tasks, "extract_text_from_pdf", return_value=(PAGES, {})) as extract, \
+         patch.object(tasks, "extract_claim_chunks", side_effect=_claims_for) as claims, \
+         patch.object(tasks, "encode_texts", side_effect=_encode) as encode, \
+         patch.object(tasks, "upsert_vectors", side_effect=[ConnectionError("qdrant down"), INDEX_COUNTS]) as upsert:
+        result = tasks.process_pdf_task.apply(args=["doc-2", "/tmp/doc-2.pdf", "auto"]).get()
+
+    assert result["status"] == "completed"
+    assert upsert.call_count == 2
+    assert extract.call_count == claims.call_count == encode.call_count == 1
+
+
+def test_empty_extraction_short_circuits_remaining_stages(eager_celery):
+    with patch.object(tasks, "extract_text_from_pdf", return_value=([], {})), \
+         patch.object(tasks, "extract_claim_chunks") as claims, \
+         patch.object(tasks, "upsert_vectors", return_value=INDEX_COUNTS) as upsert:
+        result = tasks.process_pdf_task.apply(args=["doc-3", "/tmp/doc-3.pdf", "never"]).get()
+
+    assert result["status"] == "failed"
+    assert result["reason"] == "No text extracted"
+    claims.assert_not_called()
+    upsert.assert_not_called()
+
+
+def test_stages_are_routed_to_dedicated_queues():
+    routes = celery_app.conf.task_routes
+    assert routes["app.worker.tasks.extract_stage"]["queue"] == "ocr"
+    assert routes["app.worker.tasks.claims_stage"]["queue"] == "llm"
+    assert routes["app.worker.tasks.embed_stage"]["queue"] == "embed"
+    assert routes["app.worker.tasks.index_stage"]["queue"] == "index"
+
+
+def _run_pipeline(doc_id, ocr_mode="auto"):
+    with patch.object(tasks, "extract_text_from_pdf", return_value=(PAGES, {"ocr_mode_requested": ocr_mode})) as extract, \
+         patch.object(tasks, "extract_claim_chunks", side_effect=_claims_for) as claims, \
+         patch.object(tasks, "encode_texts", side_effect=_encode) as encode, \
+         patch.object(tasks, "upsert_vectors", return_value=INDEX_COUNTS) as upsert:
+        result = tasks.process_pdf_task.apply(args=[doc_id, f"/tmp/{doc_id}.pdf", ocr_mode]).get()
+    return result, extract, claims, encode, upsert
+
+
+def test_rerun_with_unchanged_inputs_reuses_stage_artifacts(eager_celery):
+    _run_pipeline("doc-4")
+    result, extract, claims, encode, upsert = _run_pipeline("doc-4")
+
+    assert result["status"] == "completed"
+    assert result["reused_stages"] == ["extract", "chunk", "claims", "embed"]
+    assert result["ocr_mode"] == "auto"
+    assert result["chunks_count"] == result["claims_count"] == 1
+    extract.assert_not_called()
+    claims.assert_not_called()
+    encode.assert_not_called()
+    assert len(upsert.call_args.args[1]) == 2
+    assert os.path.exists(os.path.join(settings.UPLOAD_DIR, "doc-4", "manifest.json"))
+
+
+def test_changing_embedding_model_only_reruns_embedding(eager_celery, monkeypatch):
+    _run_pipeline("doc-5")
+    monkeypatch.setattr(settings, "EMBEDDING_MODEL", "another-embedding-model")
+    result, extract, claims, encode, _ = _run_pipeline("doc-5")
+
+    assert result["reused_stages"] == ["extract", "chunk", "claims"]
+    extract.assert_not_called()
+    claims.assert_not_called()
+    encode.assert_called_once()
+
+
+def test_changing_ocr_mode_reruns_every_stage(eager_celery):
+    _run_pipeline("doc-6", ocr_mode="auto")
+    result, extract, claims, encode, _ = _run_pipeline("doc-6", ocr_mode="always")
+
+    assert result["reused_stages"] == []
+    assert extract.call_count == claims.call_count == encode.call_count == 1
+
+
+def test_partial_claim_extraction_is_not_checkpointed(eager_celery):
+    # Eager apply() re-runs a retried task in place when errors are not propagated.
+    celery_app.conf.task_eager_propagates = False
+    partial = ClaimExtractionError(1, [], [None])
+    with patch.object(tasks, "extract_text_from_pdf", return_value=(PAGES, {})), \
+         patch.object(tasks, "extract_claim_chunks", side_effect=partial) as claims, \
+         patch.object(tasks, "encode_texts", side_effect=_encode), \
+         patch.object(tasks, "upsert_vectors", return_value=INDEX_COUNTS):
+        result = tasks.process_pdf_task.apply(args=["doc-7", "/tmp/doc-7.pdf", "auto"]).get()
+
+    assert result["status"] == "completed"
+    assert result["claims_count"] == 0
+    assert result["claims_failed_chunks"] == 1
+    assert claims.call_count == tasks.claims_stage.max_retries + 1
+    stages = load_manifest("doc-7")["stages"]
+    assert "claims" not in stages and "embed" not in stages
+
+    result, _, claims, encode, _ = _run_pipeline("doc-7")
+    assert result["claims_count"] == 1
+    assert result["reused_stages"] == ["extract", "chunk"]
+    assert claims.call_count == encode.call_count == 1
+
+
+def test_claim_retry_resends_only_failed_prompts(eager_celery):
+    celery_app.conf.task_eager_propagates = False
+    done = [[CLAIM]]
+    attempts = [ClaimExtractionError(1, [], [done[0], None]), _claims_for]
+    seen_previous = []
+
+    def extract(chunks, previous=None):
+        seen_previous.append(previous)
+        attempt = attempts.pop(0)
+        if isinstance(attempt, Exception):
+            raise attempt
+        return attempt(chunks)
+
+    with patch.object(tasks, "extract_text_from_pdf", return_value=(PAGES, {})), \
+         patch.object(tasks, "extract_claim_chunks", side_effect=extract), \
+         patch.object(tasks, "encode_texts", side_effect=_encode), \
+         patch.object(tasks, "upsert_vectors", return_value=INDEX_COUNTS):
+        result = tasks.process_pdf_task.apply(args=["doc-8", "/tmp/doc-8.pdf", "auto"]).get()
+
+    assert result["status"] == "completed"
+    assert seen_previous == [None, [done[0], None]]
+
+
+def test_non_retryable_claim_failure_is_not_retried(eager_celery):
+    celery_app.conf.task_eager_propagates = False
+    failure = ClaimExtractionError(1, [], [None], retryable=False)
+    with patch.object(tasks, "extract_text_from_pdf", return_value=(PAGES, {})), \
+         patch.object(tasks, "extract_claim_chunks", side_effect=failure) as claims, \
+         patch.object(tasks, "encode_texts", side_effect=_encode), \
+         patch.object(tasks, "upsert_vectors", return_value=INDEX_COUNTS):
+        result = tasks.process_pdf_task.apply(args=["doc-9", "/tmp/doc-9.pdf", "auto"]).get()
+
+    assert result["status"] == "completed"
+    assert result["claims_failed_chunks"] == 1
+    assert claims.call_count == 1
+    assert "claims" not in load_manifest("doc-9")["stages"]
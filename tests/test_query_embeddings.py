@@ -0,0 +1,76 @@
+import asyncio
+from unittest.mock import MagicMock
+
+import numpy as np
+import pytest
+
+from app.services.query_embeddings import QueryEmbedder
+
+
+def _fake_model():
+    model = MagicMock()
+    model.encode.side_effect = lambda texts, **kwargs: np.array(
+        [[float(len(t)), 0.0] for t in texts], dtype=np.float32
+    )
+    return model
+
+
+@pytest.mark.asyncio
+async def test_concurrent_queries_are_coalesced_into_one_encode():
+    embedder = QueryEmbedder(max_entries=10, ttl_seconds=60, batch_window_ms=20, max_batch_size=32)
+    model = _fake_model()
+
+    vectors = await asyncio.gather(
+        embedder.embed("what is the result?", model),
+        embedder.embed("which dataset", model),
+        embedder.embed("what is  the result?", model),
+    )
+
+    assert model.encode.call_count == 1
+    assert model.encode.call_args.args[0] == ["what is the result?", "which dataset"]
+    assert vectors[0] == vectors[2] == [19.0, 0.0]
+    assert vectors[1] == [13.0, 0.0]
+
+    assert await embedder.embed("which dataset", model) == [13.0, 0.0]
+    assert model.encode.call_count == 1
+    assert embedder.stats()["hits"] == 1
+
+
+@pytest.mark.asyncio
+async def test_full_batch_flushes_without_waiting_for_window():
+    embedder = QueryEmbedder(max_entries=10, ttl_seconds=60, batch_window_ms=10_000, max_batch_size=2)
+    model = _fake_model()
+
+    vectors = await asyncio.wait_for(
+        asyncio.gather(embedder.embed("a", model), embedder.embed("bb", model)), timeout=2
+    )
+
+    assert vectors == [[1.0, 0.0], [2.0, 0.0]]
+
+
+@pytest.mark.asyncio
+async def test_cache_entries_expire_and_are_bounded():
+    embedder = QueryEmbedder(max_entries=1, ttl_seconds=0, batch_window_ms=0, max_batch_size=8)
+    model = _fake_model()
+
+    await embedder.embed("first", model)
+    await embedder.embed("first", model)
+    assert model.encode.call_count == 2
+
+    embedder.ttl_seconds = 60
+    await embedder.embed("second", model)
+    await embedder.embed("third", model)
+    assert embedder.stats()["cached"] == 1
+
+
+@pytest.mark.asyncio
+async def test_encode_failure_propagates_to_every_waiter():
+    embedder = QueryEmbedder(max_entries=10, ttl_seconds=60, batch_window_ms=5, max_batch_size=8)
+    model = MagicMock()
+    model.encode.side_effect = RuntimeError("model unavailable")
+
+    results = await asyncio.gather(
+        embedder.embed("a", model), embedder.embed("b", model), return_exceptions=True
+    )
+
+    assert all(isinstance(r, RuntimeError) for r in results)
@@ -0,0 +1,272 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import MagicMock, patch
+
+import numpy as np
+import pytest
+from httpx import ASGITransport, AsyncClient
+
+from app.api.main import app
+from app.services.answer_cache import answer_cache
+from app.services.llm import LLMClient
+from app.services.summaries import get_summary_store
+
+
+class _FakeOpenAIHandler(BaseHTTPRequestHandler):
+    """Minimal OpenAI-compatible /chat/completions: streams `deltas`, or returns `full`."""
+
+    deltas = []
+    full = ""
+    requests = []
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        type(self).requests.append(body)
+        base = {"id": "cmpl-1", "created": 0, "model": body["model"]}
+        if not body.get("stream"):
+            payload = json.dumps({
+                **base,
+                "object": "chat.completion",
+                "choices": [{
+                    "index": 0,
+                    "finish_reason": "stop",
+                    "message": {"role": "assistant", "content": self.full},
+                }],
+            }).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.end_headers()
+        for delta in self.deltas:
+            chunk = {
+                **base,
+                "object": "chat.completion.chunk",
+                "choices": [{"index": 0, "finish_reason": None, "delta": {"content": delta}}],
+            }
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+            self.wfile.flush()
+        self.wfile.write(b"data: [DONE]\n\n")
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def fake_llm():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _FakeOpenAIHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    _FakeOpenAIHandler.requests = []
+    with patch("app.services.llm.settings.LLM_BASE_URL", f"http://127.0.0.1:{server.server_port}"), \
+         patch("app.services.llm.settings.OPENROUTER_API_KEY", "test-key"), \
+         patch("app.api.routes.llm_client", LLMClient()):
+        yield _FakeOpenAIHandler
+    server.shutdown()
+    server.server_close()
+
+
+def _parse_sse(text):
+    events = []
+    for block in text.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+def _hit(page, section, text):
+    hit = MagicMock()
+    hit.payload = {"text": text, "page": page, "section": section, "doc_id": "doc-1"}
+    return hit
+
+
+@pytest.mark.asyncio
+async def test_chat_stream_sends_citations_then_tokens(fake_llm):
+    fake_llm.deltas = ["The loss ", "drops ", "[Page 3, Section Results]."]
+
+    with patch("app.api.routes.search_vectors", return_value=[_hit(3, "Results", "The loss drops.")]), \
+         patch("app.api.routes.get_model") as mock_get_model:
+        mock_get_model.return_value.encode.return_value = np.array([0.3] * 384)
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+            response = await ac.post("/api/v1/chat/stream", json={"query": "Does the loss drop?"})
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = _parse_sse(response.text)
+    assert events[0][0] == "citations"
+    assert events[0][1][0]["page"] == 3
+    assert [data["text"] for name, data in events if name == "token"] == fake_llm.deltas
+    assert events[-1] == ("done", {"answer": "The loss drops [Page 3, Section Results]."})
+    assert "repair" not in [name for name, _ in events]
+    assert fake_llm.requests[0]["stream"] is True
+
+
+@pytest.mark.asyncio
+async def test_chat_stream_sends_repair_event_when_citations_missing(fake_llm):
+    fake_llm.deltas = ["The loss drops."]
+    fake_llm.full = "The loss drops [Page 3, Section Results]."
+
+    with patch("app.api.routes.search_vectors", return_value=[_hit(3, "Results", "The loss drops.")]), \
+         patch("app.api.routes.get_model") as mock_get_model:
+        mock_get_model.return_value.encode.return_value = np.array([0.4] * 384)
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+            response = await ac.post("/api/v1/chat/stream", json={"query": "Is it repaired?"})
+
+    events = _parse_sse(response.text)
+    names = [name for name, _ in events]
+    assert names == ["citations", "token", "repair", "done"]
+    assert events[2][1] == {"answer": fake_llm.full}
+    assert events[3][1] == {"answer": fake_llm.full}
+    assert "Answer to rewrite:\nThe loss drops." in fake_llm.requests[1]["messages"][-1]["content"]
+
+
+@pytest.mark.asyncio
+async def test_summary_stream_forwards_tokens(fake_llm):
+    fake_llm.deltas = ["1) Problem\n", "- Slow papers [Page 1, Section Abstract]"]
+
+    with patch("app.api.routes.search_vectors", return_value=[_hit(1, "Abstract", "Papers are slow.")]):
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+            response = await ac.get("/api/v1/summary/doc-1/stream")
+
+    events = _parse_sse(response.text)
+    assert [name for name, _ in events] == ["token", "token", "done"]
+    assert events[-1][1] == {"summary": "".join(fake_llm.deltas), "cached": False}
+
+
+@pytest.mark.asyncio
+async def test_summary_stream_404_before_streaming():
+    with patch("app.api.routes.search_vectors", return_value=[]):
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+            response = await ac.get("/api/v1/summary/missing/stream")
+
+    assert response.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_summary_stream_serves_cached_summary(fake_llm):
+    fake_llm.deltas = ["Cached ", "summary [Page 1, Section Abstract]"]
+
+    with patch("app.api.routes.search_vectors", return_value=[_hit(1, "Abstract", "Papers are slow.")]):
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+            await ac.get("/api/v1/summary/doc-2/stream")
+            response = await ac.get("/api/v1/summary/doc-2/stream")
+
+    events = _parse_sse(response.text)
+    assert events == [
+        ("token", {"text": "Cached summary [Page 1, Section Abstract]"}),
+        ("done", {"summary": "Cached summary [Page 1, Section Abstract]", "cached": True}),
+    ]
+    assert len(fake_llm.requests) == 1
+
+
+def _failing_stream(*deltas):
+    def stream(prompt, system_prompt=None):
+        yield from deltas
+        raise ConnectionError("provider dropped the stream")
+    return stream
+
+
+def test_stream_response_reraises_after_partial_output():
+    llm = LLMClient()
+    llm.client = MagicMock()
+    chunk = MagicMock()
+    chunk.choices[0].delta.content = "Partial "
+
+    def chunks():
+        yield chunk
+        raise ConnectionError("provider dropped the stream")
+
+    llm.client.chat.completions.create.return_value = chunks()
+    stream = llm.stream_response("prompt")
+    assert next(stream) == "Partial "
+    with pytest.raises(ConnectionError):
+        next(stream)
+
+
+def test_stream_response_raises_before_any_output():
+    llm = LLMClient()
+    llm.client = MagicMock()
+    llm.client.chat.completions.create.side_effect = ConnectionError("provider unreachable")
+
+    with pytest.raises(ConnectionError):
+        list(llm.stream_response("prompt"))
+
+
+@pytest.mark.asyncio
+async def test_chat_stream_reports_failure_before_output_as_error():
+    with patch("app.api.routes.search_vectors", return_value=[_hit(3, "Results", "The loss drops.")]), \
+         patch("app.api.routes.get_model") as mock_get_model, \
+         patch("app.api.routes.llm_client") as mock_llm:
+        mock_get_model.return_value.encode.return_value = np.array([0.8] * 384)
+        mock_llm.stream_response.side_effect = _failing_stream()
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+            response = await ac.post("/api/v1/chat/stream", json={"query": "Is the provider down?"})
+
+    events = _parse_sse(response.text)
+    assert [name for name, _ in events] == ["citations", "error"]
+    assert events[-1][1]["partial"] == ""
+    mock_llm.generate_response.assert_not_called()
+    assert answer_cache.stats()["entries"] == 0
+
+
+@pytest.mark.asyncio
+async def test_summary_stream_reports_failure_before_output_as_error():
+    with patch("app.api.routes.search_vectors", return_value=[_hit(1, "Abstract", "Papers are slow.")]), \
+         patch("app.api.routes.llm_client") as mock_llm:
+        mock_llm.stream_response.side_effect = _failing_stream()
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+            response = await ac.get("/api/v1/summary/doc-4/stream")
+
+    assert [name for name, _ in _parse_sse(response.text)] == ["error"]
+    assert get_summary_store().get("doc-4") is None
+
+
+@pytest.mark.asyncio
+async def test_chat_stream_sends_error_instead_of_done_on_midstream_failure():
+    with patch("app.api.routes.search_vectors", return_value=[_hit(3, "Results", "The loss drops.")]), \
+         patch("app.api.routes.get_model") as mock_get_model, \
+         patch("app.api.routes.llm_client") as mock_llm:
+        mock_get_model.return_value.encode.return_value = np.array([0.6] * 384)
+        mock_llm.stream_response.side_effect = _failing_stream("The loss ", "dro")
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+            response = await ac.post("/api/v1/chat/stream", json={"query": "Is it cut off?"})
+
+    events = _parse_sse(response.text)
+    assert [name for name, _ in events] == ["citations", "token", "token", "error"]
+    assert events[-1][1]["partial"] == "The loss dro"
+
+
+@pytest.mark.asyncio
+async def test_truncated_chat_stream_is_not_repaired_or_cached():
+    with patch("app.api.routes.search_vectors", return_value=[_hit(3, "Results", "The loss drops.")]), \
+         patch("app.api.routes.get_model") as mock_get_model, \
+         patch("app.api.routes.llm_client") as mock_llm:
+        mock_get_model.return_value.encode.return_value = np.array([0.7] * 384)
+        # No citation in the partial text, so a completed answer would be repaired.
+        mock_llm.stream_response.side_effect = _failing_stream("The loss ")
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+            response = await ac.post("/api/v1/chat/stream", json={"query": "Will this be cached?"})
+
+    assert _parse_sse(response.text)[-1][0] == "error"
+    mock_llm.generate_response.assert_not_called()
+    assert answer_cache.stats()["entries"] == 0
+
+
+@pytest.mark.asyncio
+async def test_truncated_summary_stream_is_not_cached():
+    with patch("app.api.routes.search_vectors", return_value=[_hit(1, "Abstract", "Papers are slow.")]), \
+         patch("app.api.routes.llm_client") as mock_llm:
+        mock_llm.stream_response.side_effect = _failing_stream("1) Problem\n", "- Slow")
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+            response = await ac.get("/api/v1/summary/doc-3/stream")
+
+    events = _parse_sse(response.text)
+    assert [name for name, _ in events] == ["token", "token", "error"]
+    assert events[-1][1]["partial"] == "1) Problem\n- Slow"
+    assert get_summary_store().get("doc-3") is None
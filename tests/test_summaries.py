@@ -0,0 +1,81 @@
+import hashlib
+from unittest.mock import MagicMock, patch
+
+import pytest
+from httpx import ASGITransport, AsyncClient
+
+from app.api.main import app
+from app.services.llm import GENERATION_ERROR_MESSAGE
+from app.services.summaries import SummaryStore, get_summary_store
+
+
+def _hits():
+    hit = MagicMock()
+    hit.payload = {"text": "This is an abstract.", "page": 1, "section": "Abstract"}
+    return [hit]
+
+
+@pytest.mark.asyncio
+async def test_summary_is_cached_until_refresh():
+    with patch("app.api.routes.search_vectors", return_value=_hits()) as mock_search, \
+         patch("app.api.routes.llm_client") as mock_llm:
+        mock_llm.generate_response.side_effect = ["First summary", "Second summary"]
+
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+            first = await ac.get("/api/v1/summary/doc-cache")
+            second = await ac.get("/api/v1/summary/doc-cache")
+            searches_before_refresh = mock_search.call_count
+            refreshed = await ac.get("/api/v1/summary/doc-cache", params={"refresh": "true"})
+            after_refresh = await ac.get("/api/v1/summary/doc-cache")
+
+    assert first.json() == {"summary": "First summary", "cached": False}
+    assert second.json() == {"summary": "First summary", "cached": True}
+    # Only the first request hits Qdrant: four section lookups, no bucket fallbacks needed.
+    assert searches_before_refresh == 4
+    assert refreshed.json() == {"summary": "Second summary", "cached": False}
+    assert after_refresh.json() == {"summary": "Second summary", "cached": True}
+    assert mock_llm.generate_response.call_count == 2
+
+
+@pytest.mark.asyncio
+async def test_failed_generation_is_not_cached():
+    with patch("app.api.routes.search_vectors", return_value=_hits()), \
+         patch("app.api.routes.llm_client") as mock_llm:
+        mock_llm.generate_response.return_value = GENERATION_ERROR_MESSAGE
+
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+            await ac.get("/api/v1/summary/doc-error")
+
+    assert get_summary_store().get("doc-error") is None
+
+
+@pytest.mark.asyncio
+async def test_force_upload_invalidates_cached_summary():
+    pdf_bytes = b"%PDF-1.4 summary invalidation"
+    doc_id = hashlib.sha256(pdf_bytes).hexdigest()
+    store = get_summary_store()
+    store.put(doc_id, "Old summary")
+
+    with patch("app.api.routes.celery_app") as mock_celery:
+        mock_celery.send_task.return_value.id = "task-1"
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+            response = await ac.post(
+                "/api/v1/upload",
+                params={"force": "true"},
+                files={"file": ("paper.pdf", pdf_bytes, "application/pdf")},
+            )
+
+    assert response.status_code == 200
+    assert store.get(doc_id) is None
+
+
+def test_store_is_keyed_by_model_and_rejects_unsafe_doc_ids(tmp_path):
+    store = SummaryStore(str(tmp_path))
+    store.put("doc-1", "Summary A", model="model-a")
+
+    assert store.get("doc-1", model="model-a") == "Summary A"
+    assert store.get("doc-1", model="model-b") is None
+
+    store.put("../escape", "nope")
+    assert store.get("../escape") is None
+    assert not (tmp_path.parent / "escape").exists()
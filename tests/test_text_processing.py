@@ -1,6 +1,8 @@
+from unittest.mock import patch
+
 from app.core.config import settings
 from app.services.sections import normalize_section_name, section_bucket
-from app.services.text_processing import chunk_text
+from app.services.text_processing import chunk_text, iter_chunks
 
 
 def test_section_normalization_and_bucketing():
@@ -75,3 +77,113 @@ def test_chunk_text_indexes_table_variants():
     assert "normalized_row" in variants
     assert "metric_fact" in variants
     assert all(c["metadata"]["section"] == "Results" for c in table_chunks)
+
+
+def _multi_page_section(pages=4, words_per_page=30):
+    return [
+        {
+            "page": page_num,
+            "content": [
+                {
+                    "text": " ".join(f"p{page_num}w{i}" for i in range(words_per_page)),
+                    "section": "Methods",
+                }
+            ],
+            "tables": [],
+        }
+        for page_num in range(1, pages + 1)
+    ]
+
+
+def test_chunk_text_tracks_page_ranges_across_pages():
+    original_chunk_size = settings.CHUNK_TOKENS
+    original_overlap = settings.CHUNK_OVERLAP_TOKENS
+    settings.CHUNK_TOKENS = 50
+    settings.CHUNK_OVERLAP_TOKENS = 10
+
+    try:
+        chunks = chunk_text(_multi_page_section(), "doc789")
+        ranges = [(c["metadata"]["page"], c["metadata"]["end_page"]) for c in chunks]
+        assert ranges == [(1, 2), (2, 3), (3, 4)]
+        assert chunks[1]["text"].split()[0] == "p2w10"
+        assert len(chunks[-1]["text"].split()) == 40
+    finally:
+        settings.CHUNK_TOKENS = original_chunk_size
+        settings.CHUNK_OVERLAP_TOKENS = original_overlap
+
+
+def test_iter_chunks_streams_before_consuming_all_pages():
+    original_chunk_size = settings.CHUNK_TOKENS
+    original_overlap = settings.CHUNK_OVERLAP_TOKENS
+    settings.CHUNK_TOKENS = 50
+    settings.CHUNK_OVERLAP_TOKENS = 10
+    pages_data = _multi_page_section(pages=6)
+    pages_read = []
+
+    def page_source():
+        for page_data in pages_data:
+            pages_read.append(page_data["page"])
+            yield page_data
+
+    try:
+        stream = iter_chunks(page_source(), "doc789")
+        first = next(stream)
+        assert first["metadata"]["page"] == 1
+        assert pages_read == [1, 2]
+
+        streamed = [first, *stream]
+        expected = chunk_text(pages_data, "doc789")
+        assert streamed == expected
+    finally:
+        settings.CHUNK_TOKENS = original_chunk_size
+        settings.CHUNK_OVERLAP_TOKENS = original_overlap
+
+
+def _fake_count_tokens(texts):
+    # Stand-in for a wordpiece tokenizer: long words split into several pieces.
+    return [1 + len(text) // 6 for text in texts]
+
+
+def test_chunk_text_token_mode_fits_model_budget():
+    original = (settings.CHUNK_MODE, settings.CHUNK_TOKENS, settings.CHUNK_OVERLAP_TOKENS)
+    settings.CHUNK_MODE = "tokens"
+    settings.CHUNK_TOKENS = 500
+    settings.CHUNK_OVERLAP_TOKENS = 4
+    pages_data = [
+        {
+            "page": 1,
+            "content": [
+                {"text": "Methods", "section": "Methods"},
+                {"text": " ".join(f"w{i}" + "x" * (i % 13) for i in range(60)), "section": "Methods"},
+            ],
+            "tables": [],
+        },
+        {
+            "page": 2,
+            "content": [{"text": " ".join(f"v{i}" + "y" * (i % 7) for i in range(60)), "section": "Methods"}],
+            "tables": [],
+        },
+    ]
+
+    try:
+        with patch("app.services.text_processing.count_tokens", side_effect=_fake_count_tokens), \
+             patch("app.services.text_processing.max_input_tokens", return_value=30):
+            chunks = chunk_text(pages_data, "doc321")
+    finally:
+        settings.CHUNK_MODE, settings.CHUNK_TOKENS, settings.CHUNK_OVERLAP_TOKENS = original
+
+    token_counts = [sum(_fake_count_tokens(c["text"].split())) for c in chunks]
+    assert len(chunks) > 1
+    # CHUNK_TOKENS is capped at the model's max input length.
+    assert max(token_counts) <= 30
+    assert chunks[0]["metadata"]["page"] == 1
+    assert chunks[-1]["metadata"]["end_page"] == 2
+    assert chunks[-1]["text"].endswith("v59yyy")
+
+    # Consecutive chunks overlap by at most CHUNK_OVERLAP_TOKENS tokens.
+    first_words, second_words = chunks[0]["text"].split(), chunks[1]["text"].split()
+    shared = next(
+        n for n in range(min(len(first_words), len(second_words)), -1, -1)
+        if first_words[len(first_words) - n:] == second_words[:n]
+    )
+    assert 0 < sum(_fake_count_tokens(second_words[:shared])) <= 4
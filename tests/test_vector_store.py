@@ -0,0 +1,291 @@
+import os
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+import numpy as np
+import pytest
+from qdrant_client import QdrantClient
+import grpc
+from qdrant_client.http.exceptions import ResponseHandlingException, UnexpectedResponse
+
+from app.core.config import settings
+from app.services import text_store, vector_store
+
+COLLECTION = "test-chunks"
+
+# The in-memory client accepts payload indexes but does not use them.
+pytestmark = pytest.mark.filterwarnings("ignore:Payload indexes have no effect")
+
+
+@pytest.fixture
+def qdrant(monkeypatch):
+    client = QdrantClient(":memory:")
+    monkeypatch.setattr(vector_store, "_client", client)
+    monkeypatch.setattr(vector_store, "_ready_collections", set())
+    monkeypatch.setattr(settings, "QDRANT_UPSERT_BACKOFF_SECONDS", 0)
+    monkeypatch.setattr(settings, "QDRANT_COLLECTION_NAME", COLLECTION)
+    monkeypatch.setattr(settings, "EMBEDDING_DIMENSION", 4)
+    return client
+
+
+def _item(doc_id, text, content_type="text", seed=0.0):
+    return {
+        "vector": np.array([1.0, seed, 0.5, 0.25], dtype=np.float32),
+        "payload": {"doc_id": doc_id, "text": text, "content_type": content_type},
+    }
+
+
+def _point_count(client, doc_id=None):
+    hits, _ = client.scroll(collection_name=COLLECTION, limit=100)
+    return len([hit for hit in hits if doc_id is None or hit.payload["doc_id"] == doc_id])
+
+
+def test_point_ids_are_deterministic():
+    first = vector_store.point_id("doc", "text", 0, "hello")
+    assert first == vector_store.point_id("doc", "text", 0, "hello")
+    assert first != vector_store.point_id("doc", "claim", 0, "hello")
+    assert first != vector_store.point_id("doc", "text", 1, "hello")
+    assert first != vector_store.point_id("other", "text", 0, "hello")
+
+
+def test_reindexing_same_content_does_not_duplicate_points(qdrant):
+    data = [_item("doc", "alpha"), _item("doc", "beta"), _item("doc", "alpha", content_type="claim")]
+
+    first = vector_store.upsert_vectors(COLLECTION, data, doc_id="doc")
+    second = vector_store.upsert_vectors(COLLECTION, data, doc_id="doc")
+
+    assert first == {"inserted": 3, "unchanged": 0, "deleted": 0}
+    assert second == {"inserted": 0, "unchanged": 3, "deleted": 0}
+    assert _point_count(qdrant) == 3
+
+
+def test_reindexing_rewrites_changed_and_deletes_stale_points(qdrant):
+    vector_store.upsert_vectors(COLLECTION, [_item("doc", "alpha"), _item("doc", "beta")], doc_id="doc")
+    vector_store.upsert_vectors(COLLECTION, [_item("other", "alpha")], doc_id="other")
+
+    # Same text with a new vector (e.g. another embedding model) is rewritten in place;
+    # "beta" is no longer produced and goes.
+    counts = vector_store.upsert_vectors(COLLECTION, [_item("doc", "alpha", seed=0.9)], doc_id="doc")
+
+    assert counts == {"inserted": 1, "unchanged": 0, "deleted": 1}
+    assert _point_count(qdrant, "doc") == 1
+    assert _point_count(qdrant, "other") == 1
+
+
+def test_upserts_in_bounded_parallel_batches(qdrant, monkeypatch):
+    monkeypatch.setattr(settings, "QDRANT_UPSERT_BATCH_SIZE", 2)
+    monkeypatch.setattr(settings, "QDRANT_UPSERT_PARALLELISM", 2)
+    data = [_item("doc", f"chunk {i}") for i in range(5)]
+
+    with patch.object(qdrant, "upsert", wraps=qdrant.upsert) as upsert:
+        counts = vector_store.upsert_vectors(COLLECTION, data, doc_id="doc")
+
+    assert counts["inserted"] == 5
+    assert sorted(len(call.kwargs["points"]) for call in upsert.call_args_list) == [1, 2, 2]
+    assert all(call.kwargs["wait"] is True for call in upsert.call_args_list)
+    assert _point_count(qdrant) == 5
+
+
+def test_failed_batch_is_retried(qdrant):
+    real_upsert = qdrant.upsert
+    calls = []
+
+    def flaky_upsert(**kwargs):
+        calls.append(kwargs)
+        if len(calls) == 1:
+            raise ResponseHandlingException(ConnectionError("connection reset"))
+        return real_upsert(**kwargs)
+
+    with patch.object(qdrant, "upsert", side_effect=flaky_upsert):
+        counts = vector_store.upsert_vectors(COLLECTION, [_item("doc", "alpha")], doc_id="doc")
+
+    assert counts["inserted"] == 1
+    assert len(calls) == 2
+    assert _point_count(qdrant) == 1
+
+
+def test_client_errors_are_not_retried(qdrant):
+    bad_request = UnexpectedResponse(400, "Bad Request", b"wrong vector size", None)
+
+    with patch.object(qdrant, "upsert", side_effect=bad_request) as upsert:
+        with pytest.raises(UnexpectedResponse):
+            vector_store.upsert_vectors(COLLECTION, [_item("doc", "alpha")], doc_id="doc")
+
+    assert upsert.call_count == 1
+    # A failed write makes the next upsert re-check that the collection exists.
+    assert COLLECTION not in vector_store._ready_collections
+
+
+class _RpcError(grpc.RpcError):
+    def __init__(self, code):
+        self._code = code
+
+    def code(self):
+        return self._code
+
+
+@pytest.mark.parametrize("code, attempts", [
+    (grpc.StatusCode.UNAVAILABLE, 2),
+    (grpc.StatusCode.INVALID_ARGUMENT, 1),
+    (grpc.StatusCode.NOT_FOUND, 1),
+])
+def test_grpc_errors_are_retried_only_when_transient(qdrant, code, attempts):
+    real_upsert = qdrant.upsert
+    calls = []
+
+    def upsert(**kwargs):
+        calls.append(kwargs)
+        if len(calls) == 1:
+            raise _RpcError(code)
+        return real_upsert(**kwargs)
+
+    with patch.object(qdrant, "upsert", side_effect=upsert):
+        if attempts == 1:
+            with pytest.raises(grpc.RpcError):
+                vector_store.upsert_vectors(COLLECTION, [_item("doc", "alpha")], doc_id="doc")
+        else:
+            vector_store.upsert_vectors(COLLECTION, [_item("doc", "alpha")], doc_id="doc")
+
+    assert len(calls) == attempts
+
+
+def test_local_errors_are_not_retried(qdrant):
+    with patch.object(qdrant, "upsert", side_effect=ValueError("bad point")) as upsert:
+        with pytest.raises(ValueError):
+            vector_store.upsert_vectors(COLLECTION, [_item("doc", "alpha")], doc_id="doc")
+
+    assert upsert.call_count == 1
+
+
+def test_collection_existence_is_checked_once(qdrant):
+    with patch.object(qdrant, "get_collections", wraps=qdrant.get_collections) as get_collections:
+        vector_store.upsert_vectors(COLLECTION, [_item("doc", "alpha")], doc_id="doc")
+        vector_store.upsert_vectors(COLLECTION, [_item("doc", "beta")], doc_id="doc")
+
+    assert get_collections.call_count == 1
+
+
+def test_missing_payload_indexes_are_created_on_existing_collection():
+    client = MagicMock()
+    client.get_collection.return_value = SimpleNamespace(payload_schema={"doc_id": object()})
+
+    created = vector_store.ensure_payload_indexes(client, COLLECTION)
+
+    assert "doc_id" not in created
+    assert set(created) == set(vector_store.PAYLOAD_INDEXES) - {"doc_id"}
+    schemas = {
+        call.kwargs["field_name"]: call.kwargs["field_schema"]
+        for call in client.create_payload_index.call_args_list
+    }
+    assert schemas["is_claim"] == vector_store.PAYLOAD_INDEXES["is_claim"]
+    assert schemas["section_bucket"] == vector_store.PAYLOAD_INDEXES["section_bucket"]
+
+
+def test_payload_indexes_cover_every_search_filter():
+    query_filter = vector_store.build_filter(
+        doc_id="doc",
+        section="Methods",
+        section_bucket="methods",
+        is_claim=True,
+        claim_type="result",
+        is_table=False,
+        table_variant="raw_markdown",
+    )
+    assert {condition.key for condition in query_filter.must} <= set(vector_store.PAYLOAD_INDEXES)
+
+
+def test_init_collection_creates_payload_indexes(qdrant):
+    with patch.object(qdrant, "create_payload_index", wraps=qdrant.create_payload_index) as create_index:
+        vector_store.init_collection()
+
+    assert {call.kwargs["field_name"] for call in create_index.call_args_list} == set(vector_store.PAYLOAD_INDEXES)
+
+
+def test_default_collection_config_is_plain_float32_in_ram():
+    config = vector_store.collection_config()
+
+    assert config["quantization_config"] is None
+    assert config["vectors_config"].on_disk is False
+    assert config["hnsw_config"].m == settings.QDRANT_HNSW_M
+    assert vector_store.search_params() is None
+
+
+def test_scalar_quantization_config_and_rescoring(monkeypatch):
+    monkeypatch.setattr(settings, "QDRANT_QUANTIZATION", "scalar")
+    monkeypatch.setattr(settings, "QDRANT_ON_DISK_VECTORS", True)
+    monkeypatch.setattr(settings, "QDRANT_HNSW_EF", 64)
+
+    config = vector_store.collection_config()
+    params = vector_store.search_params()
+
+    assert config["quantization_config"].scalar.type == "int8"
+    assert config["vectors_config"].on_disk is True
+    assert params.hnsw_ef == 64
+    assert params.quantization.rescore is True
+    assert params.quantization.oversampling == settings.QDRANT_QUANTIZATION_OVERSAMPLING
+
+
+def test_binary_quantization_and_invalid_mode(monkeypatch):
+    monkeypatch.setattr(settings, "QDRANT_QUANTIZATION", "binary")
+    assert vector_store.collection_config()["quantization_config"].binary.always_ram is True
+
+    monkeypatch.setattr(settings, "QDRANT_QUANTIZATION", "pq")
+    with pytest.raises(ValueError, match="Invalid QDRANT_QUANTIZATION"):
+        vector_store.collection_config()
+
+
+def test_search_passes_search_params(monkeypatch):
+    client = MagicMock()
+    monkeypatch.setattr(vector_store, "_client", client)
+    monkeypatch.setattr(settings, "QDRANT_HNSW_EF", 128)
+
+    vector_store.search_vectors(query_vector=[0.1, 0.2], top_k=3, doc_id="doc")
+
+    assert client.search.call_args.kwargs["search_params"].hnsw_ef == 128
+
+
+def test_slim_payloads_move_text_to_side_store_and_hydrate(qdrant, monkeypatch):
+    monkeypatch.setattr(settings, "QDRANT_PAYLOAD_MODE", "slim")
+    item = _item("doc", "alpha")
+    item["payload"].update({"page": 3, "section": "Methods", "filename": "doc.pdf", "is_claim": False})
+    vector_store.upsert_vectors(COLLECTION, [item, _item("doc", "beta")], doc_id="doc")
+
+    hits, _ = qdrant.scroll(collection_name=COLLECTION, limit=10)
+    stored = {key for hit in hits for key in hit.payload}
+    assert "text" not in stored and "filename" not in stored
+    assert {"doc_id", "page", "section", "is_claim", "content_type"} <= stored
+
+    text_store.hydrate_hits(hits)
+    alpha = next(hit for hit in hits if hit.payload["text"] == "alpha")
+    assert alpha.payload["filename"] == "doc.pdf"
+    assert alpha.payload["page"] == 3
+
+
+def test_slim_reindex_deletes_stale_side_store_rows(qdrant, monkeypatch):
+    monkeypatch.setattr(settings, "QDRANT_PAYLOAD_MODE", "slim")
+    vector_store.upsert_vectors(COLLECTION, [_item("doc", "alpha"), _item("doc", "beta")], doc_id="doc")
+    beta_id = vector_store.point_id("doc", "text", 1, "beta")
+
+    vector_store.upsert_vectors(COLLECTION, [_item("doc", "alpha")], doc_id="doc")
+
+    assert text_store.get_text_store().get_many([beta_id]) == {}
+
+
+def test_switching_payload_mode_rewrites_points(qdrant, monkeypatch):
+    data = [_item("doc", "alpha")]
+    vector_store.upsert_vectors(COLLECTION, data, doc_id="doc")
+    monkeypatch.setattr(settings, "QDRANT_PAYLOAD_MODE", "slim")
+
+    counts = vector_store.upsert_vectors(COLLECTION, data, doc_id="doc")
+
+    assert counts == {"inserted": 1, "unchanged": 0, "deleted": 0}
+    hits, _ = qdrant.scroll(collection_name=COLLECTION, limit=10)
+    assert "text" not in hits[0].payload
+
+
+def test_full_payload_hits_skip_hydration(monkeypatch):
+    hit = SimpleNamespace(id="p1", payload={"text": "already here"})
+    with patch.object(text_store, "get_text_store") as get_store:
+        text_store.hydrate_hits([hit])
+    get_store.assert_not_called()
+    assert not os.path.exists(text_store.text_store_path())